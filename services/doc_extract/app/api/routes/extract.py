@@ -1,11 +1,32 @@
-from fastapi import APIRouter, UploadFile, File, Query
+from fastapi import APIRouter, UploadFile, File, Query, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import HTTPException
+import json
 from schemas.extract import ExtractResponse
-from services.extraction_service import handle_extract
+from services.extraction_service import handle_extract, handle_extract_async, save_upload, resolve_currency, stream_extract, cascade_stats
+from services.executor import extract_capacity, extract_inflight
+from core.config import EXTRACT_RETRY_AFTER
+from starlette.concurrency import run_in_threadpool
+from core.config import PROFILING_ENABLED
 from fastapi import Depends
 from sqlalchemy.orm import Session
-from db.database import SessionLocal
+from db.database import SessionLocal, AsyncSessionLocal
 from schemas.expense_summary import ExpenseSummaryRequest, ExpenseSummaryResponse
-from db.crud import get_monthly_expense_summary
+from db.crud import get_monthly_expense_summary, get_data_version, get_statement_transactions, search_transactions
+from datetime import date, timedelta
+from services.http_cache import conditional_response, request_key
+from services.warmup import readiness
+from schemas.query import QueryParseRequest, QueryParseResponse
+from services.query_parser import parse_query
+from services.fx import get_rate, get_snapshot
+from schemas.agent import AgentRequest, AgentResponse
+from services.agent import handle_agent
+from core.config import FX_BASE_CURRENCY, DB_ASYNC_READS, EXPORT_BATCH_SIZE
+from services.export import iter_export, parse_columns, MEDIA_TYPES
+from services.analytics import snapshot_version, year_over_year, rolling_spend, category_trends
+from services.snapshots import refresh_snapshots
+from services.llm_scheduler import scheduler as llm_scheduler, ollama_generate, PRIORITIES
+from fastapi.responses import Response
 
 
 
@@ -13,22 +34,105 @@ router = APIRouter()
 
 @router.get("/health")
 def health():
+    # liveness: the process is up, no dependencies checked
     return {"status": "ok"}
 
+@router.get("/ready")
+def ready():
+    # readiness: DB reachable and startup warm-up finished
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
 @router.post("/extract", response_model=ExtractResponse)
-def extract(
+async def extract(
     file: UploadFile = File(...),
     currency_hint: str | None = Query(None),
     bank_hint: str | None = Query(None),
     account_holder_hint: str | None = Query(None),
+    profile: bool = Query(False),
+    x_profile: str | None = Header(None),
 ):
-    return handle_extract(
+    kwargs = dict(
         file=file,
         currency_hint=currency_hint,
         bank_hint=bank_hint,
         account_holder_hint=account_holder_hint,
     )
 
+    # Profiling is opt-in per request and gated by config; the normal path is untouched.
+    # Profiled runs stay in-process so cProfile sees the whole pipeline.
+    if PROFILING_ENABLED and (profile or x_profile in ("1", "true")):
+        from services.profiling import run_profiled
+
+        result, report = await run_in_threadpool(run_profiled, handle_extract, **kwargs)
+        return {**result, "profile": report}
+
+    return await handle_extract_async(**kwargs)
+
+
+@router.post("/query/parse", response_model=QueryParseResponse)
+def query_parse(payload: QueryParseRequest):
+    # deterministic period / currency pair / city extraction for the agent;
+    # callers only ask the LLM for the fields listed in needs_llm
+    return parse_query(payload.message, timezone=payload.user_timezone)
+
+
+@router.post("/agent", response_model=AgentResponse)
+async def agent(payload: AgentRequest):
+    # native replacement for the n8n /agent webhook; resolvers fan out concurrently
+    return await handle_agent(
+        payload.message,
+        user_timezone=payload.meta.timezone,
+        user_id=payload.meta.user_id,
+        source=payload.source,
+    )
+
+
+@router.get("/fx")
+def fx_rate(from_currency: str = Query(..., alias="from"), to_currency: str = Query(..., alias="to")):
+    # served from the in-memory TTL cache / fx_rates table; the provider is only hit when stale
+    return get_rate(from_currency, to_currency)
+
+
+@router.post("/fx/refresh")
+def fx_refresh():
+    snap = get_snapshot(force_refresh=True)
+    return {"base": snap["base"], "as_of": snap["as_of"].isoformat(), "source": snap["source"], "currencies": len(snap["rates"])}
+
+
+@router.post("/extract/stream")
+async def extract_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    currency_hint: str | None = Query(None),
+    bank_hint: str | None = Query(None),
+    account_holder_hint: str | None = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+):
+    # shed before reading the body; the stream itself holds the admission slot
+    if extract_inflight() >= extract_capacity():
+        raise HTTPException(
+            status_code=503,
+            detail="Extraction capacity exhausted, retry later",
+            headers={"Retry-After": str(EXTRACT_RETRY_AFTER)},
+        )
+
+    # the upload is closed once this handler returns, so save it up front (413 surfaces as a normal error)
+    path = await run_in_threadpool(save_upload, file)
+    mime = file.content_type or "application/octet-stream"
+
+    events = stream_extract(
+        path, mime, resolve_currency(currency_hint), bank_hint, account_holder_hint, request.is_disconnected
+    )
+
+    async def body():
+        async for ev in events:
+            data = json.dumps(ev, default=str)
+            yield f"event: {ev['event']}\ndata: {data}\n\n" if format == "sse" else data + "\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
 
 def get_db():
     db = SessionLocal()
@@ -38,27 +142,233 @@ def get_db():
         db.close()
 
 
+class AsyncReads:
+    # db.crud is sync SQLAlchemy; run_sync drives it over asyncpg (greenlet on
+    # the event loop), so a waiting query holds no thread
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn, *args, **kwargs):
+        return await self.session.run_sync(fn, *args, **kwargs)
+
+
+class ThreadReads:
+    # DB_ASYNC_READS=false: the previous behaviour, sync session on the thread pool.
+    # The connection goes back to the pool after every call: a request waiting
+    # for its next thread must not hold one (200+ clients deadlock the pool).
+    def __init__(self, session):
+        self.session = session
+
+    def _call(self, fn, args, kwargs):
+        try:
+            return fn(self.session, *args, **kwargs)
+        finally:
+            self.session.close()
+
+    async def run(self, fn, *args, **kwargs):
+        return await run_in_threadpool(self._call, fn, args, kwargs)
+
+
+async def get_read_db():
+    """Read endpoints: `await db.run(crud_fn, *args)`."""
+    if DB_ASYNC_READS:
+        async with AsyncSessionLocal() as session:
+            yield AsyncReads(session)
+    else:
+        db = SessionLocal()
+        try:
+            yield ThreadReads(db)
+        finally:
+            await run_in_threadpool(db.close)
+
+
 @router.post("/expenses/summary", response_model=ExpenseSummaryResponse)
-def expenses_summary(payload: ExpenseSummaryRequest, db: Session = Depends(get_db)):
-    data = get_monthly_expense_summary(
-        db=db,
-        year=payload.year,
-        month=payload.month,
-        account_number=payload.account_number,
+async def expenses_summary(payload: ExpenseSummaryRequest, request: Request, db=Depends(get_read_db)):
+    # ETag = f(request, data version): If-None-Match -> 304, repeats served from the response cache
+    params = payload.model_dump()
+    fx = None
+    if payload.target_currency:
+        fx = await run_in_threadpool(get_snapshot)  # memory TTL cache; DB / provider only when stale
+        params["fx"] = [fx["as_of"], fx["fetched_at"]]  # new rates -> new ETag
+    key = request_key("expenses/summary", params)
+
+    async def compute():
+        data = await db.run(
+            get_monthly_expense_summary,
+            year=payload.year,
+            month=payload.month,
+            account_number=payload.account_number,
+            target_currency=payload.target_currency,
+            fx_base=FX_BASE_CURRENCY,
+        )
+
+        return ExpenseSummaryResponse(
+            year=payload.year,
+            month=payload.month,
+            currency=data["currency"],
+            total_debit=data["total_debit"],
+            total_credit=data["total_credit"],
+            net=data["net"],
+            txn_count=data["txn_count"],
+            unconverted_txn_count=data["unconverted_txn_count"],
+            fx_as_of=fx["as_of"].isoformat() if fx else None,
+            daily=data["daily"],
+        )
+
+    # scope for the data-change bus: only an ingest touching this account / month drops the cached body
+    scope = {
+        "account_number": payload.account_number,
+        "date_from": date(payload.year, payload.month, 1),
+        "date_to": date(payload.year + payload.month // 12, payload.month % 12 + 1, 1) - timedelta(days=1),
+    }
+    return await conditional_response(request, key, lambda: db.run(get_data_version), compute, scope)
+
+
+@router.get("/statements/{statement_id}/transactions")
+async def statement_transactions(statement_id: int, request: Request, db=Depends(get_read_db)):
+    key = request_key("statements/transactions", {"statement_id": statement_id})
+
+    async def compute():
+        return {"statement_id": statement_id, "transactions": await db.run(get_statement_transactions, statement_id)}
+
+    return await conditional_response(request, key, lambda: db.run(get_data_version), compute,
+                                      {"statement_id": statement_id})
+
+
+
+@router.get("/transactions/search")
+async def transactions_search(
+    request: Request,
+    q: str | None = Query(None, description="free text on description, prefix-matched per word"),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    min_amount: float | None = Query(None, ge=0),
+    max_amount: float | None = Query(None, ge=0),
+    account_number: str | None = Query(None),
+    direction: str | None = Query(None, pattern="^(DEBIT|CREDIT)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=200),
+    db=Depends(get_read_db),
+):
+    params = dict(
+        q=q, date_from=date_from, date_to=date_to, min_amount=min_amount, max_amount=max_amount,
+        account_number=account_number, direction=direction,
+    )
+
+    async def compute():
+        results, has_more, truncated = await db.run(
+            search_transactions, **params, limit=page_size, offset=(page - 1) * page_size
+        )
+        # truncated: SEARCH_MAX_CANDIDATES newest matches ranked, older ones not reachable by paging
+        return {"page": page, "page_size": page_size, "has_more": has_more, "truncated": truncated,
+                "results": results}
+
+    key = request_key("transactions/search", {**params, "page": page, "page_size": page_size})
+    scope = {"account_number": account_number, "date_from": date_from, "date_to": date_to}
+    return await conditional_response(request, key, lambda: db.run(get_data_version), compute, scope)
+
+
+@router.get("/transactions/export")
+def transactions_export(
+    format: str = Query("arrow", pattern="^(arrow|parquet)$"),
+    columns: str | None = Query(None, description="comma-separated projection, default: the main columns"),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    account_number: str | None = Query(None),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1000, le=200000),
+):
+    # streamed batch by batch from a server-side cursor; memory does not grow with the export
+    cols = parse_columns(columns)
+    filename = f"transactions.{'arrow' if format == 'arrow' else 'parquet'}"
+    return StreamingResponse(
+        iter_export(format, cols, date_from, date_to, account_number, batch_size),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
-    # currency is stored in transactions per row; simplest: pick first row if exists
-    currency = None
-    # (optional) you can query first currency quickly
-    # but for demo, leave null or hardcode AED if that's your default
-
-    return ExpenseSummaryResponse(
-        year=payload.year,
-        month=payload.month,
-        currency=currency,
-        total_debit=data["total_debit"],
-        total_credit=data["total_credit"],
-        net=data["net"],
-        txn_count=data["txn_count"],
-        daily=data["daily"],
-    )
\ No newline at end of file
+
+# Analytics: DuckDB over the Parquet snapshots (services/snapshots.py), not Postgres.
+# The ETag follows the snapshot version, so answers only change after a refresh.
+@router.get("/analytics/yoy")
+async def analytics_yoy(
+    request: Request,
+    granularity: str = Query("year", pattern="^(year|month)$"),
+    account_number: str | None = Query(None),
+    category: str | None = Query(None),
+):
+    params = dict(granularity=granularity, account_number=account_number, category=category)
+
+    async def compute():
+        return {"results": await run_in_threadpool(year_over_year, **params)}
+
+    key = request_key("analytics/yoy", params)
+    return await conditional_response(request, key, snapshot_version(), compute)
+
+
+@router.get("/analytics/rolling")
+async def analytics_rolling(
+    request: Request,
+    window: int = Query(3, ge=1, le=36, description="months in the rolling average"),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    account_number: str | None = Query(None),
+    category: str | None = Query(None),
+):
+    params = dict(window=window, date_from=date_from, date_to=date_to, account_number=account_number,
+                  category=category)
+
+    async def compute():
+        return {"window": window, "results": await run_in_threadpool(rolling_spend, **params)}
+
+    key = request_key("analytics/rolling", params)
+    return await conditional_response(request, key, snapshot_version(), compute)
+
+
+@router.get("/analytics/categories")
+async def analytics_categories(
+    request: Request,
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    account_number: str | None = Query(None),
+    top: int = Query(10, ge=1, le=100),
+):
+    params = dict(date_from=date_from, date_to=date_to, account_number=account_number, top=top)
+
+    async def compute():
+        return await run_in_threadpool(category_trends, **params)
+
+    key = request_key("analytics/categories", params)
+    return await conditional_response(request, key, snapshot_version(), compute)
+
+
+@router.post("/analytics/refresh")
+def analytics_refresh(full: bool = Query(False, description="rebuild every month, not just changed ones")):
+    return refresh_snapshots(full=full)
+
+
+@router.get("/llm/stats")
+def llm_stats():
+    # per-class queue depth, running calls, shed / expired / degraded counts, queue wait percentiles,
+    # plus the metadata model cascade: answers / escalations / mean latency per tier
+    return {**llm_scheduler.stats(), "metadata_cascade": cascade_stats()}
+
+
+@router.post("/llm/api/{endpoint}")
+async def llm_proxy(
+    endpoint: str,
+    request: Request,
+    x_llm_priority: str = Header("interactive"),
+):
+    # Ollama-compatible pass-through (n8n points its Ollama calls here) so they share the
+    # scheduler with ingestion. Non-incremental: a streamed answer is returned once complete.
+    if endpoint not in ("generate", "chat"):
+        raise HTTPException(status_code=404, detail="Only /api/generate and /api/chat are proxied")
+    if x_llm_priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"X-LLM-Priority must be one of {', '.join(PRIORITIES)}")
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    r = await run_in_threadpool(ollama_generate, body, x_llm_priority, None, f"/api/{endpoint}")
+    return Response(content=r.content, status_code=r.status_code,
+                    media_type=r.headers.get("content-type", "application/json"))
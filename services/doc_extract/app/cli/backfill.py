@@ -0,0 +1,269 @@
+"""
+Offline bulk backfill: ingest a directory of statements without going
+through /extract.
+
+    python -m cli.backfill [DIR] [--workers N] [--batch-files N] [--currency AED]
+
+- walks DIR (default UPLOAD_DIR) for PDFs / images
+- runs the extraction pipeline (parse + Ollama metadata) in a process pool
+- loads transactions with COPY into a staging table, then merges them
+  (dedup on txn_hash/date) into the partitioned transactions table
+- records one ingest_checkpoints row per file in the same transaction, so
+  an interrupted run resumes with the files that were not committed yet
+- reports files/sec and rows/sec
+"""
+import argparse, csv, hashlib, io, json, os, sys, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+from core.config import UPLOAD_DIR, DEFAULT_CURRENCY, EXTRACT_WORKERS, UPLOAD_CHUNK_SIZE, DATA_CHANGE_CHANNEL
+from core.money import to_minor, currency_exponent
+from db.database import engine, init_db
+from db.crud import hash_statement, hash_transaction
+from services.data_events import data_change
+
+
+EXTENSIONS = {".pdf": "application/pdf", ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+STAGING_COLUMNS = (
+    "statement_id", "txn_hash", "is_duplicate", "date", "description", "debit", "credit",
+    "balance_after", "currency", "currency_exponent", "direction", "confidence", "reference_id", "merchant", "category", "raw",
+)
+
+
+# -------------------------------------------------
+# Discovery + checkpoints
+# -------------------------------------------------
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def discover(root: str) -> list:
+    files = []
+    for dirpath, _dirs, names in os.walk(root):
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in EXTENSIONS:
+                files.append(os.path.join(dirpath, name))
+    return sorted(files)
+
+
+def load_done(conn) -> set:
+    cur = conn.cursor()
+    cur.execute("SELECT file_sha256 FROM ingest_checkpoints WHERE status = 'DONE'")
+    return {r[0] for r in cur.fetchall()}
+
+
+# -------------------------------------------------
+# Worker (runs in the process pool)
+# -------------------------------------------------
+
+def process_file(path: str, sha: str, currency: str, bank_hint, holder_hint) -> dict:
+    from services.extraction_service import parse_statement_file, resolve_statement_metadata
+
+    try:
+        mime = EXTENSIONS[os.path.splitext(path)[1].lower()]
+        text, txns, _pages = parse_statement_file(path, mime, currency)
+        meta = resolve_statement_metadata(text, currency, bank_hint, holder_hint, priority="background")
+        return {"path": path, "sha": sha, "meta": meta, "txns": txns, "error": None}
+    except Exception as e:
+        return {"path": path, "sha": sha, "meta": None, "txns": [], "error": f"{type(e).__name__}: {e}"}
+
+
+# -------------------------------------------------
+# COPY + merge (main process)
+# -------------------------------------------------
+
+def upsert_statement(cur, meta: dict, txns: list) -> int:
+    from services.extraction_service import reconcile_statement, compute_statement_confidence
+
+    period = meta["statement_period"]
+    llm = meta.get("llm") or {}
+    ok, diff = reconcile_statement(
+        meta["opening_balance"]["amount"], meta["closing_balance"]["amount"],
+        txns, meta["opening_balance"].get("currency"),
+    )
+    cur.execute(
+        """
+        INSERT INTO statements (bank_name, account_number, statement_hash, period_from, period_to,
+                                uploaded_at, is_reconciled, reconciliation_diff, statement_confidence,
+                                metadata_model, metadata_tier, metadata_ms)
+        VALUES (%s, %s, %s, %s, %s, now() at time zone 'utc', %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (statement_hash) DO UPDATE SET statement_hash = EXCLUDED.statement_hash
+        RETURNING id
+        """,
+        (
+            meta.get("bank_name"), meta["account_number"],
+            hash_statement(meta["account_number"], period["from"], period["to"]),
+            period["from"], period["to"], ok, diff, compute_statement_confidence(txns),
+            llm.get("model"), llm.get("tier"), llm.get("ms"),
+        ),
+    )
+    return cur.fetchone()[0]
+
+
+def _csv_value(v):
+    return "" if v is None else v
+
+
+def copy_batch(conn, batch: list) -> int:
+    """
+    One transaction per batch: statements, COPY -> staging, merge,
+    checkpoints. Returns the number of transaction rows inserted.
+    """
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TEMP TABLE txn_staging (
+            statement_id integer, txn_hash text, is_duplicate boolean, date date,
+            description text, debit bigint, credit bigint, balance_after bigint,
+            currency text, currency_exponent smallint, direction text, confidence integer,
+            reference_id text, merchant text, category text, raw json
+        ) ON COMMIT DROP
+    """)
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    months = set()
+    for res in batch:
+        if res["error"]:
+            continue
+        res["statement_id"] = upsert_statement(cur, res["meta"], res["txns"])
+        for t in res["txns"]:
+            cur_code = t["currency"]
+            months.add(t["date"][:7] + "-01")
+            writer.writerow([_csv_value(v) for v in (
+                res["statement_id"], hash_transaction(t), bool(t.get("is_duplicate", False)), t["date"],
+                t["description"],
+                to_minor(t.get("debit"), cur_code), to_minor(t.get("credit"), cur_code),
+                to_minor(t.get("balance_after"), cur_code), cur_code, currency_exponent(cur_code),
+                t["direction"], int(t.get("confidence", 0) * 100), t.get("reference_id"),
+                t.get("merchant"), t.get("category"),
+                json.dumps(t.get("raw") or {}),
+            )])
+
+    buf.seek(0)
+    cur.copy_expert(f"COPY txn_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    for m in sorted(months):
+        cur.execute("SELECT ensure_transactions_partition(%s)", (m,))
+
+    cols = ", ".join(STAGING_COLUMNS)
+    cur.execute(f"""
+        INSERT INTO transactions ({cols})
+        SELECT DISTINCT ON (s.txn_hash, s.date) {", ".join("s." + c for c in STAGING_COLUMNS)}
+        FROM txn_staging s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM transactions t WHERE t.txn_hash = s.txn_hash AND t.date = s.date
+        )
+        ORDER BY s.txn_hash, s.date
+    """)
+    inserted = cur.rowcount
+
+    for res in batch:
+        if not res["error"]:
+            # delivered with the commit below (services/data_events.py)
+            period = res["meta"]["statement_period"]
+            change = data_change(res["meta"].get("account_number"),
+                                 [t["date"] for t in res["txns"]] + [period["from"], period["to"]],
+                                 res["statement_id"], source="backfill")
+            cur.execute("SELECT pg_notify(%s, %s)", (DATA_CHANGE_CHANNEL, json.dumps(change)))
+        cur.execute(
+            """
+            INSERT INTO ingest_checkpoints (file_sha256, path, status, statement_id, rows, error, finished_at)
+            VALUES (%s, %s, %s, %s, %s, %s, now() at time zone 'utc')
+            ON CONFLICT (file_sha256) DO UPDATE SET
+              path = EXCLUDED.path, status = EXCLUDED.status, statement_id = EXCLUDED.statement_id,
+              rows = EXCLUDED.rows, error = EXCLUDED.error, finished_at = EXCLUDED.finished_at
+            """,
+            (
+                res["sha"], res["path"], "FAILED" if res["error"] else "DONE",
+                res.get("statement_id"), len(res["txns"]), res["error"],
+            ),
+        )
+
+    conn.commit()
+    return inserted
+
+
+# -------------------------------------------------
+# Entry point
+# -------------------------------------------------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk statement backfill")
+    ap.add_argument("directory", nargs="?", default=UPLOAD_DIR)
+    ap.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    ap.add_argument("--batch-files", type=int, default=20, help="files per COPY/merge transaction")
+    ap.add_argument("--currency", default=DEFAULT_CURRENCY)
+    ap.add_argument("--bank-hint", default=None)
+    ap.add_argument("--account-holder-hint", default=None)
+    args = ap.parse_args(argv)
+
+    init_db()
+    from services.extraction_service import resolve_currency
+    currency = resolve_currency(args.currency)
+
+    conn = engine.raw_connection()
+    try:
+        done = load_done(conn)
+        pending = []
+        for path in discover(args.directory):
+            sha = file_sha256(path)
+            if sha not in done:
+                pending.append((path, sha))
+                done.add(sha)  # identical content under another name is processed once
+
+        total = len(pending)
+        print(f"backfill: {total} file(s) to ingest from {args.directory} ({len(done) - total} already done)")
+        if not total:
+            return 0
+
+        t0 = time.perf_counter()
+        files_done = rows = failed = 0
+        batch = []
+
+        with ProcessPoolExecutor(
+            max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            futures = [
+                pool.submit(process_file, path, sha, currency, args.bank_hint, args.account_holder_hint)
+                for path, sha in pending
+            ]
+            for fut in as_completed(futures):
+                res = fut.result()
+                if res["error"]:
+                    failed += 1
+                    print(f"  ✗ {res['path']}: {res['error']}")
+                batch.append(res)
+                files_done += 1
+
+                if len(batch) >= args.batch_files or files_done == total:
+                    try:
+                        rows += copy_batch(conn, batch)
+                    except Exception:
+                        conn.rollback()
+                        print(traceback.format_exc())
+                        raise
+                    batch = []
+                    elapsed = time.perf_counter() - t0
+                    print(
+                        f"  {files_done}/{total} files, {rows} rows | "
+                        f"{files_done / elapsed:.2f} files/s, {rows / elapsed:.1f} rows/s"
+                    )
+
+        elapsed = time.perf_counter() - t0
+        print(
+            f"backfill: {files_done} files ({failed} failed), {rows} new rows in {elapsed:.1f}s | "
+            f"{files_done / elapsed:.2f} files/s, {rows / elapsed:.1f} rows/s"
+        )
+        return 1 if failed else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Bulk re-categorization of stored transactions (after the pattern list
+changed, or for rows ingested before categorization existed).
+
+    python -m cli.recategorize [--only-missing] [--since YYYY-MM-DD] [--batch-size N] [--dry-run]
+
+- streams (id, date, description) with a server-side cursor
+- categorizes each distinct description once per run (statements repeat
+  the same merchants over and over)
+- only rows whose merchant/category actually changed are written: COPY
+  into a staging table and a single UPDATE ... FROM per batch
+- reports rows/sec; bumps the data revision so cached read responses expire
+"""
+import argparse, csv, io, sys, time
+
+from db.database import engine, init_db, SessionLocal
+from db.crud import bump_data_revision
+from services.categorizer import categorize, get_automaton
+
+
+def _select_sql(only_missing: bool, since) -> tuple:
+    where, params = [], []
+    if only_missing:
+        where.append("category IS NULL")
+    if since:
+        where.append("date >= %s")
+        params.append(since)
+    sql = "SELECT id, date, description, raw->>'Description', merchant, category FROM transactions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, params
+
+
+def apply_batch(conn, rows: list) -> int:
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS recat_staging (
+            id integer, date date, merchant text, category text
+        ) ON COMMIT DELETE ROWS
+    """)
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cur.copy_expert("COPY recat_staging (id, date, merchant, category) FROM STDIN WITH (FORMAT csv)", buf)
+    cur.execute("ANALYZE recat_staging")  # row estimate -> index lookups by (id, date), not a scan per partition
+    cur.execute("""
+        UPDATE transactions t
+        SET merchant = NULLIF(s.merchant, ''), category = NULLIF(s.category, '')
+        FROM recat_staging s
+        WHERE t.id = s.id AND t.date = s.date
+    """)
+    changed = cur.rowcount
+    conn.commit()
+    return changed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Re-run merchant/category matching on stored transactions")
+    ap.add_argument("--only-missing", action="store_true", help="only rows without a category")
+    ap.add_argument("--since", default=None, help="only rows on/after this date (YYYY-MM-DD)")
+    ap.add_argument("--batch-size", type=int, default=20000)
+    ap.add_argument("--dry-run", action="store_true", help="match and count, do not write")
+    args = ap.parse_args(argv)
+
+    init_db()
+    get_automaton()  # build once before timing
+
+    reader = engine.raw_connection()
+    writer = engine.raw_connection()
+    try:
+        sql, params = _select_sql(args.only_missing, args.since)
+        cur = reader.cursor(name="recategorize")  # server-side: rows are streamed, not loaded
+        cur.itersize = args.batch_size
+        cur.execute(sql, params)
+
+        memo = {}
+        t0 = time.perf_counter()
+        seen = changed = matched = 0
+        while True:
+            rows = cur.fetchmany(args.batch_size)
+            if not rows:
+                break
+
+            out = []
+            for txn_id, d, desc, original, cur_merchant, cur_category in rows:
+                key = (desc, original)
+                hit = memo.get(key)
+                if hit is None:
+                    hit = memo[key] = categorize(desc, original)
+                merchant, category = hit
+                if category or merchant:
+                    matched += 1
+                if (merchant, category) != (cur_merchant, cur_category):
+                    out.append((txn_id, d, merchant or "", category or ""))
+
+            seen += len(rows)
+            if out and not args.dry_run:
+                changed += apply_batch(writer, out)
+            elif args.dry_run:
+                changed += len(out)
+
+            elapsed = time.perf_counter() - t0
+            print(f"  {seen} rows, {matched} matched, {changed} updated | {seen / elapsed:,.0f} rows/s")
+
+        elapsed = time.perf_counter() - t0
+        print(
+            f"recategorize: {seen} rows ({len(memo)} distinct descriptions), {matched} matched, "
+            f"{changed} updated in {elapsed:.1f}s | {seen / max(elapsed, 1e-9):,.0f} rows/s"
+            + (" (dry run: would update)" if args.dry_run else "")
+        )
+    finally:
+        reader.close()
+        writer.close()
+
+    if changed and not args.dry_run:
+        db = SessionLocal()
+        try:
+            bump_data_revision(db, "recategorize")
+        finally:
+            db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
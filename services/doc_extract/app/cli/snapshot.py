@@ -0,0 +1,33 @@
+"""
+Refresh the analytics Parquet snapshots (services/snapshots.py) from Postgres.
+
+    python -m cli.snapshot [--full]
+
+Incremental by default: only months with newly ingested transactions are
+re-exported. --full rebuilds every month (also done automatically after a
+data revision bump, e.g. cli.recategorize). Suitable for cron when the
+in-process scheduler is off (SNAPSHOT_INTERVAL=0).
+"""
+import argparse, sys
+
+from db.database import init_db
+from services.snapshots import refresh_snapshots
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Refresh the analytics Parquet snapshots")
+    ap.add_argument("--full", action="store_true", help="rebuild every month, not just changed ones")
+    args = ap.parse_args(argv)
+
+    init_db()
+    report = refresh_snapshots(full=args.full)
+    if report["status"] == "busy":
+        print("snapshot: another refresh is running")
+        return 1
+    print(f"snapshot: {report['status']}, {len(report['months'])} month(s), {report['rows']} rows "
+          f"in {report['seconds']}s (data version {report['version']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,4 +7,139 @@ DEFAULT_CURRENCY = os.getenv("DEFAULT_CURRENCY", "AED")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/data/uploads")
 
 OLLAMA_CONNECT_TIMEOUT = int(os.getenv("OLLAMA_CONNECT_TIMEOUT", "10"))
-OLLAMA_READ_TIMEOUT = int(os.getenv("OLLAMA_READ_TIMEOUT", "240"))
\ No newline at end of file
+OLLAMA_READ_TIMEOUT = int(os.getenv("OLLAMA_READ_TIMEOUT", "240"))
+
+# On-demand profiling of /extract (?profile=1 or X-Profile: 1); off unless enabled
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/data/profiles")
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+
+# CPU-bound extraction runs in a bounded process pool; requests beyond
+# workers + queue are rejected with 503 + Retry-After
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+EXTRACT_QUEUE_SIZE = int(os.getenv("EXTRACT_QUEUE_SIZE", "8"))
+EXTRACT_RETRY_AFTER = int(os.getenv("EXTRACT_RETRY_AFTER", "15"))
+
+# Uploads are streamed to disk in chunks; larger files are rejected with 413
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Startup: schema creation can be disabled once the DB is provisioned (one-off
+# `python -c "from db.database import init_db; init_db()"`), and the Ollama
+# model / Tesseract / extraction workers can be warmed before /ready turns green
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+# DB pools. The sync engine serves ingestion, CLIs and thread-pool work; read
+# endpoints use the async (asyncpg) engine unless DB_ASYNC_READS=false, which
+# puts them back on the thread pool + sync engine (for comparison / fallback).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_ASYNC_READS = os.getenv("DB_ASYNC_READS", "true").lower() in ("1", "true", "yes")
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "20"))
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", "30"))  # s waiting for a free connection
+
+# Read endpoints: strong ETag from the transaction data version (If-None-Match -> 304)
+# plus a small in-process LRU of rendered responses keyed by request + version
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+# FX rates: fetched by a pluggable provider ("http" = open.er-api.com, "file" =
+# local JSON in the same shape), stored in fx_rates and served from a TTL cache
+FX_PROVIDER = os.getenv("FX_PROVIDER", "http")
+FX_BASE_CURRENCY = os.getenv("FX_BASE_CURRENCY", "AED")
+FX_HTTP_URL = os.getenv("FX_HTTP_URL", "https://open.er-api.com/v6/latest/{base}")
+FX_FILE_PATH = os.getenv("FX_FILE_PATH", "/data/fx/rates.json")
+FX_CACHE_TTL = int(os.getenv("FX_CACHE_TTL", "3600"))      # seconds in memory
+FX_MAX_AGE = int(os.getenv("FX_MAX_AGE", str(12 * 3600)))  # stored snapshot older than this is refetched
+FX_FETCH_TIMEOUT = int(os.getenv("FX_FETCH_TIMEOUT", "10"))
+
+# Native /agent: resolvers run concurrently, each bounded by its own timeout (s).
+# The LLM is only asked for fields the deterministic query parser could not resolve.
+AGENT_EXPENSE_TIMEOUT = float(os.getenv("AGENT_EXPENSE_TIMEOUT", "20"))
+AGENT_WEATHER_TIMEOUT = float(os.getenv("AGENT_WEATHER_TIMEOUT", "20"))
+AGENT_FOREX_TIMEOUT = float(os.getenv("AGENT_FOREX_TIMEOUT", "10"))
+AGENT_LLM_FALLBACK = os.getenv("AGENT_LLM_FALLBACK", "true").lower() in ("1", "true", "yes")
+WEATHER_PROVIDER = os.getenv("WEATHER_PROVIDER", "openweathermap")  # or "file"
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "")
+OPENWEATHER_URL = os.getenv("OPENWEATHER_URL", "https://api.openweathermap.org/data/2.5/forecast")
+WEATHER_FILE_PATH = os.getenv("WEATHER_FILE_PATH", "/data/weather/forecast.json")
+
+# Streaming /extract/stream: how often progress events are collected from the worker (s)
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "0.1"))
+
+# Scanned PDFs: every page is classified from a low-dpi render first; only the
+# header page and pages that look like transactions get the full 300 dpi OCR.
+OCR_TRIAGE_ENABLED = os.getenv("OCR_TRIAGE_ENABLED", "true").lower() in ("1", "true", "yes")
+OCR_TRIAGE_DPI = int(os.getenv("OCR_TRIAGE_DPI", "50"))            # layout heuristics
+OCR_TRIAGE_DATE_DPI = int(os.getenv("OCR_TRIAGE_DATE_DPI", "100"))  # date OCR on ambiguous pages
+# OCR only the detected transaction table (+ header region), amounts with a digits whitelist
+OCR_TABLE_REGIONS = os.getenv("OCR_TABLE_REGIONS", "true").lower() in ("1", "true", "yes")
+
+# /transactions/search ranks at most this many (newest) matches
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+
+# /transactions/export: rows per Arrow record batch / Parquet row group (bounds server memory)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "50000"))
+
+# Analytics: monthly Parquet snapshots of transactions / statements under
+# ANALYTICS_DIR, refreshed incrementally every SNAPSHOT_INTERVAL s (0 = only via
+# cli.snapshot / POST /analytics/refresh) and queried with an embedded DuckDB
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "/data/analytics")
+SNAPSHOT_INTERVAL = int(os.getenv("SNAPSHOT_INTERVAL", "900"))
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "2"))
+DUCKDB_MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "512MB")
+
+# LLM scheduler (services/llm_scheduler.py): LLM_CONCURRENCY slots on the shared
+# Ollama (match OLLAMA_NUM_PARALLEL), per-class concurrency caps, max seconds a
+# call may wait for a slot and max queued calls before new ones are shed (503).
+# Classes: interactive (agent / n8n) > ingestion (/extract metadata) > background.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "1"))
+LLM_LIMITS = {
+    "interactive": int(os.getenv("LLM_LIMIT_INTERACTIVE", str(LLM_CONCURRENCY))),
+    "ingestion": int(os.getenv("LLM_LIMIT_INGESTION", str(LLM_CONCURRENCY))),
+    "background": int(os.getenv("LLM_LIMIT_BACKGROUND", "1")),
+}
+LLM_DEADLINES = {
+    "interactive": float(os.getenv("LLM_DEADLINE_INTERACTIVE", "20")),
+    "ingestion": float(os.getenv("LLM_DEADLINE_INGESTION", "600")),
+    "background": float(os.getenv("LLM_DEADLINE_BACKGROUND", "120")),
+}
+LLM_MAX_QUEUE = {
+    "interactive": int(os.getenv("LLM_MAX_QUEUE_INTERACTIVE", "64")),
+    "ingestion": int(os.getenv("LLM_MAX_QUEUE_INGESTION", "32")),
+    "background": int(os.getenv("LLM_MAX_QUEUE_BACKGROUND", "4")),
+}
+LLM_RETRY_AFTER = int(os.getenv("LLM_RETRY_AFTER", "30"))
+# higher-priority work granted this recently (s) still counts as pressure for degrading
+LLM_PRESSURE_WINDOW = float(os.getenv("LLM_PRESSURE_WINDOW", "30"))
+# degraded (under pressure) metadata prompt: head / tail chars of the statement text
+LLM_DEGRADED_HEAD_CHARS = int(os.getenv("LLM_DEGRADED_HEAD_CHARS", "6000"))
+LLM_DEGRADED_TAIL_CHARS = int(os.getenv("LLM_DEGRADED_TAIL_CHARS", "2000"))
+
+# Statement metadata model cascade: comma-separated tiers, fastest first. Each
+# answer is schema-constrained (Ollama `format`) and validated; an invalid
+# answer or a null key field escalates to the next tier. Default: OLLAMA_MODEL only.
+OLLAMA_METADATA_MODELS = [
+    m.strip() for m in os.getenv("OLLAMA_METADATA_MODELS", "").split(",") if m.strip()
+] or [OLLAMA_MODEL]
+# fields that must be non-null for a tier's answer to be accepted (dotted paths)
+METADATA_REQUIRED_FIELDS = [
+    f.strip() for f in os.getenv(
+        "METADATA_REQUIRED_FIELDS", "account_number,statement_period.from,statement_period.to"
+    ).split(",") if f.strip()
+]
+
+# Data-change bus: writers NOTIFY this channel on commit (account + date range);
+# each worker LISTENs and drops only the overlapping response-cache entries
+DATA_CHANGE_CHANNEL = os.getenv("DATA_CHANGE_CHANNEL", "finops_data_change")
+DATA_CHANGE_LISTEN = os.getenv("DATA_CHANGE_LISTEN", "true").lower() in ("1", "true", "yes")
+DATA_CHANGE_RECONNECT = float(os.getenv("DATA_CHANGE_RECONNECT", "5"))
+
+# Merchant / category patterns (CSV: pattern,merchant,category). The bundled
+# list can be extended or overridden by a local file without rebuilding.
+MERCHANT_PATTERNS_PATH = os.getenv(
+    "MERCHANT_PATTERNS_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "merchant_patterns.csv")
+)
+MERCHANT_PATTERNS_EXTRA_PATH = os.getenv("MERCHANT_PATTERNS_EXTRA_PATH", "/data/merchant_patterns.csv")
@@ -0,0 +1,40 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+# ISO 4217 minor-unit exponents (fils / paise = 2). Amounts are stored in the
+# DB as integers in minor units: 1050.75 AED -> 105075 with exponent 2.
+CURRENCY_EXPONENTS = {
+    "AED": 2,
+    "INR": 2,
+    "USD": 2,
+    "EUR": 2,
+    "GBP": 2,
+    "JPY": 0,
+    "KWD": 3,
+    "BHD": 3,
+    "OMR": 3,
+}
+DEFAULT_EXPONENT = 2
+
+
+def currency_exponent(currency: Optional[str]) -> int:
+    return CURRENCY_EXPONENTS.get((currency or "").upper(), DEFAULT_EXPONENT)
+
+
+def to_minor(amount, currency: Optional[str] = None) -> Optional[int]:
+    """
+    Major-unit amount (float / str / Decimal) -> exact integer minor units.
+    Goes through str() so 1050.75 does not become 105074.99999.
+    """
+    if amount is None:
+        return None
+    exp = currency_exponent(currency)
+    d = Decimal(str(amount)).scaleb(exp).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    return int(d)
+
+
+def from_minor(minor: Optional[int], exponent: int = DEFAULT_EXPONENT) -> Optional[float]:
+    # Only for presentation (JSON responses); aggregation stays in integers
+    if minor is None:
+        return None
+    return float(Decimal(int(minor)).scaleb(-exponent))
@@ -2,8 +2,14 @@
 
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from core.config import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, ASYNC_DB_POOL_SIZE, ASYNC_DB_MAX_OVERFLOW, ASYNC_DB_POOL_TIMEOUT,
+)
+
 POSTGRES_DSN = os.getenv("POSTGRES_DSN")
 
 if not POSTGRES_DSN:
@@ -12,8 +18,8 @@ if not POSTGRES_DSN:
 engine = create_engine(
     POSTGRES_DSN,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
 )
 
 SessionLocal = sessionmaker(
@@ -22,12 +28,40 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+# -------------------------------------------------
+# Async engine (asyncpg) for read endpoints: queries wait on the event loop
+# instead of holding a thread-pool thread each. Same database; the DSN is
+# POSTGRES_DSN with the driver swapped unless ASYNC_POSTGRES_DSN is set.
+# -------------------------------------------------
+
+ASYNC_POSTGRES_DSN = os.getenv("ASYNC_POSTGRES_DSN") or \
+    make_url(POSTGRES_DSN).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+async_engine = create_async_engine(
+    ASYNC_POSTGRES_DSN,
+    pool_pre_ping=True,
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_timeout=ASYNC_DB_POOL_TIMEOUT,
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 def init_db():
     """
-    Create all tables if they do not exist.
+    Create all tables if they do not exist, then bring existing
+    tables up to date (db/migrations.py).
     Safe to call multiple times.
     """
     import db.models
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    from db.migrations import run_migrations
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -0,0 +1,165 @@
+# app/db/migrations.py
+#
+# Idempotent, ordered schema migrations for existing databases.
+# create_all() only creates missing tables; anything that changes an existing
+# table goes here. Each step must be safe to run on both a fresh schema and
+# an old one (guard with information_schema checks).
+
+from sqlalchemy import text
+
+
+MIGRATIONS = [
+    (
+        "0001_money_minor_units",
+        # Integer major units -> BIGINT minor units (exponent 2 for AED/INR).
+        # Legacy inserts rounded 1050.75 to 1051; recover the exact value from
+        # raw (where the parser kept the original columns) when it matches.
+        """
+        DO $$
+        BEGIN
+          IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'transactions' AND column_name = 'currency_exponent'
+          ) THEN
+            ALTER TABLE transactions
+              ALTER COLUMN debit TYPE BIGINT USING (CASE
+                WHEN debit IS NULL THEN NULL
+                WHEN round((raw->>'Debit Amount')::numeric) = debit THEN round((raw->>'Debit Amount')::numeric * 100)
+                WHEN round((raw->>'Credit Amount')::numeric) = debit THEN round((raw->>'Credit Amount')::numeric * 100)
+                ELSE debit::bigint * 100 END),
+              ALTER COLUMN credit TYPE BIGINT USING (CASE
+                WHEN credit IS NULL THEN NULL
+                WHEN round((raw->>'Credit Amount')::numeric) = credit THEN round((raw->>'Credit Amount')::numeric * 100)
+                WHEN round((raw->>'Debit Amount')::numeric) = credit THEN round((raw->>'Debit Amount')::numeric * 100)
+                ELSE credit::bigint * 100 END),
+              ALTER COLUMN balance_after TYPE BIGINT USING (CASE
+                WHEN balance_after IS NULL THEN NULL
+                WHEN round((raw->>'Balance')::numeric) = balance_after THEN round((raw->>'Balance')::numeric * 100)
+                ELSE balance_after::bigint * 100 END),
+              ADD COLUMN currency_exponent SMALLINT NOT NULL DEFAULT 2;
+          END IF;
+
+          IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'manual_adjustments' AND column_name = 'currency_exponent'
+          ) THEN
+            ALTER TABLE manual_adjustments
+              ALTER COLUMN amount TYPE BIGINT USING amount::bigint * 100,
+              ADD COLUMN currency_exponent SMALLINT NOT NULL DEFAULT 2;
+          END IF;
+
+          IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'statements' AND column_name = 'reconciliation_diff'
+              AND data_type = 'double precision'
+          ) THEN
+            ALTER TABLE statements
+              ALTER COLUMN reconciliation_diff TYPE BIGINT USING round(reconciliation_diff * 100);
+          END IF;
+        END $$;
+        """,
+    ),
+    (
+        "0002_transactions_partition_fn",
+        # Creates (if missing) the monthly partition holding `d`. Called by the
+        # CRUD layer before inserts; concurrent callers serialise on an advisory lock.
+        """
+        CREATE OR REPLACE FUNCTION ensure_transactions_partition(d date) RETURNS text AS $fn$
+        DECLARE
+          start_d date := date_trunc('month', d)::date;
+          part text := format('transactions_y%sm%s', to_char(start_d, 'YYYY'), to_char(start_d, 'MM'));
+        BEGIN
+          IF to_regclass(part) IS NULL THEN
+            PERFORM pg_advisory_xact_lock(hashtext(part));
+            EXECUTE format(
+              'CREATE TABLE IF NOT EXISTS %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+              part, start_d, (start_d + interval '1 month')::date
+            );
+          END IF;
+          RETURN part;
+        END
+        $fn$ LANGUAGE plpgsql;
+        """,
+    ),
+    (
+        "0003_transactions_partitioned",
+        # Heap table -> partitioned table (fresh databases get it from create_all).
+        """
+        DO $$
+        DECLARE
+          m date;
+        BEGIN
+          IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'transactions' AND relkind = 'r') THEN
+            ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+            ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey;
+            ALTER TABLE transactions_unpartitioned DROP CONSTRAINT IF EXISTS transactions_duplicate_of_fkey;
+            ALTER INDEX IF EXISTS ix_transactions_statement_id RENAME TO ix_transactions_unpartitioned_statement_id;
+            ALTER INDEX IF EXISTS ix_transactions_txn_hash RENAME TO ix_transactions_unpartitioned_txn_hash;
+            ALTER SEQUENCE transactions_id_seq OWNED BY NONE;
+
+            CREATE TABLE transactions (
+              LIKE transactions_unpartitioned INCLUDING DEFAULTS,
+              PRIMARY KEY (id, date),
+              FOREIGN KEY (statement_id) REFERENCES statements (id)
+            ) PARTITION BY RANGE (date);
+            CREATE INDEX ix_transactions_statement_id ON transactions (statement_id);
+            CREATE INDEX ix_transactions_txn_hash ON transactions (txn_hash);
+            CREATE INDEX ix_transactions_date ON transactions (date);
+
+            FOR m IN SELECT DISTINCT date_trunc('month', date)::date FROM transactions_unpartitioned LOOP
+              PERFORM ensure_transactions_partition(m);
+            END LOOP;
+
+            INSERT INTO transactions SELECT * FROM transactions_unpartitioned;
+            DROP TABLE transactions_unpartitioned;
+            ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id;
+          END IF;
+        END $$;
+        """,
+    ),
+    (
+        "0004_transactions_description_search",
+        # Full-text search on description (GET /transactions/search): a stored
+        # generated tsvector maintained by Postgres on every insert/update, with a
+        # GIN index (created on the partitioned parent -> one per partition).
+        # 'simple' config: merchant names must not be stemmed or stop-worded.
+        """
+        ALTER TABLE transactions ADD COLUMN IF NOT EXISTS description_tsv tsvector
+          GENERATED ALWAYS AS (to_tsvector('simple', coalesce(description, ''))) STORED;
+        CREATE INDEX IF NOT EXISTS ix_transactions_description_tsv ON transactions USING gin (description_tsv);
+        """,
+    ),
+    (
+        "0005_transactions_merchant_category",
+        # filled for existing rows by `python -m cli.recategorize`
+        """
+        ALTER TABLE transactions ADD COLUMN IF NOT EXISTS merchant VARCHAR;
+        ALTER TABLE transactions ADD COLUMN IF NOT EXISTS category VARCHAR;
+        CREATE INDEX IF NOT EXISTS ix_transactions_merchant ON transactions (merchant);
+        CREATE INDEX IF NOT EXISTS ix_transactions_category ON transactions (category);
+        """,
+    ),
+    (
+        "0006_statements_metadata_model",
+        # which metadata cascade tier answered, and the LLM time over all tiers tried
+        """
+        ALTER TABLE statements ADD COLUMN IF NOT EXISTS metadata_model VARCHAR;
+        ALTER TABLE statements ADD COLUMN IF NOT EXISTS metadata_tier SMALLINT;
+        ALTER TABLE statements ADD COLUMN IF NOT EXISTS metadata_ms INTEGER;
+        """,
+    ),
+]
+
+
+def run_migrations(engine):
+    """
+    Apply MIGRATIONS in order (Postgres only). An advisory lock serialises
+    concurrent workers starting at the same time.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(727001)"))
+        for name, sql in MIGRATIONS:
+            conn.execute(text(sql))
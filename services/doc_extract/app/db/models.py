@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, JSON, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Date, DateTime, JSON, ForeignKey, Float, Boolean, Numeric
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 from db.database import Base
@@ -18,30 +18,45 @@ class Statement(Base):
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
     is_reconciled = Column(Boolean, default=False)
-    reconciliation_diff = Column(Float, nullable=True)
+    reconciliation_diff = Column(BigInteger, nullable=True)  # minor units
     statement_confidence = Column(Float, nullable=True)
+    metadata_model = Column(String, nullable=True)     # cascade tier that answered
+    metadata_tier = Column(SmallInteger, nullable=True)
+    metadata_ms = Column(Integer, nullable=True)       # LLM time over all tiers tried
     transactions = relationship("Transaction", back_populates="statement")
 
 
 class Transaction(Base):
     __tablename__ = "transactions"
-
-    id = Column(Integer, primary_key=True)
+    # Declaratively range-partitioned by month on `date` (Postgres). Monthly
+    # partitions are created on demand (crud.ensure_transaction_partitions);
+    # indexes declared here become partition-local indexes.
+    __table_args__ = {"postgresql_partition_by": "RANGE (date)"}
+
+    # the partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    date = Column(Date, primary_key=True, nullable=False, index=True)
     statement_id = Column(Integer, ForeignKey("statements.id"), index=True)
     txn_hash = Column(String, index=True, nullable=False)  # ✅ ADD THIS
 
     is_duplicate = Column(Boolean, default=False)
-    duplicate_of = Column(Integer, ForeignKey("transactions.id"), nullable=True)
+    duplicate_of = Column(Integer, nullable=True)  # no FK: id alone is not unique across partitions
 
-    date = Column(Date, nullable=False)
     description = Column(String, nullable=False)
-    debit = Column(Integer, nullable=True)
-    credit = Column(Integer, nullable=True)
-    balance_after = Column(Integer, nullable=True)
+    # description_tsv (generated tsvector + GIN index for search) is created by
+    # migration 0004 and deliberately not mapped: Postgres maintains it
+    # money columns are integer minor units (fils / paise): value / 10**currency_exponent
+    debit = Column(BigInteger, nullable=True)
+    credit = Column(BigInteger, nullable=True)
+    balance_after = Column(BigInteger, nullable=True)
     currency = Column(String, nullable=False)
+    currency_exponent = Column(SmallInteger, nullable=False, default=2, server_default="2")
     direction = Column(String, nullable=False)
     confidence = Column(Integer)
     reference_id = Column(String, nullable=True)
+    # normalized merchant + category from services/categorizer.py (cli.recategorize re-runs it)
+    merchant = Column(String, nullable=True, index=True)
+    category = Column(String, nullable=True, index=True)
     raw = Column(JSON)
 
     statement = relationship("Statement", back_populates="transactions")
@@ -55,8 +70,66 @@ class ManualAdjustment(Base):
 
     date = Column(Date, nullable=False)
     description = Column(String, nullable=False)
-    amount = Column(Integer, nullable=False)
+    amount = Column(BigInteger, nullable=False)  # minor units
+    currency_exponent = Column(SmallInteger, nullable=False, default=2, server_default="2")
     direction = Column(String, nullable=False)  # DEBIT / CREDIT
     reason = Column(String, nullable=True)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class IngestCheckpoint(Base):
+    """
+    One row per source file (keyed by content hash) processed by the bulk
+    backfill CLI; committed in the same transaction as the file's rows.
+    """
+    __tablename__ = "ingest_checkpoints"
+
+    file_sha256 = Column(String, primary_key=True)
+    path = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # DONE / FAILED
+    statement_id = Column(Integer, nullable=True)
+    rows = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LayoutTemplate(Base):
+    """
+    Learned column layout of a bank's transaction table, keyed by a
+    fingerprint of the table header (see services/layout_parser.py).
+    """
+    __tablename__ = "layout_templates"
+
+    fingerprint = Column(String, primary_key=True)
+    header = Column(String, nullable=False)
+    columns = Column(JSON, nullable=False)  # [{"role": "debit", "x0": 0.61, "x1": 0.72}, ...] page-relative
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FxRate(Base):
+    """
+    Exchange rate snapshots: 1 `base` = `rate` `quote`, one row per quote
+    currency per snapshot date (services/fx.py). Summaries convert by
+    joining this table, cross rates go through the base.
+    """
+    __tablename__ = "fx_rates"
+
+    base = Column(String(3), primary_key=True)
+    quote = Column(String(3), primary_key=True)
+    as_of = Column(Date, primary_key=True)
+    rate = Column(Numeric(24, 10), nullable=False)
+    source = Column(String, nullable=True)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DataRevision(Base):
+    """
+    Bumped by bulk rewrites of existing rows (e.g. cli.recategorize) so that
+    read-endpoint ETags change even though no new transaction id appeared.
+    """
+    __tablename__ = "data_revisions"
+
+    id = Column(Integer, primary_key=True)
+    reason = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,26 +1,59 @@
+from __future__ import annotations
+
 import re
-import fitz  # PyMuPDF
-import pdfplumber
-import pytesseract
-import cv2
-import numpy as np
-from PIL import Image
-
-def _preprocess_for_ocr(pil_img: Image.Image) -> Image.Image:
-    # Convert to grayscale + adaptive threshold (helps bank statement scans a lot)
-    img = np.array(pil_img.convert("RGB"))
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+from typing import Optional
+
+# fitz / pytesseract / cv2 / numpy / PIL are imported inside the
+# functions that need them: importing this module (and therefore main.py) stays
+# cheap, and only the extraction workers pay for the heavy native libraries.
+
+def _pixmap_gray_view(pix) -> np.ndarray:
+    import numpy as np
+
+    # Zero-copy: view the pixmap's sample buffer as an (h, w) uint8 array.
+    # Rows may be padded, so go through the stride and slice.
+    buf = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+    return buf.reshape(pix.height, pix.stride)[:, : pix.width]
+
+def _threshold_gray(gray: np.ndarray) -> np.ndarray:
+    import cv2
+
+    # Denoise + adaptive threshold (helps bank statement scans a lot)
     gray = cv2.bilateralFilter(gray, 9, 75, 75)  # denoise but keep edges
-    thr = cv2.adaptiveThreshold(
+    return cv2.adaptiveThreshold(
         gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 35, 11
     )
-    return Image.fromarray(thr)
 
-def _tesseract(img: Image.Image) -> str:
-    # Good default for statement-like blocks
-    config = r'--oem 1 --psm 6'
+def _preprocess_for_ocr(pil_img: Image.Image) -> np.ndarray:
+    import numpy as np
+
+    # Images only: PDF pages are rendered straight to grayscale (see _render_page_gray)
+    return _threshold_gray(np.asarray(pil_img.convert("L")))
+
+def _render_page_gray(page, dpi: int = 300) -> np.ndarray:
+    import fitz  # PyMuPDF
+
+    # Render directly in grayscale: 1 byte/pixel instead of RGB, no PIL round-trip
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return _threshold_gray(_pixmap_gray_view(pix))
+
+def _tesseract(img, config: str = r'--oem 1 --psm 6') -> str:
+    import pytesseract
+
+    # Accepts a PIL image or a uint8 ndarray
+    # Default (--psm 6) is good for statement-like blocks
     return pytesseract.image_to_string(img, lang="eng", config=config)
 
+def _ocr_page(img, first_page: bool) -> str:
+    from core.config import OCR_TABLE_REGIONS
+
+    # Table / header regions with their own OCR settings (see ocr_regions.py)
+    if OCR_TABLE_REGIONS:
+        from ocr_regions import ocr_page
+
+        return ocr_page(img, first_page, _tesseract)
+    return _tesseract(img)
+
 def _looks_like_real_text(text: str) -> bool:
     # If we extracted real PDF text, we should see enough alphanumerics + multiple lines
     if not text: 
@@ -28,30 +61,86 @@ def _looks_like_real_text(text: str) -> bool:
     stripped = re.sub(r"\s+", " ", text).strip()
     return len(stripped) > 200 and sum(c.isalnum() for c in stripped) > 150
 
-def extract_text(file_path: str, mime_type: str):
+def extract_text(file_path: str, mime_type: str, progress=None, word_lines: Optional[list] = None):
+    """
+    -> (text, method, pages) where pages reports what was read per page:
+    {"total", "ocr": [page numbers], "skipped": [{"page", "kind", "reason", "features"}]}
+    (pages are 1-based; "skipped" is only filled for triaged scans).
+
+    progress (optional, services.progress.ProgressReporter): gets one
+    "page" event per finished page and is checked for cancellation between pages.
+    word_lines (optional list): receives (page width, word lines) per digital
+    PDF page, for services.layout_parser without reading the PDF again.
+    """
     # PDFs
     if mime_type == "application/pdf" or file_path.lower().endswith(".pdf"):
-        # 1) Try digital text extraction first (highest accuracy)
+        import fitz  # PyMuPDF
+        from services.layout_parser import page_word_lines
+
+        # 1) Try digital text extraction first (highest accuracy): one word pass
+        # per page, the text rebuilt line by line from the same words the
+        # layout parser reads
         text = ""
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages[:50]:  # safety cap
-                t = page.extract_text() or ""
-                text += t + "\n"
+        with fitz.open(file_path) as doc:
+            pages = doc[:50]  # safety cap
+            for i, page in enumerate(pages):
+                if progress is not None:
+                    progress.check_cancelled()
+                lines = page_word_lines(page)
+                if word_lines is not None:
+                    word_lines.append((page.rect.width, lines))
+                text += "\n".join(" ".join(w[4] for w in line) for line in lines) + "\n"
+                if progress is not None:
+                    progress.emit("page", page=i + 1, pages=len(pages), method="pdf-text")
 
         if _looks_like_real_text(text):
-            return text, "pdf-text"
+            return text, "pdf-text", {"total": len(pages), "ocr": [], "skipped": []}
+
+        # 2) OCR fallback (scanned PDF): low-dpi triage, full OCR only where it pays off
+        from core.config import OCR_TRIAGE_ENABLED
+        from page_triage import classify_page
 
-        # 2) OCR fallback (scanned PDF)
         doc = fitz.open(file_path)
         out = []
-        for i, page in enumerate(doc[:25]):  # cap pages for v1
-            pix = page.get_pixmap(dpi=300)
-            pil = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            pil = _preprocess_for_ocr(pil)
-            out.append(_tesseract(pil))
-        return "\n".join(out), "tesseract-ocr"
+        pages = doc[:25]  # cap pages for v1
+        report = {"total": len(pages), "ocr": [], "skipped": []}
+        for i, page in enumerate(pages):
+            if progress is not None:
+                progress.check_cancelled()
+            triage = classify_page(page, i) if OCR_TRIAGE_ENABLED else None
+            if triage is not None and not triage["ocr"]:
+                report["skipped"].append({"page": i + 1, "kind": triage["kind"], "reason": triage["reason"],
+                                          "features": triage["features"]})
+                if progress is not None:
+                    progress.emit("page", page=i + 1, pages=len(pages), method="skipped", kind=triage["kind"])
+                continue
+            out.append(_ocr_page(_render_page_gray(page, dpi=300), first_page=(i == 0)))
+            report["ocr"].append(i + 1)
+            if progress is not None:
+                progress.emit("page", page=i + 1, pages=len(pages), method="tesseract-ocr",
+                              kind=triage["kind"] if triage else None)
+        return "\n".join(out), "tesseract-ocr", report
 
     # Images
+    from PIL import Image
+
     pil = Image.open(file_path)
-    pil = _preprocess_for_ocr(pil)
-    return _tesseract(pil), "tesseract-ocr"
\ No newline at end of file
+    text = _ocr_page(_preprocess_for_ocr(pil), first_page=True)
+    if progress is not None:
+        progress.emit("page", page=1, pages=1, method="tesseract-ocr")
+    return text, "tesseract-ocr", {"total": 1, "ocr": [1], "skipped": []}
+
+def warm_up_ocr() -> str:
+    """
+    Import the native PDF/OCR stack and probe the tesseract binary.
+    Runs in extraction workers (and optionally at startup) so the first
+    real request does not pay for it.
+    """
+    import cv2, fitz, numpy  # noqa: F401
+    import pytesseract
+
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception as e:
+        # pytesseract's errors do not pickle; keep the worker pool intact
+        raise RuntimeError(f"tesseract unavailable: {e}") from None
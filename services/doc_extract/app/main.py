@@ -1,6 +1,12 @@
 from fastapi import FastAPI
 from api.routes.extract import router as extract_router
-from db.database import init_db
+from db.database import init_db, async_engine
+from core.config import DB_INIT_ON_STARTUP
+from services.executor import shutdown_pool
+from services.warmup import start_warmup
+from services.snapshots import start_snapshot_scheduler
+from services.data_events import start_data_listener
+from services.http_cache import invalidate_response_cache
 
 
 # from app.db.database import engine, Base
@@ -12,7 +18,17 @@ app = FastAPI(title="doc-extract-service", version="0.5")
 
 @app.on_event("startup")
 def on_startup():
-    init_db()
+    if DB_INIT_ON_STARTUP:
+        init_db()
+    start_warmup()
+    start_snapshot_scheduler()
+    start_data_listener(invalidate_response_cache)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_pool()
+    await async_engine.dispose()
 
 
 app.include_router(extract_router)
\ No newline at end of file
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+from typing import List, Optional
+
+from page_triage import _bands
+
+# -------------------------------------------------
+# Region-specific OCR for statement pages
+#
+# Instead of one --psm 6 pass over the whole page, the transaction table is
+# located with OpenCV (ruled-line contours, or for unruled tables the longest
+# run of text lines that split into aligned columns) and OCR'd on its own:
+#   - text columns (dates, description, reference ids, value dates): --psm 6
+#   - amount columns: --psm 6 with a digits / separators whitelist, so
+#     "1,234.50" cannot come back as "l,Z34.5O". A column is an amount column
+#     when a debit / credit / balance header word sits over it (found in a
+#     text pass over the first table lines, layout_parser._find_header); with
+#     no such header, when nearly all of its words read as decimal amounts.
+# Words of both crops are put back on the table's text lines by position.
+# Logos, address blocks and long footers outside the table are not OCR'd;
+# the region above the table only on the first page (statement metadata),
+# the region below it only when it is short (balance summaries).
+# If no table is found the page is OCR'd whole, as before.
+# -------------------------------------------------
+
+TEXT_CONFIG = r"--oem 1 --psm 6"                # uniform block of text
+HEADER_CONFIG = r"--oem 1 --psm 4"              # single column, lines of varying size
+AMOUNT_CONFIG = r"--oem 1 --psm 6 -c tessedit_char_whitelist=0123456789.,-"
+
+MIN_TABLE_ROWS = 3       # row-like lines needed to call it a table
+MAX_ROW_GAP = 2          # non-row lines tolerated inside a table (wrapped descriptions)
+FOOTER_MAX_LINES = 6     # below-table text is OCR'd only when it is this short
+CROP_PAD = 6             # px around crops so glyph edges are not cut
+RULE_SCALE = 4           # ruled-line detection runs on a 4x downsampled mask
+HEADER_PROBE_LINES = 3   # table lines searched for the column header
+AMOUNT_COLUMN_SHARE = 0.8  # headerless tables: share of decimal amounts that makes an amount column
+
+AMOUNT_WORD = re.compile(r"-?\d[\d,]*\.\d{2}")
+
+
+def _ink(img):
+    import numpy as np
+
+    # thresholded page (see extractors._threshold_gray): dark text on white
+    return (np.asarray(img) < 128).astype(np.uint8)
+
+
+def _rules(ink):
+    import cv2
+    import numpy as np
+
+    # Long strokes survive an opening with a long thin kernel. Done at 1/RULE_SCALE
+    # (a block counts as ink if any of its pixels is) - big kernels are slow at 300 dpi.
+    h, w = ink.shape
+    small = (cv2.resize(ink, (w // RULE_SCALE, h // RULE_SCALE), interpolation=cv2.INTER_AREA) > 0).astype(np.uint8)
+    sh, sw = small.shape
+    masks = []
+    margin = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    for kernel in ((max(sw // 4, 1), 1), (1, max(sh // 10, 1))):
+        opened = cv2.morphologyEx(small, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, kernel))
+        # one block of margin around the stroke: anti-aliased edges and end caps are not text
+        opened = cv2.dilate(opened, margin)
+        full = np.zeros_like(ink)
+        full[: sh * RULE_SCALE, : sw * RULE_SCALE] = np.repeat(np.repeat(opened, RULE_SCALE, 0), RULE_SCALE, 1)
+        masks.append(full & ink)
+    return masks[0], masks[1]
+
+
+def _text_lines(text_ink) -> list:
+    h = text_ink.shape[0]
+    max_line_h = max(6, int(h * 0.03))
+    return [(int(a), int(b)) for a, b in _bands(text_ink.sum(axis=1) >= 3) if 4 <= b - a <= max_line_h]
+
+
+def _segments(row_mask, gap: int) -> list:
+    # ink runs along a line, words closer than `gap` merged into one segment
+    runs = _bands(row_mask)
+    merged = []
+    for a, b in runs:
+        if merged and a - merged[-1][1] < gap:
+            merged[-1] = (merged[-1][0], int(b))
+        else:
+            merged.append((int(a), int(b)))
+    return merged
+
+
+def _columns(text_ink, lines, x0: int, x1: int) -> list:
+    import numpy as np
+
+    w = text_ink.shape[1]
+    coverage = np.mean([text_ink[a:b, x0:x1].any(axis=0) for a, b in lines], axis=0)
+    min_gap = max(6, int(w * 0.015))
+    gutters = [(a, b) for a, b in _bands(coverage <= 0.15) if b - a >= min_gap]
+    cols, start = [], 0
+    for a, b in gutters:
+        if a > start:
+            cols.append((x0 + start, x0 + int(a)))
+        start = int(b)
+    if start < x1 - x0:
+        cols.append((x0 + start, x1))
+    return cols
+
+
+def find_table(img) -> Optional[dict]:
+    """
+    Transaction table of a thresholded page image:
+    {"box": (x0, y0, x1, y1), "lines": [(y_top, y_bottom)], "columns": [(x_left, x_right)]} or None.
+    """
+    import cv2
+
+    ink = _ink(img)
+    h, w = ink.shape
+    h_open, v_open = _rules(ink)
+    text_ink = ink & ~(h_open | v_open)
+    lines = _text_lines(text_ink)
+    if len(lines) < MIN_TABLE_ROWS:
+        return None
+
+    box = None
+    # 1) ruled table: biggest contour of the line grid
+    contours, _ = cv2.findContours(h_open | v_open, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if contours:
+        x, y, bw, bh = cv2.boundingRect(max(contours, key=cv2.contourArea))
+        if bw * bh >= 0.15 * w * h:
+            box = (x, y, x + bw, y + bh)
+
+    # 2) unruled table: longest run of lines that split into >= 3 column segments
+    if box is None:
+        gap = max(8, int(w * 0.02))
+        segs = [_segments(text_ink[a:b].any(axis=0), gap) for a, b in lines]
+        best, best_rows = None, 0
+        start = last = None
+        rows = misses = 0
+        # trailing False entries flush the last run
+        for i, row_like in enumerate([len(s) >= 3 for s in segs] + [False] * (MAX_ROW_GAP + 1)):
+            if row_like:
+                if start is None:
+                    start, rows = i, 0
+                last, rows, misses = i, rows + 1, 0
+            elif start is not None:
+                misses += 1
+                if misses > MAX_ROW_GAP:
+                    if rows > best_rows:
+                        best, best_rows = (start, last), rows
+                    start = None
+        if best_rows < MIN_TABLE_ROWS:
+            return None
+        first, last = best
+        x0 = min(segs[k][0][0] for k in range(first, last + 1) if segs[k])
+        x1 = max(segs[k][-1][1] for k in range(first, last + 1) if segs[k])
+        box = (x0, lines[first][0], x1, lines[last][1])
+
+    x0, y0, x1, y1 = box
+    table_lines = [(a, b) for a, b in lines if a >= y0 and b <= y1]
+    if len(table_lines) < MIN_TABLE_ROWS:
+        return None
+    return {"box": box, "lines": table_lines, "columns": _columns(text_ink, table_lines, x0, x1)}
+
+
+def _words(img, config: str, x_off: int, y_off: int) -> list:
+    import pytesseract
+
+    data = pytesseract.image_to_data(img, lang="eng", config=config, output_type=pytesseract.Output.DICT)
+    out = []
+    for text, conf, left, top, width, height in zip(data["text"], data["conf"], data["left"], data["top"],
+                                                    data["width"], data["height"]):
+        if text.strip() and float(conf) >= 0:
+            out.append((y_off + top + height / 2, x_off + left, x_off + left + width, text.strip()))
+    return out
+
+
+def _crop(img, x0: int, y0: int, x1: int, y1: int):
+    h, w = img.shape[:2]
+    return img[max(0, y0 - CROP_PAD): min(h, y1 + CROP_PAD), max(0, x0 - CROP_PAD): min(w, x1 + CROP_PAD)], \
+        max(0, x0 - CROP_PAD), max(0, y0 - CROP_PAD)
+
+
+def _line_of(lines: list, starts: list, cy: float) -> int:
+    # nearest detected text line by vertical centre
+    i = max(0, bisect_right(starts, cy) - 1)
+    if i + 1 < len(lines) and abs(sum(lines[i + 1]) / 2 - cy) < abs(sum(lines[i]) / 2 - cy):
+        i += 1
+    return i
+
+
+def _column_of(bounds: list, x: float) -> int:
+    return max(0, bisect_right(bounds, x) - 1)
+
+
+def _header_amount_columns(words: list, lines: list, starts: list, bounds: list):
+    """(header line index, amount column indexes) from debit / credit / balance header words, or None."""
+    from services.layout_parser import HEADER_ROLES, _find_header
+
+    by_line: dict = {}
+    for cy, wx0, wx1, text in words:
+        by_line.setdefault(_line_of(lines, starts, cy), []).append((wx0, cy, wx1, cy, text))
+    line_ids = sorted(by_line)
+    found = _find_header([sorted(by_line[i]) for i in line_ids])
+    if found is None:
+        return None
+    k, header = found
+    amount_cols = {_column_of(bounds, (w[0] + w[2]) / 2) for w in header
+                   if HEADER_ROLES.get(w[4].strip(".:").lower()) in ("debit", "credit", "balance")}
+    return line_ids[k], amount_cols
+
+
+def _numeric_amount_columns(words: list, bounds: list) -> set:
+    counts: dict = {}
+    for _, wx0, wx1, text in words:
+        c = _column_of(bounds, (wx0 + wx1) / 2)
+        n, amounts = counts.get(c, (0, 0))
+        counts[c] = (n + 1, amounts + bool(AMOUNT_WORD.fullmatch(text)))
+    return {c for c, (n, amounts) in counts.items() if n >= 2 and amounts >= AMOUNT_COLUMN_SHARE * n}
+
+
+def _runs(cols: list, amount_cols: set) -> list:
+    # consecutive columns of the same kind, one crop each: (first, last, is_amount)
+    runs = []
+    for i in range(len(cols)):
+        if runs and (i in amount_cols) == runs[-1][2]:
+            runs[-1] = (runs[-1][0], i, runs[-1][2])
+        else:
+            runs.append((i, i, i in amount_cols))
+    return runs
+
+
+def ocr_table(img, table: dict) -> str:
+    x0, y0, x1, y1 = table["box"]
+    cols = table["columns"]
+    lines = table["lines"]
+    starts = [a for a, _ in lines]
+
+    words = []
+    if len(cols) < 3:
+        crop, ox, oy = _crop(img, x0, y0, x1, y1)
+        words = _words(crop, TEXT_CONFIG, ox, oy)
+    else:
+        # column boundaries at the middle of each gutter
+        bounds = [x0] + [(cols[i][1] + cols[i + 1][0]) // 2 for i in range(len(cols) - 1)]
+        edges = bounds[1:] + [x1]
+
+        probe_y1 = lines[min(HEADER_PROBE_LINES, len(lines)) - 1][1]
+        crop, ox, oy = _crop(img, x0, y0, x1, probe_y1)
+        probe = _words(crop, TEXT_CONFIG, ox, oy)
+        header = _header_amount_columns(probe, lines, starts, bounds)
+        if header is not None:
+            # header and anything above it from the probe; the body column by column kind
+            header_line, amount_cols = header
+            words = [w for w in probe if _line_of(lines, starts, w[0]) <= header_line]
+            body_y0 = lines[header_line][1] + 1
+            if header_line + 1 < len(lines):
+                body_y0 = (body_y0 + lines[header_line + 1][0]) // 2
+            for first, last, is_amount in _runs(cols, amount_cols):
+                crop, ox, oy = _crop(img, bounds[first], body_y0, edges[last], y1)
+                # the crop padding reaches into the header row; its words are already in
+                words += [w for w in _words(crop, AMOUNT_CONFIG if is_amount else TEXT_CONFIG, ox, oy)
+                          if w[0] > body_y0 and bounds[first] <= (w[1] + w[2]) / 2 < edges[last]]
+        else:
+            crop, ox, oy = _crop(img, x0, y0, x1, y1)
+            words = _words(crop, TEXT_CONFIG, ox, oy)
+            amount_cols = _numeric_amount_columns(words, bounds)
+            for first, last, is_amount in _runs(cols, amount_cols):
+                if not is_amount:
+                    continue
+                inside = lambda w: bounds[first] <= (w[1] + w[2]) / 2 < edges[last]
+                crop, ox, oy = _crop(img, bounds[first], y0, edges[last], y1)
+                words = [w for w in words if not inside(w)] + \
+                    [w for w in _words(crop, AMOUNT_CONFIG, ox, oy) if inside(w)]
+
+    # back onto the detected text lines
+    rows: List[list] = [[] for _ in lines]
+    for cy, x, _, text in words:
+        rows[_line_of(lines, starts, cy)].append((x, text))
+    return "\n".join(" ".join(t for _, t in sorted(r)) for r in rows if r)
+
+
+def ocr_page(img, first_page: bool, tesseract) -> str:
+    """
+    Text of one thresholded page image. `tesseract(img, config)` is the
+    whole-region OCR call (extractors._tesseract).
+    """
+    table = find_table(img)
+    if table is None:
+        return tesseract(img, TEXT_CONFIG)
+
+    x0, y0, x1, y1 = table["box"]
+    parts = []
+    if first_page and y0 > CROP_PAD and _text_lines(_ink(img[:y0])):
+        parts.append(tesseract(img[:y0], HEADER_CONFIG))
+    parts.append(ocr_table(img, table))
+    below = img[y1:]
+    n_below = len(_text_lines(_ink(below))) if below.shape[0] > CROP_PAD else 0
+    if 0 < n_below <= FOOTER_MAX_LINES:
+        parts.append(tesseract(below, HEADER_CONFIG))
+    return "\n".join(parts)
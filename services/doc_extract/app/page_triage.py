@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import re
+import shutil
+from functools import lru_cache
+
+from core.config import OCR_TRIAGE_DPI, OCR_TRIAGE_DATE_DPI
+
+# -------------------------------------------------
+# Low-resolution page triage for scanned PDFs
+#
+# Full OCR is a 300 dpi render + tesseract per page. Statements carry cover,
+# T&C and marketing pages with no transactions, so every page is first
+# rendered at OCR_TRIAGE_DPI and classified from its layout:
+#   - text lines: horizontal ink bands of text height
+#   - table structure: column gutters shared by most lines, ruled lines
+#   - graphics: large filled blobs (logos, banners, photos)
+# Pages that are clearly tabular go to full OCR. Text pages without table
+# structure get a cheap OCR of a thumbnail and are kept only if it finds
+# transaction dates. When unsure, the page is kept: a skipped page loses
+# its transactions, an extra OCR only costs time.
+# -------------------------------------------------
+
+DATE_PATTERN = re.compile(
+    r"\b\d{1,2}[/\-.]\d{1,2}[/\-.]\d{2,4}\b"
+    r"|\b\d{1,2}[ \-](?:JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC)[A-Z]*[ \-]\d{2,4}\b",
+    re.IGNORECASE,
+)
+
+MIN_INK = 0.002          # below this share of dark pixels the page is blank
+MIN_TABLE_LINES = 5      # a transaction table has at least this many text lines
+MIN_DATES = 1            # any date on the thumbnail keeps a non-tabular page (short last pages)
+
+
+@lru_cache(maxsize=1)
+def _tesseract_available() -> bool:
+    return shutil.which("tesseract") is not None
+
+
+def _render_thumbnail(page, dpi: int):
+    import fitz  # PyMuPDF
+    import numpy as np
+
+    from extractors import _pixmap_gray_view
+
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return np.ascontiguousarray(_pixmap_gray_view(pix))
+
+
+def _bands(mask) -> list:
+    # runs of True in a 1-d mask -> [(start, end)]
+    import numpy as np
+
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2], edges[1::2]))
+
+
+def layout_features(gray) -> dict:
+    """Layout statistics of a low-dpi grayscale page (uint8, dark ink on light paper)."""
+    import cv2
+    import numpy as np
+
+    h, w = gray.shape
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    ink_ratio = float(ink.mean())
+    if ink_ratio < MIN_INK:
+        return {"ink": round(ink_ratio, 4), "text_lines": 0, "gutters": 0, "h_rules": 0, "v_rules": 0, "graphic": 0.0}
+
+    # Graphics: large components that are mostly filled (text glyphs are tiny at this dpi)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    graphic_px = 0
+    for x, y, bw, bh, area in stats[1:n]:
+        if bw * bh > 0.01 * w * h and area > 0.3 * bw * bh:
+            graphic_px += bw * bh
+    graphic = min(1.0, float(graphic_px) / (w * h))
+
+    # Ruled lines: long horizontal / vertical strokes that survive an opening
+    h_open = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (max(w // 4, 1), 1)))
+    v_open = cv2.morphologyEx(ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(h // 8, 1))))
+    h_rules = len(_bands(h_open.any(axis=1)))
+    v_rules = len(_bands(v_open.any(axis=0)))
+
+    # Text lines: row bands of text height (rules and graphics removed first)
+    text_ink = ink & ~(h_open | v_open)
+    max_line_h = max(3, int(h * 0.03))
+    lines = [(a, b) for a, b in _bands(text_ink.sum(axis=1) >= 2) if 2 <= b - a <= max_line_h]
+
+    # Column gutters: vertical strips that stay empty on (almost) every text line.
+    # Table columns line up, justified paragraphs do not.
+    gutters = 0
+    if len(lines) >= MIN_TABLE_LINES:
+        coverage = np.mean([text_ink[a:b].any(axis=0) for a, b in lines], axis=0)
+        used = np.flatnonzero(coverage > 0)
+        span = coverage[used[0]: used[-1] + 1]
+        min_gap = max(3, int(w * 0.02))
+        gutters = sum(1 for a, b in _bands(span <= 0.15) if b - a >= min_gap)
+
+    return {
+        "ink": round(ink_ratio, 4),
+        "text_lines": len(lines),
+        "gutters": gutters,
+        "h_rules": h_rules,
+        "v_rules": v_rules,
+        "graphic": round(graphic, 3),
+    }
+
+
+def count_dates_on_thumbnail(page) -> int:
+    import pytesseract
+
+    img = _render_thumbnail(page, OCR_TRIAGE_DATE_DPI)
+    text = pytesseract.image_to_string(img, lang="eng", config=r"--oem 1 --psm 6")
+    return len(DATE_PATTERN.findall(text))
+
+
+def classify_page(page, index: int) -> dict:
+    """
+    {"kind", "ocr", "reason", "features"} for one PDF page.
+    kind: header | transactions | blank | boilerplate | graphic | unknown
+    """
+    features = layout_features(_render_thumbnail(page, OCR_TRIAGE_DPI))
+
+    def result(kind: str, ocr: bool, reason: str) -> dict:
+        return {"kind": kind, "ocr": ocr, "reason": reason, "features": features}
+
+    if index == 0:
+        # statement metadata (holder, account, period, balances) lives here
+        return result("header", True, "first page")
+    if features["text_lines"] == 0:
+        return result("blank", False, "no text lines")
+
+    tabular = features["text_lines"] >= MIN_TABLE_LINES and (
+        features["gutters"] >= 2 or features["v_rules"] >= 2 or features["h_rules"] >= 4
+    )
+    if tabular:
+        return result("transactions", True, "table layout")
+
+    if not _tesseract_available():
+        return result("unknown", True, "no table layout, thumbnail OCR unavailable")
+    features["dates"] = count_dates_on_thumbnail(page)
+    if features["dates"] >= MIN_DATES:
+        return result("transactions", True, f"{features['dates']} dates on thumbnail")
+    if features["graphic"] >= 0.15:
+        return result("graphic", False, "mostly graphics, no dates")
+    return result("boilerplate", False, "running text, no dates")
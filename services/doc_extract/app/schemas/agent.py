@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any
+
+
+class AgentMeta(BaseModel):
+    user_id: Optional[str] = None
+    timezone: Optional[str] = None
+
+
+class AgentRequest(BaseModel):
+    # same body the UI posts to the n8n webhook
+    message: str = Field(..., min_length=1)
+    source: Optional[str] = None
+    meta: AgentMeta = AgentMeta()
+
+
+class AgentResponse(BaseModel):
+    answer: str
+    structured: Dict[str, Any]  # {"expenses": ..., "weather": ..., "forex": ...}
+    intents: List[str] = []
+    gatekeeper: Dict[str, Any] = {}
+    request_id: Optional[str] = None
+    timings_ms: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
@@ -6,6 +6,7 @@ class ExpenseSummaryRequest(BaseModel):
     year: int = Field(..., ge=2000, le=2100)
     month: int = Field(..., ge=1, le=12)
     account_number: Optional[str] = None  # optional, but recommended
+    target_currency: Optional[str] = Field(None, pattern="^[A-Z]{3}$")  # convert all rows via fx_rates
 
 
 class ExpenseSummaryResponse(BaseModel):
@@ -17,5 +18,7 @@ class ExpenseSummaryResponse(BaseModel):
     total_credit: float = 0.0
     net: float = 0.0  # credit - debit
     txn_count: int = 0
+    unconverted_txn_count: int = 0  # rows without an FX rate (only with target_currency)
+    fx_as_of: Optional[str] = None
 
     daily: List[Dict] = []  # [{"date":"YYYY-MM-DD","debit":..,"credit":..,"net":..,"count":..}]
\ No newline at end of file
@@ -23,6 +23,7 @@ class StatementMetadata(BaseModel):
     statement_period: StatementPeriod
     opening_balance: Balance
     closing_balance: Balance
+    llm: Optional[Dict[str, Any]] = None  # {"model", "tier", "missing", "ms", "attempts": [...]}
 
 
 class Transaction(BaseModel):
@@ -35,10 +36,14 @@ class Transaction(BaseModel):
     direction: str = Field(..., pattern="^(DEBIT|CREDIT)$")
     confidence: float = Field(..., ge=0.0, le=1.0)
     reference_id: Optional[str] = None
+    merchant: Optional[str] = None
+    category: Optional[str] = None
     raw: Dict[str, Any] = {}
 
 
 class ExtractResponse(BaseModel):
     statement_metadata: StatementMetadata
     transactions: List[Transaction]
+    pages: Optional[Dict[str, Any]] = None  # {"total", "ocr": [...], "skipped": [{"page", "kind", "reason", ...}]}
+    profile: Optional[Dict[str, Any]] = None  # only set for profiled requests
 
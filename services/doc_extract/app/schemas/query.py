@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+
+
+class QueryParseRequest(BaseModel):
+    message: str = Field(..., min_length=1)
+    user_timezone: Optional[str] = None  # e.g. "Asia/Dubai"; relative periods resolve against the user's today
+
+
+class QueryParseResponse(BaseModel):
+    period: Optional[Dict] = None          # {"from","to","month","year","granularity"[, "quarter"]}
+    currency_pair: Optional[Dict] = None   # {"from","to","country","inferred_from_country"}
+    city: Optional[Dict] = None            # {"name","country_code"}
+    confidence: Dict[str, float] = {}      # per field, 0..1
+    needs_llm: List[str] = []              # fields below the confidence threshold
+    reference_date: str
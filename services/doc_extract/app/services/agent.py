@@ -0,0 +1,310 @@
+import asyncio, json, re, time, uuid
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from core.config import (
+    OLLAMA_MODEL, OLLAMA_CONNECT_TIMEOUT,
+    AGENT_EXPENSE_TIMEOUT, AGENT_WEATHER_TIMEOUT, AGENT_FOREX_TIMEOUT, AGENT_LLM_FALLBACK,
+    WEATHER_PROVIDER, OPENWEATHER_API_KEY, OPENWEATHER_URL, WEATHER_FILE_PATH,
+)
+from db.database import AsyncSessionLocal
+from db.crud import get_monthly_expense_summary
+from services.query_parser import parse_query, parse_city
+from services.fx import get_rate
+from services.llm_scheduler import ollama_generate, LLMBusy
+
+
+# -------------------------------------------------
+# Native agent: same steps as the n8n flow (normalize -> gatekeeper ->
+# detect intents -> resolvers -> answer), but the expense / weather / forex
+# resolvers run concurrently, each with its own timeout, and a slow or
+# failing one only drops its own part of the answer.
+# -------------------------------------------------
+
+UNSAFE_KEYWORDS = ["hack", "exploit", "password", "credential", "malware", "kill", "suicide", "bomb", "attack"]
+
+INTENTS = {
+    "expense": re.compile(r"(expense|spend|spent|transaction|statement|debit|credit)"),
+    "weather": re.compile(r"(weather|temperature|rain|forecast|climate)"),
+    "forex": re.compile(r"(forex|exchange rate|convert|usd|aed|inr|gbp|eur)"),
+    "calendar": re.compile(r"(calendar|meeting|availability|schedule|free)"),
+    "secretary": re.compile(r"(note|task|remind|todo|remember)"),
+}
+
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June",
+               "July", "August", "September", "October", "November", "December"]
+MAX_SUMMARY_MONTHS = 24
+
+
+def gatekeeper(message: str) -> dict:
+    msg = (message or "").lower()
+    unsafe = any(k in msg for k in UNSAFE_KEYWORDS)
+    return {
+        "status": "unsafe" if unsafe else "safe",
+        "reason": "Matched blocked keyword" if unsafe else "Normal productivity request",
+    }
+
+
+def detect_intents(message: str) -> List[str]:
+    text = (message or "").lower()
+    detected = [name for name, rx in INTENTS.items() if rx.search(text)]
+    return detected or ["unknown"]
+
+
+def ollama_json(prompt: str) -> dict:
+    """Small JSON-only generation, used when the deterministic parser is not confident."""
+    r = ollama_generate(
+        {"model": OLLAMA_MODEL, "prompt": prompt, "stream": False, "options": {"temperature": 0}}, "interactive"
+    )
+    r.raise_for_status()
+    m = re.search(r"\{.*\}", r.json()["response"], re.DOTALL)
+    return json.loads(m.group(0)) if m else {}
+
+
+# -------------------------------------------------
+# Weather backends: city -> the weather dict of the n8n flow
+# -------------------------------------------------
+
+def _weather_from_forecast(data: dict) -> dict:
+    first = (data.get("list") or [{}])[0]
+    return {
+        "agent": "weather",
+        "city": (data.get("city") or {}).get("name"),
+        "forecast_time": first.get("dt_txt"),
+        "condition": ((first.get("weather") or [{}])[0]).get("main"),
+        "description": ((first.get("weather") or [{}])[0]).get("description"),
+        "temperature_c": (first.get("main") or {}).get("temp"),
+        "feels_like_c": (first.get("main") or {}).get("feels_like"),
+        "wind_speed": (first.get("wind") or {}).get("speed"),
+        "visibility_m": first.get("visibility"),
+    }
+
+
+def weather_openweathermap(city: str) -> dict:
+    r = requests.get(
+        OPENWEATHER_URL,
+        params={"q": city, "units": "metric", "appid": OPENWEATHER_API_KEY},
+        timeout=(OLLAMA_CONNECT_TIMEOUT, AGENT_WEATHER_TIMEOUT),
+    )
+    r.raise_for_status()
+    return _weather_from_forecast(r.json())
+
+
+def weather_file(city: str) -> dict:
+    # OpenWeatherMap /forecast response saved to disk (offline / tests)
+    with open(WEATHER_FILE_PATH) as f:
+        out = _weather_from_forecast(json.load(f))
+    out["city"] = out["city"] or city
+    return out
+
+
+WEATHER_BACKENDS: Dict[str, Callable[[str], dict]] = {"openweathermap": weather_openweathermap, "file": weather_file}
+
+
+def register_weather_backend(name: str, fn: Callable[[str], dict]):
+    WEATHER_BACKENDS[name] = fn
+
+
+# -------------------------------------------------
+# Resolvers (blocking ones run on worker threads, async ones on the loop)
+# -------------------------------------------------
+
+def _llm_period(message: str, today: date) -> Optional[dict]:
+    try:
+        parsed = ollama_json(
+            "You are a date extraction engine.\n"
+            "Extract the TARGET month and year related to EXPENSES from the user message.\n"
+            f"Today is {today.isoformat()}.\n"
+            "Return VALID JSON ONLY: {\"month\": <1-12 or null>, \"year\": <YYYY or null>}\n\n"
+            f"User message:\n{message}"
+        )
+    except LLMBusy:
+        return None  # LLM saturated: answer with the deterministic period instead of waiting
+    try:
+        month, year = int(parsed.get("month")), int(parsed.get("year"))
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= month <= 12:
+        return None
+    return {"month": month, "year": year, "granularity": "month",
+            "from": date(year, month, 1).isoformat(), "to": None}
+
+
+def _months_between(start: date, end: date) -> List[tuple]:
+    out, y, m = [], start.year, start.month
+    while (y, m) <= (end.year, end.month) and len(out) < MAX_SUMMARY_MONTHS:
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+async def resolve_expense(message: str, parsed: dict) -> Optional[dict]:
+    period = parsed["period"]
+    if "period" in parsed["needs_llm"] and AGENT_LLM_FALLBACK:
+        today = date.fromisoformat(parsed["reference_date"])
+        period = await asyncio.to_thread(_llm_period, message, today) or period
+    if period is None:
+        return None
+
+    if period["granularity"] == "month":
+        months = [(period["year"], period["month"])]
+    else:
+        months = _months_between(date.fromisoformat(period["from"]), date.fromisoformat(period["to"]))
+
+    # async engine: the summary queries do not hold a worker thread
+    async with AsyncSessionLocal() as db:
+        parts = [await db.run_sync(get_monthly_expense_summary, year=y, month=m) for y, m in months]
+
+    currencies = {p["currency"] for p in parts if p["txn_count"]}
+    daily = [d for p in parts for d in p["daily"]]
+    if period["granularity"] == "day":
+        # "March 15", "5 Oct to 20 Oct": totals from the days inside the period only
+        daily = [d for d in daily if period["from"] <= d["date"] <= period["to"]]
+        parts = [{"total_debit": d["debit"], "total_credit": d["credit"], "net": d["net"], "txn_count": d["count"]}
+                 for d in daily]
+    out = {
+        "year": months[0][0] if len(months) == 1 else None,
+        "month": months[0][1] if len(months) == 1 else None,
+        "period": period,
+        "currency": currencies.pop() if len(currencies) == 1 else None,
+        "total_debit": round(sum(p["total_debit"] for p in parts), 2),
+        "total_credit": round(sum(p["total_credit"] for p in parts), 2),
+        "net": round(sum(p["net"] for p in parts), 2),
+        "txn_count": sum(p["txn_count"] for p in parts),
+        "daily": daily,
+    }
+    return out
+
+
+def resolve_weather(message: str, parsed: dict) -> Optional[dict]:
+    city = (parsed["city"] or {}).get("name")
+    if "city" in parsed["needs_llm"] and AGENT_LLM_FALLBACK:
+        llm_city = ollama_json(
+            "You need to extract city/country.\nReturn VALID JSON ONLY.\nNo markdown. No explanations.\n"
+            "If city is missing, return null.\n\n"
+            f"User message:\n {message} \n\nExpected output format:\n{{\"city\": \"<city_name_or_null>\"}}"
+        ).get("city")
+        if llm_city:
+            known, _ = parse_city(llm_city)
+            city = known["name"] if known else str(llm_city)
+    if not city:
+        return None
+    return WEATHER_BACKENDS[WEATHER_PROVIDER](city)
+
+
+def resolve_forex(message: str, parsed: dict) -> Optional[dict]:
+    # same defaults as the n8n Currency Resolution node: AED -> USD
+    pair = parsed["currency_pair"] or {}
+    frm = pair.get("from") or "AED"
+    to = pair.get("to") or "USD"
+    out = get_rate(frm, to)
+    out["country"] = pair.get("country")
+    out["inferred_from_country"] = bool(pair.get("inferred_from_country"))
+    return out
+
+
+RESOLVERS = {
+    "expense": ("expenses", resolve_expense, AGENT_EXPENSE_TIMEOUT),
+    "weather": ("weather", resolve_weather, AGENT_WEATHER_TIMEOUT),
+    "forex": ("forex", resolve_forex, AGENT_FOREX_TIMEOUT),
+}
+
+
+# -------------------------------------------------
+# Answer
+# -------------------------------------------------
+
+def _fmt_num(x) -> str:
+    return f"{x:,.2f}" if isinstance(x, (int, float)) else str(x)
+
+
+def build_answer(expenses: Optional[dict], weather: Optional[dict], forex: Optional[dict]) -> str:
+    parts = []
+    if expenses:
+        base = expenses.get("currency") or (forex or {}).get("from") or "local currency"
+        if expenses.get("month"):
+            when = f"In {MONTH_NAMES[expenses['month'] - 1]} {expenses['year']}"
+        else:
+            when = f"Between {expenses['period']['from']} and {expenses['period']['to']}"
+        text = (f"{when}, you had {expenses['txn_count']} transactions with a total spend of "
+                f"{base} {_fmt_num(expenses['total_debit'])}.")
+        if forex and forex.get("rate") and forex.get("to") and forex.get("from") == base:
+            text += (f" That is approximately {forex['to']} {expenses['total_debit'] * forex['rate']:,.2f}"
+                     f" at the current exchange rate.")
+        parts.append(text)
+    elif forex and forex.get("rate"):
+        parts.append(f"1 {forex['from']} = {forex['rate']:.4f} {forex['to']} (as of {forex.get('as_of')}).")
+
+    if weather:
+        parts.append(
+            f"Weather in {weather['city']} around {weather['forecast_time']} is {weather['description']}, "
+            f"with a temperature of {weather['temperature_c']}°C (feels like {weather['feels_like_c']}°C), "
+            f"wind speed of {weather['wind_speed']} m/s and visibility up to {weather['visibility_m']} meters."
+        )
+    return "\n\n".join(parts)
+
+
+# -------------------------------------------------
+# Entry point
+# -------------------------------------------------
+
+async def _run_resolver(name: str, fn, timeout: float, message: str, parsed: dict):
+    t0 = time.perf_counter()
+    try:
+        # blocking HTTP work on a worker thread; wait_for bounds this resolver only
+        work = fn(message, parsed) if asyncio.iscoroutinefunction(fn) else asyncio.to_thread(fn, message, parsed)
+        result = await asyncio.wait_for(work, timeout=timeout)
+        error = None
+    except asyncio.TimeoutError:
+        result, error = None, f"timed out after {timeout:g}s"
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {getattr(e, 'detail', e)}"
+    return name, result, error, round((time.perf_counter() - t0) * 1000, 1)
+
+
+async def handle_agent(message: str, user_timezone: Optional[str] = None, user_id: Optional[str] = None,
+                       source: Optional[str] = None) -> Dict[str, Any]:
+    request_id = uuid.uuid4().hex[:12]
+    gate = gatekeeper(message)
+    structured: Dict[str, Any] = {"expenses": None, "weather": None, "forex": None}
+
+    if gate["status"] != "safe":
+        return {
+            "answer": "Sorry, I can't help with that request.",
+            "structured": structured,
+            "intents": [],
+            "gatekeeper": gate,
+            "request_id": request_id,
+        }
+
+    intents = detect_intents(message)
+    parsed = parse_query(message, timezone=user_timezone)
+
+    tasks = [
+        _run_resolver(key, fn, timeout, message, parsed)
+        for intent, (key, fn, timeout) in RESOLVERS.items()
+        if intent in intents
+    ]
+    errors, timings = {}, {}
+    for key, result, error, ms in await asyncio.gather(*tasks):
+        structured[key] = result
+        timings[key] = ms
+        if error:
+            errors[key] = error
+
+    answer = build_answer(structured["expenses"], structured["weather"], structured["forex"])
+    if not answer:
+        answer = "I couldn't find anything to answer that yet." if errors or tasks else \
+            "I can help with expenses, weather and exchange rates."
+
+    return {
+        "answer": answer,
+        "structured": structured,
+        "intents": intents,
+        "gatekeeper": gate,
+        "request_id": request_id,
+        "timings_ms": timings,
+        "errors": errors,
+    }
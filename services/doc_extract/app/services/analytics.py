@@ -0,0 +1,175 @@
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from core.config import ANALYTICS_DIR, DUCKDB_THREADS, DUCKDB_MEMORY_LIMIT
+from services.snapshots import load_manifest
+
+
+# -------------------------------------------------
+# Analytics over the Parquet snapshots (services/snapshots.py)
+#
+# An embedded, in-process DuckDB reads the month-partitioned files, so
+# multi-year scans (YoY, rolling averages, category trends) never touch
+# Postgres. One connection per process; each request gets its own cursor.
+# Date filters also prune on the `month` partition, so a range only opens
+# the files it needs. Money is in major units per currency (no FX: totals
+# are never summed across currencies). duckdb is imported lazily.
+# -------------------------------------------------
+
+_con = None
+_con_lock = threading.Lock()
+
+
+def _connection():
+    global _con
+    with _con_lock:
+        if _con is None:
+            import duckdb
+
+            con = duckdb.connect(config={"threads": DUCKDB_THREADS, "memory_limit": DUCKDB_MEMORY_LIMIT})
+            # views are re-planned per query: files written by later refreshes are picked up
+            con.execute(f"""
+                CREATE VIEW transactions AS SELECT * FROM read_parquet(
+                    '{ANALYTICS_DIR}/transactions/*/*.parquet', hive_partitioning = true,
+                    hive_types = {{'month': VARCHAR}})
+            """)
+            con.execute(f"CREATE VIEW statements AS SELECT * FROM read_parquet('{ANALYTICS_DIR}/statements/*.parquet')")
+            _con = con
+        return _con
+
+
+def snapshot_version() -> str:
+    """Data version of the current snapshot (ETag input); 503 until the first refresh."""
+    manifest = load_manifest()
+    if not manifest or not manifest["months"]:
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics snapshot not built yet: POST /analytics/refresh or run python -m cli.snapshot",
+        )
+    return manifest["version"]
+
+
+def _filtered(date_from: Optional[date], date_to: Optional[date], account_number: Optional[str],
+              category: Optional[str]) -> tuple:
+    # (SQL of the filtered transaction rows, params)
+    where, params = [], []
+    if date_from:
+        where += ["t.month >= ?", "t.date >= ?"]
+        params += [f"{date_from:%Y-%m}", date_from]
+    if date_to:
+        where += ["t.month <= ?", "t.date <= ?"]
+        params += [f"{date_to:%Y-%m}", date_to]
+    if category:
+        where.append("t.category = ?")
+        params.append(category)
+    sql = "SELECT t.date, t.debit, t.credit, t.currency, coalesce(t.category, 'Uncategorized') AS category FROM transactions t"
+    if account_number:
+        sql += " JOIN statements s ON s.id = t.statement_id"
+        where.append("s.account_number = ?")
+        params.append(account_number)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, params
+
+
+def _rows(sql: str, params: list) -> List[Dict[str, Any]]:
+    cur = _connection().cursor()
+    try:
+        cur.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        return [dict(zip(names, r)) for r in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def year_over_year(granularity: str = "year", account_number: Optional[str] = None,
+                   category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Spend per year (or per calendar month) next to the same period a year earlier."""
+    base, params = _filtered(None, None, account_number, category)
+    period = "year(date)" if granularity == "year" else "year(date), month(date)"
+    keys = "year" if granularity == "year" else "year, month"
+    cols = "year(date) AS year" if granularity == "year" else "year(date) AS year, month(date) AS month"
+    part = "currency" if granularity == "year" else "currency, month"
+    sql = f"""
+        WITH f AS ({base}),
+        p AS (
+            SELECT {cols}, currency, round(sum(debit), 2) AS spend, round(sum(credit), 2) AS income,
+                   count(*) AS txn_count
+            FROM f GROUP BY {period}, currency
+        )
+        SELECT *, round(100 * (spend - prev_spend) / nullif(prev_spend, 0), 1) AS spend_change_pct
+        FROM (
+            -- the row exactly one year back (NULL when that period has no data)
+            SELECT *, max(spend) OVER (PARTITION BY {part} ORDER BY year
+                                       RANGE BETWEEN 1 PRECEDING AND 1 PRECEDING) AS prev_spend
+            FROM p
+        )
+        ORDER BY currency, {keys}
+    """
+    return _rows(sql, params)
+
+
+def rolling_spend(window: int = 3, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                  account_number: Optional[str] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Monthly spend with a rolling `window`-month average. Months without
+    transactions count as zero (RANGE frame on a month index, not ROWS).
+    """
+    base, params = _filtered(date_from, date_to, account_number, category)
+    sql = f"""
+        WITH f AS ({base}),
+        m AS (
+            SELECT date_trunc('month', date)::DATE AS month, currency,
+                   sum(debit) AS spend, count(*) AS txn_count
+            FROM f GROUP BY 1, 2
+        )
+        SELECT month, currency, round(spend, 2) AS spend, txn_count,
+               -- the first months of the series average over the months seen so far
+               round(sum(spend) OVER w / least({int(window)}, idx - min(idx) OVER (PARTITION BY currency) + 1), 2)
+                   AS rolling_avg,
+               count(*) OVER w AS months_with_data
+        FROM (SELECT *, year(month) * 12 + month(month) AS idx FROM m)
+        WINDOW w AS (PARTITION BY currency ORDER BY idx RANGE BETWEEN {int(window) - 1} PRECEDING AND CURRENT ROW)
+        ORDER BY currency, month
+    """
+    return _rows(sql, params)
+
+
+def category_trends(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    account_number: Optional[str] = None, top: int = 10) -> Dict[str, Any]:
+    """
+    Per-category totals with a linear trend (change in monthly spend per
+    month, least squares) and the monthly series of the `top` categories.
+    """
+    base, params = _filtered(date_from, date_to, account_number, None)
+    monthly_sql = f"""
+        WITH f AS ({base})
+        SELECT category, currency, date_trunc('month', date)::DATE AS month,
+               sum(debit) AS spend, count(*) AS txn_count
+        FROM f WHERE debit IS NOT NULL GROUP BY 1, 2, 3
+    """
+    sql = f"""
+        WITH m AS ({monthly_sql}),
+        c AS (
+            SELECT category, currency, round(sum(spend), 2) AS total_spend, sum(txn_count) AS txn_count,
+                   count(*) AS months, round(avg(spend), 2) AS avg_monthly_spend,
+                   CASE WHEN count(*) > 1 THEN round(regr_slope(spend, year(month) * 12 + month(month)), 2)
+                   END AS trend_per_month,
+                   row_number() OVER (PARTITION BY currency ORDER BY sum(spend) DESC) AS rank
+            FROM m GROUP BY 1, 2
+        )
+        SELECT * FROM c WHERE rank <= ? ORDER BY currency, rank
+    """
+    categories = _rows(sql, params + [top])
+    series = _rows(f"""
+        WITH m AS ({monthly_sql}),
+        c AS (SELECT category, currency, row_number() OVER (PARTITION BY currency ORDER BY sum(spend) DESC) AS rank
+              FROM m GROUP BY 1, 2)
+        SELECT m.category, m.currency, m.month, round(m.spend, 2) AS spend, m.txn_count
+        FROM m JOIN c USING (category, currency)
+        WHERE c.rank <= ? ORDER BY m.currency, c.rank, m.month
+    """, params + [top])
+    return {"categories": categories, "monthly": series}
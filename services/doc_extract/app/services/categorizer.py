@@ -0,0 +1,128 @@
+import csv, os, re
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from core.config import MERCHANT_PATTERNS_PATH, MERCHANT_PATTERNS_EXTRA_PATH
+
+# -------------------------------------------------
+# Merchant normalization + categorization
+#
+# All patterns go into one Aho-Corasick automaton, so a description is
+# matched against every pattern in a single left-to-right pass (cost grows
+# with the description, not with the number of patterns). Descriptions and
+# patterns are normalized to " WORD WORD " (upper case, non-alphanumerics
+# collapsed to one space, padded), so a pattern can only match whole words.
+# When several patterns match, a pattern naming a merchant beats a
+# category-only keyword ("CARREFOUR" over "RESTAURANT"), then the longest
+# wins ("CAREEM FOOD" over "CAREEM").
+# -------------------------------------------------
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9&]+")
+
+
+def normalize(text: str) -> str:
+    return " " + _NON_ALNUM.sub(" ", (text or "").upper()).strip() + " "
+
+
+class Automaton:
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Optional[int]] = [None]  # best pattern index ending here
+        self.patterns: List[Tuple[str, str, str]] = []  # (normalized pattern, merchant, category)
+
+    def add(self, pattern: str, merchant: str, category: str):
+        key = normalize(pattern)
+        if key.strip() == "":
+            return
+        idx = len(self.patterns)
+        self.patterns.append((key, merchant, category))
+        node = 0
+        for ch in key:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(None)
+            node = nxt
+        # later files override earlier ones for the same pattern
+        self.out[node] = idx
+
+    def _better(self, a: Optional[int], b: Optional[int]) -> Optional[int]:
+        if a is None:
+            return b
+        if b is None:
+            return a
+        pa, pb = self.patterns[a], self.patterns[b]
+        return a if (bool(pa[1]), len(pa[0])) >= (bool(pb[1]), len(pb[0])) else b
+
+    def build(self):
+        # BFS over the trie: failure links + merged outputs
+        queue = deque()
+        for nxt in self.goto[0].values():
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self._better(self.out[nxt], self.out[self.fail[nxt]])
+        return self
+
+    def best_match(self, text: str) -> Optional[Tuple[str, str, str]]:
+        node, best = 0, None
+        goto, fail, out = self.goto, self.fail, self.out
+        for ch in normalize(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] is not None:
+                best = self._better(best, out[node])
+        return self.patterns[best] if best is not None else None
+
+
+def _read_patterns(path: str) -> List[Tuple[str, str, str]]:
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            pattern = (r.get("pattern") or "").strip()
+            if pattern:
+                rows.append((pattern, (r.get("merchant") or "").strip(), (r.get("category") or "").strip()))
+    return rows
+
+
+_automaton: Optional[Automaton] = None
+
+
+def get_automaton() -> Automaton:
+    """Built once per process from the bundled list plus the optional local one."""
+    global _automaton
+    if _automaton is None:
+        ac = Automaton()
+        for path in (MERCHANT_PATTERNS_PATH, MERCHANT_PATTERNS_EXTRA_PATH):
+            if path and os.path.exists(path):
+                for pattern, merchant, category in _read_patterns(path):
+                    ac.add(pattern, merchant, category)
+        _automaton = ac.build()
+    return _automaton
+
+
+def categorize(description: str, fallback: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (merchant, category) for a cleaned description. `fallback` (the original
+    description) is tried when nothing matches, since clean_description drops
+    tokens such as ATM / POS. Patterns without a merchant only set the category.
+    """
+    ac = get_automaton()
+    hit = ac.best_match(description)
+    if hit is None and fallback and fallback != description:
+        hit = ac.best_match(fallback)
+    if hit is None:
+        return None, None
+    _key, merchant, category = hit
+    return merchant or None, category or None
@@ -0,0 +1,161 @@
+import json, select, threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from core.config import DATA_CHANGE_CHANNEL, DATA_CHANGE_LISTEN, DATA_CHANGE_RECONNECT
+
+
+# -------------------------------------------------
+# Data-change bus (Postgres LISTEN / NOTIFY)
+#
+# Writers queue a NOTIFY on DATA_CHANGE_CHANNEL inside their own transaction,
+# so it is delivered on commit and never for a rollback. Payload (JSON):
+#   {"account_number", "date_from", "date_to", "statement_id", "source"}
+# A None field is unbounded: {"source": "revision:..."} (bulk rewrite of
+# existing rows) affects everything.
+# DataChangeListener holds one dedicated connection per process and calls
+# its handlers with each change. NOTIFY is not durable: on every (re)connect
+# the handlers get a full change, since anything may have happened while
+# nobody listened; caches must not trust themselves while `connected` is
+# False. The Streamlit UI has its own copy (services/streamlit_ui/app/data_events.py).
+# Read-your-writes: delivery is asynchronous, so another process may serve
+# a scoped cache entry from before a commit for a few milliseconds after it
+# (the writing worker invalidates its own cache synchronously). Unlike the
+# max-id ETag, a scoped entry is not re-checked against the database.
+# -------------------------------------------------
+
+FULL_CHANGE = {"account_number": None, "date_from": None, "date_to": None, "statement_id": None, "source": "listen"}
+
+
+def data_change(account_number: Optional[str], dates: Iterable[Any], statement_id: Optional[int] = None,
+                source: str = "extract") -> Dict[str, Any]:
+    """Change covering `dates` (ISO strings / dates; the min..max range) of one account."""
+    days = sorted(str(d)[:10] for d in dates if d)
+    return {
+        "account_number": account_number,
+        "date_from": days[0] if days else None,
+        "date_to": days[-1] if days else None,
+        "statement_id": statement_id,
+        "source": source,
+    }
+
+
+def notify_data_change(db: Session, change: Dict[str, Any]):
+    """Queue the NOTIFY in the session's transaction; sent when the caller commits."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": DATA_CHANGE_CHANNEL, "payload": json.dumps(change, default=str)},
+    )
+
+
+def affects(change: Dict[str, Any], scope: Dict[str, Any]) -> bool:
+    """
+    True if `change` may alter data read with `scope` ({"account_number",
+    "date_from", "date_to"} or {"statement_id"}; missing / None = unbounded).
+    """
+    if scope.get("statement_id") is not None and change.get("statement_id") is not None:
+        return scope["statement_id"] == change["statement_id"]
+    account = scope.get("account_number")
+    if account is not None and change.get("account_number") not in (None, account):
+        return False
+    lo, hi = scope.get("date_from"), scope.get("date_to")
+    if hi is not None and change.get("date_from") is not None and change["date_from"] > str(hi)[:10]:
+        return False
+    if lo is not None and change.get("date_to") is not None and change["date_to"] < str(lo)[:10]:
+        return False
+    return True
+
+
+class DataChangeListener:
+    def __init__(self, dsn: str, channel: str = DATA_CHANGE_CHANNEL, reconnect_s: float = DATA_CHANGE_RECONNECT):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_s = reconnect_s
+        self.connected = False
+        self.received = 0
+        self._handlers: List[Callable[[Dict[str, Any]], Any]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, handler: Callable[[Dict[str, Any]], Any]):
+        self._handlers.append(handler)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="data-change-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _dispatch(self, change: Dict[str, Any]):
+        for handler in self._handlers:
+            try:
+                handler(change)
+            except Exception as e:
+                print(f"⚠️ data-change handler {getattr(handler, '__name__', handler)} failed: {e}")
+
+    def _listen(self):
+        import psycopg2
+        from psycopg2 import sql
+
+        conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10,
+                                keepalives_count=3)
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+            self._dispatch(dict(FULL_CHANGE))  # before `connected`: no stale entry is served meanwhile
+            self.connected = True
+            while not self._stop.is_set():
+                if not select.select([conn], [], [], 1.0)[0]:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    note = conn.notifies.pop(0)
+                    try:
+                        change = json.loads(note.payload)
+                    except ValueError:
+                        change = dict(FULL_CHANGE, source="unparsed")
+                    self.received += 1
+                    self._dispatch(change)
+        finally:
+            self.connected = False
+            conn.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"⚠️ data-change listener on {self.channel!r}: {e}; reconnecting in {self.reconnect_s:g}s")
+            self._stop.wait(self.reconnect_s)
+
+
+def _listener_dsn() -> str:
+    from db.database import POSTGRES_DSN
+
+    # libpq takes postgresql:// URLs; drop a SQLAlchemy driver suffix (postgresql+psycopg2)
+    return make_url(POSTGRES_DSN).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+listener: Optional[DataChangeListener] = None
+
+
+def start_data_listener(*handlers: Callable[[Dict[str, Any]], Any]):
+    """LISTEN in a daemon thread for this process (DATA_CHANGE_LISTEN=false disables it)."""
+    global listener
+    if not DATA_CHANGE_LISTEN or listener is not None:
+        return
+    listener = DataChangeListener(_listener_dsn())
+    for handler in handlers:
+        listener.subscribe(handler)
+    listener.start()
+
+
+def listening() -> bool:
+    return listener is not None and listener.connected
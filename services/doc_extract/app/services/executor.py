@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from core.config import EXTRACT_WORKERS, EXTRACT_QUEUE_SIZE, EXTRACT_RETRY_AFTER
+
+
+# -------------------------------------------------
+# Bounded process pool for CPU-heavy extraction stages
+# -------------------------------------------------
+
+_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+_inflight = 0
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: workers must not inherit the server's threads / DB connections
+        _pool = ProcessPoolExecutor(
+            max_workers=EXTRACT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def get_manager():
+    """
+    Lazily started multiprocessing manager: its Queue / Event proxies can be
+    pickled into pool workers (progress streaming + cancellation).
+    """
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+
+def shutdown_pool():
+    global _pool, _manager
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+
+
+async def run_cpu(fn: Callable[..., Any], *args) -> Any:
+    """
+    Run a module-level (picklable) function in the process pool without
+    blocking the event loop or a thread-pool thread.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_pool(), fn, *args)
+    except BrokenProcessPool:
+        # a worker died (OOM / segfault in a native lib): drop the pool so the next call respawns it
+        shutdown_pool()
+        raise
+
+
+# -------------------------------------------------
+# Admission control
+# -------------------------------------------------
+
+def extract_capacity() -> int:
+    return EXTRACT_WORKERS + EXTRACT_QUEUE_SIZE
+
+
+def extract_inflight() -> int:
+    return _inflight
+
+
+@asynccontextmanager
+async def admit_extraction():
+    """
+    At most EXTRACT_WORKERS extractions run and EXTRACT_QUEUE_SIZE wait for a
+    worker; anything beyond that is shed immediately with 503 + Retry-After.
+    Only touched from the event loop, so a plain counter is enough.
+    """
+    global _inflight
+    if _inflight >= extract_capacity():
+        raise HTTPException(
+            status_code=503,
+            detail="Extraction capacity exhausted, retry later",
+            headers={"Retry-After": str(EXTRACT_RETRY_AFTER)},
+        )
+
+    _inflight += 1
+    try:
+        yield
+    finally:
+        _inflight -= 1
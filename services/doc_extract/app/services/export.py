@@ -0,0 +1,152 @@
+from datetime import date
+from typing import Iterator, List, Optional
+
+from fastapi import HTTPException
+
+from core.config import EXPORT_BATCH_SIZE
+from db.database import engine
+
+
+# -------------------------------------------------
+# Columnar export of transactions (Arrow IPC stream / Parquet)
+#
+# Rows come from a server-side cursor EXPORT_BATCH_SIZE at a time; each
+# batch becomes one Arrow record batch (or Parquet row group) and is sent as
+# soon as it is encoded, so server memory is bounded by one batch whatever
+# the export size. Only the requested columns are selected.
+# pyarrow is imported lazily, like the OCR stack in extractors.py.
+# -------------------------------------------------
+
+# column -> (SQL expression, arrow type name); money in major units like the JSON API
+EXPORT_COLUMNS = {
+    "id": ("t.id", "int64"),
+    "date": ("t.date", "date32"),
+    "statement_id": ("t.statement_id", "int32"),
+    "account_number": ("s.account_number", "string"),
+    "bank_name": ("s.bank_name", "string"),
+    "description": ("t.description", "string"),
+    "merchant": ("t.merchant", "string"),
+    "category": ("t.category", "string"),
+    "debit": ("t.debit::float8 / 10 ^ t.currency_exponent", "float64"),
+    "credit": ("t.credit::float8 / 10 ^ t.currency_exponent", "float64"),
+    "balance_after": ("t.balance_after::float8 / 10 ^ t.currency_exponent", "float64"),
+    "currency": ("t.currency", "string"),
+    "direction": ("t.direction", "string"),
+    "reference_id": ("t.reference_id", "string"),
+    "confidence": ("t.confidence", "int32"),
+    "is_duplicate": ("t.is_duplicate", "bool_"),
+}
+DEFAULT_COLUMNS = ["id", "date", "account_number", "description", "merchant", "category",
+                   "debit", "credit", "balance_after", "currency", "direction"]
+
+MEDIA_TYPES = {"arrow": "application/vnd.apache.arrow.stream", "parquet": "application/vnd.apache.parquet"}
+
+
+def parse_columns(columns: Optional[str]) -> List[str]:
+    if not columns:
+        return list(DEFAULT_COLUMNS)
+    names = [c.strip() for c in columns.split(",") if c.strip()]
+    unknown = [c for c in names if c not in EXPORT_COLUMNS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown export column(s): {', '.join(unknown) or '-'}; available: {', '.join(EXPORT_COLUMNS)}",
+        )
+    return list(dict.fromkeys(names))
+
+
+def build_export_query(columns: List[str], date_from: Optional[date], date_to: Optional[date],
+                       account_number: Optional[str]) -> tuple:
+    where, params = [], []
+    if date_from:
+        where.append("t.date >= %s")
+        params.append(date_from)
+    if date_to:
+        where.append("t.date <= %s")
+        params.append(date_to)
+    if account_number:
+        where.append("s.account_number = %s")
+        params.append(account_number)
+
+    needs_statement = account_number or any(EXPORT_COLUMNS[c][0].startswith("s.") for c in columns)
+    sql = "SELECT " + ", ".join(EXPORT_COLUMNS[c][0] for c in columns) + " FROM transactions t"
+    if needs_statement:
+        sql += " JOIN statements s ON s.id = t.statement_id"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY t.date, t.id"  # date index: streamed in order, no sort of the whole range
+    return sql, params
+
+
+class _ChunkSink:
+    """
+    Write-only file for the Arrow / Parquet writers: keeps what they emit
+    until it is drained into the response. tell() counts every byte written
+    (Parquet records row-group offsets in its footer).
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        out = b"".join(self.chunks)
+        self.chunks.clear()
+        return out
+
+
+def iter_export(fmt: str, columns: List[str], date_from: Optional[date] = None, date_to: Optional[date] = None,
+                account_number: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Encoded chunks of the export; meant for a StreamingResponse (runs on the thread pool)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(c, getattr(pa, EXPORT_COLUMNS[c][1])()) for c in columns])
+    sql, params = build_export_query(columns, date_from, date_to, account_number)
+
+    sink = _ChunkSink()
+    out = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(out, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(out, schema)
+
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor(name="transactions_export")  # server-side: rows are streamed, not loaded
+        cur.itersize = batch_size
+        cur.execute(sql, params)
+        yield sink.drain()  # schema / magic bytes: the client can start reading right away
+
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+
+        writer.close()
+        yield sink.drain()
+    finally:
+        # also reached when the client disconnects mid-stream (generator closed)
+        conn.close()
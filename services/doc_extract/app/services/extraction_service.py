@@ -1,13 +1,26 @@
-import os, json, re, traceback, hashlib
+import os, json, re, traceback, hashlib, uuid, threading, time
+from collections import Counter
+from datetime import date
 from typing import Optional, List, Dict, Any, Tuple
 
 from fastapi import UploadFile, HTTPException
+from starlette.concurrency import run_in_threadpool
 
 from extractors import extract_text
 from core.config import *
 import requests
 from db.database import SessionLocal
-from db.crud import create_statement, create_transactions
+from db.crud import create_statement, create_transactions, ensure_transaction_partitions
+from core.money import to_minor, from_minor
+from services.executor import admit_extraction, run_cpu, get_manager
+from services.progress import ProgressReporter, ExtractionCancelled
+from services.categorizer import categorize
+from services.llm_scheduler import ollama_generate, LLMBusy
+from services.data_events import data_change, notify_data_change
+from services.http_cache import invalidate_response_cache
+from schemas.extract import StatementMetadata
+from pydantic import ValidationError
+import asyncio, queue
 
 # -------------------------------------------------
 # Helpers: parsing + numbers
@@ -165,40 +178,180 @@ def approx_equal(a: float, b: float, tol: float = 0.02) -> bool:
     return abs(a - b) <= tol
 
 def extract_json_block(text: str) -> dict:
-    m = re.search(r"\{.*\}", text, re.DOTALL)
-    if not m:
-        raise ValueError(f"No JSON found in LLM output:\n{text[:1000]}")
-    return json.loads(m.group(0))
+    # first complete JSON object: a greedy {.*} spans two objects or trailing prose braces
+    text = text.strip()
+    try:
+        obj = json.loads(text)
+        if isinstance(obj, dict):
+            return obj
+    except ValueError:
+        pass
+    decoder = json.JSONDecoder()
+    for m in re.finditer(r"\{", text):
+        try:
+            obj, _ = decoder.raw_decode(text, m.start())
+        except ValueError:
+            continue
+        if isinstance(obj, dict):
+            return obj
+    raise ValueError(f"No JSON found in LLM output:\n{text[:1000]}")
 
 
 # -------------------------------------------------
 # Step 4: Ollama metadata only (small prompt)
+#
+# Model cascade (OLLAMA_METADATA_MODELS, fastest first). Every tier gets the
+# same prompt plus a JSON schema as Ollama's `format`, so the answer is
+# grammar-constrained JSON; it is then validated against StatementMetadata
+# (ISO dates, from <= to). Invalid JSON, a schema error, a null required
+# field (METADATA_REQUIRED_FIELDS) or an HTTP error escalates to the next
+# tier. The first complete answer wins; otherwise the most complete valid
+# one; a 502 only when no tier produced valid metadata. The answering tier
+# and per-tier timings go to statement_metadata["llm"] and /llm/stats.
 # -------------------------------------------------
 
-def ollama_metadata(prompt: str) -> dict:
-    r = requests.post(
-        f"{OLLAMA_BASE_URL}/api/generate",
-        json={
-            "model": OLLAMA_MODEL,
-            "prompt": (
-                "You are a bank statement metadata extractor.\n"
-                "Return VALID JSON ONLY.\n"
-                "No markdown. No explanations.\n"
-                "Do not invent values.\n"
-                "If missing, return null.\n\n"
-                + prompt
-            ),
-            "stream": False,
-            "options": {
-                "temperature": 0.0
-            }
-        },
-        timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT),
-    )
+METADATA_SYSTEM = (
+    "You are a bank statement metadata extractor.\n"
+    "Return VALID JSON ONLY.\n"
+    "No markdown. No explanations.\n"
+    "Do not invent values.\n"
+    "If missing, return null.\n\n"
+)
+
+_cascade_lock = threading.Lock()
+_cascade = {"calls": Counter(), "answered": Counter(), "escalated": Counter(), "ms": Counter(),
+            "incomplete": 0, "failed": 0}
+
+
+def metadata_json_schema(currency: str) -> dict:
+    """Inline JSON schema (no $refs) for Ollama's `format`, matching StatementMetadata."""
+    def nullable(schema: dict) -> dict:
+        return {"anyOf": [schema, {"type": "null"}]}
+
+    def obj(props: dict) -> dict:
+        return {"type": "object", "properties": props, "required": list(props)}
+
+    balance = obj({"amount": nullable({"type": "number"}), "currency": {"type": "string", "enum": [currency]}})
+    day = nullable({"type": "string", "format": "date"})
+    return obj({
+        "bank_name": nullable({"type": "string"}),
+        "account_holder_name": nullable({"type": "string"}),
+        "account_number": nullable({"type": "string"}),
+        "statement_period": obj({"from": day, "to": day}),
+        "opening_balance": balance,
+        "closing_balance": balance,
+    })
+
+
+def validate_metadata(data: Any) -> Tuple[Optional[dict], Optional[str]]:
+    """(metadata dict, None) if `data` is valid StatementMetadata, else (None, reason)."""
+    try:
+        meta = StatementMetadata.model_validate(data).model_dump(by_alias=True, exclude={"llm"})
+    except ValidationError as e:
+        err = e.errors()[0]
+        return None, f"schema: {'.'.join(map(str, err['loc']))}: {err['msg']}"
+    period = meta["statement_period"]
+    for key in ("from", "to"):
+        if period[key] is not None:
+            try:
+                date.fromisoformat(period[key])
+            except ValueError:
+                return None, f"schema: statement_period.{key} is not YYYY-MM-DD: {period[key]!r}"
+    if period["from"] and period["to"] and period["from"] > period["to"]:
+        return None, "schema: statement_period.from is after statement_period.to"
+    return meta, None
+
+
+def missing_metadata_fields(meta: dict) -> List[str]:
+    missing = []
+    for path in METADATA_REQUIRED_FIELDS:
+        value = meta
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None or (isinstance(value, str) and not value.strip()):
+            missing.append(path)
+    return missing
+
+
+def _record_cascade(attempts: List[dict], answered: Optional[str], complete: bool):
+    with _cascade_lock:
+        for i, a in enumerate(attempts):
+            _cascade["calls"][a["model"]] += 1
+            _cascade["ms"][a["model"]] += a["ms"]
+            if not a["ok"] and i < len(attempts) - 1:
+                _cascade["escalated"][a["model"]] += 1
+        if answered is None:
+            _cascade["failed"] += 1
+        else:
+            _cascade["answered"][answered] += 1
+            _cascade["incomplete"] += not complete
+
+
+def cascade_stats() -> dict:
+    """Per-tier calls / answers / escalations and mean latency of the metadata cascade."""
+    with _cascade_lock:
+        tiers = []
+        for tier, model in enumerate(OLLAMA_METADATA_MODELS):
+            calls = _cascade["calls"][model]
+            tiers.append({
+                "tier": tier, "model": model, "calls": calls,
+                "answered": _cascade["answered"][model], "escalated": _cascade["escalated"][model],
+                "mean_ms": round(_cascade["ms"][model] / calls, 1) if calls else None,
+            })
+        return {"tiers": tiers, "incomplete": _cascade["incomplete"], "failed": _cascade["failed"]}
+
+
+def ollama_metadata(prompt: str, currency: str, priority: str = "ingestion",
+                    degraded_prompt: Optional[str] = None) -> dict:
+    # scheduled with the agent's prompts on the shared Ollama (services/llm_scheduler.py);
+    # degraded_prompt (shorter snippet) is used when the slot was granted under pressure
+    schema = metadata_json_schema(currency)
+
+    def body(model: str, p: str) -> dict:
+        return {"model": model, "prompt": METADATA_SYSTEM + p, "stream": False, "format": schema,
+                "options": {"temperature": 0.0}}
+
+    attempts = []
+    best = None  # (missing fields, tier, metadata): most complete valid answer so far
+    for tier, model in enumerate(OLLAMA_METADATA_MODELS):
+        t0 = time.perf_counter()
+        meta, reason = None, None
+        try:
+            r = ollama_generate(body(model, prompt), priority,
+                                body(model, degraded_prompt) if degraded_prompt else None)
+            r.raise_for_status()
+            meta, reason = validate_metadata(extract_json_block(r.json()["response"]))
+        except LLMBusy:
+            raise
+        except requests.RequestException as e:
+            reason = f"http: {e}"
+        except (ValueError, KeyError) as e:
+            reason = f"json: {e}"
+        if meta is not None:
+            missing = missing_metadata_fields(meta)
+            if missing:
+                reason = "null: " + ", ".join(missing)
+            if best is None or len(missing) < len(best[0]):
+                best = (missing, tier, meta)
+        attempts.append({"model": model, "ok": reason is None, "reason": reason and reason[:300],
+                         "ms": round((time.perf_counter() - t0) * 1000)})
+        if reason is None:
+            break
 
-    r.raise_for_status()
-    text = r.json()["response"]   # 👈 IMPORTANT difference
-    return extract_json_block(text)
+    if best is None:
+        _record_cascade(attempts, None, False)
+        raise HTTPException(
+            status_code=502,
+            detail="No valid statement metadata from the LLM: "
+                   + "; ".join(f"{a['model']}: {a['reason']}" for a in attempts),
+        )
+    missing, tier, meta = best
+    _record_cascade(attempts, OLLAMA_METADATA_MODELS[tier], not missing)
+    meta["llm"] = {
+        "model": OLLAMA_METADATA_MODELS[tier], "tier": tier, "missing": missing,
+        "ms": sum(a["ms"] for a in attempts), "attempts": attempts,
+    }
+    return meta
 
 # def ollama_metadata(prompt: str) -> dict:
 #     r = requests.post(
@@ -230,11 +383,12 @@ def ollama_metadata(prompt: str) -> dict:
 #     return extract_json_block(text)
 
 
-def build_metadata_prompt(text: str, currency: str, bank_hint: Optional[str], holder_hint: Optional[str]) -> str:
+def build_metadata_prompt(text: str, currency: str, bank_hint: Optional[str], holder_hint: Optional[str],
+                          head_chars: int = 25000, tail_chars: int = 15000) -> str:
     # Keep small: only header-ish content for metadata extraction
     # We take first N chars + last N chars (often statement period + balances appear in header/footer)
-    head = text[:25000]
-    tail = text[-15000:] if len(text) > 15000 else ""
+    head = text[:head_chars]
+    tail = text[-tail_chars:] if len(text) > tail_chars else ""
     snippet = head + "\n\n---\n\n" + tail
 
     return f"""
@@ -412,6 +566,10 @@ def extract_candidate_transactions(text: str) -> List[dict]:
         if row:
             candidates.append(row)
 
+    return dedup_candidates(candidates)
+
+
+def dedup_candidates(candidates: List[dict]) -> List[dict]:
     # De-dup by row_text hash
     seen = set()
     uniq = []
@@ -575,13 +733,52 @@ def balance_correct(txns: List[dict]) -> List[dict]:
 # File handling
 # -------------------------------------------------
 
+def _iter_chunks(fileobj):
+    while True:
+        chunk = fileobj.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
 def save_upload(upload: UploadFile) -> str:
+    """
+    Stream the upload to a content-addressed path (<sha256><ext>) in chunks.
+    - SHA-256 is computed incrementally, the file is never held in memory
+    - MAX_UPLOAD_BYTES is enforced while streaming (413)
+    - duplicate content skips the write entirely
+    - new content goes to a temp name and is atomically renamed into place
+    """
     os.makedirs(UPLOAD_DIR, exist_ok=True)
-    content = upload.file.read()
-    sha = hashlib.sha256(content).hexdigest()
-    path = os.path.join(UPLOAD_DIR, f"{sha}_{upload.filename}".replace(" ", "_"))
-    with open(path, "wb") as f:
-        f.write(content)
+    src = upload.file
+
+    # Pass 1: hash + size check (the spooled upload is seekable, so no copy is made)
+    sha = hashlib.sha256()
+    size = 0
+    for chunk in _iter_chunks(src):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+        sha.update(chunk)
+
+    ext = os.path.splitext(upload.filename or "")[1].lower() or ".bin"
+    path = os.path.join(UPLOAD_DIR, f"{sha.hexdigest()}{ext}")
+    if os.path.exists(path):
+        return path
+
+    # Pass 2: stream to a temp name, then atomic rename
+    src.seek(0)
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in _iter_chunks(src):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     return path
 
 
@@ -597,24 +794,39 @@ def save_upload(upload: UploadFile) -> str:
 def persist_to_db(statement_metadata: dict, transactions: list):
     db = SessionLocal()
     try:
+        # partition DDL first, on its own connection: CREATE ... PARTITION OF copies the
+        # statements FK and needs SHARE ROW EXCLUSIVE on statements, which would wait
+        # forever on the open statements INSERT below
+        ensure_transaction_partitions(db, [t["date"] for t in transactions])
         statement = create_statement(db, statement_metadata)
 
         # 🔹 RECONCILIATION
         opening = statement_metadata["opening_balance"]["amount"]
         closing = statement_metadata["closing_balance"]["amount"]
+        currency = statement_metadata["opening_balance"].get("currency")
 
-        ok, diff = reconcile_statement(opening, closing, transactions)
+        ok, diff = reconcile_statement(opening, closing, transactions, currency)
         stmt_conf = compute_statement_confidence(transactions)
 
         statement.is_reconciled = ok
-        statement.reconciliation_diff = diff
+        statement.reconciliation_diff = diff  # minor units
         statement.statement_confidence = stmt_conf
 
         create_transactions(db, statement.id, transactions)
 
+        # statement, transactions and NOTIFY commit together: no rows without a change event
+        period = statement_metadata["statement_period"]
+        change = data_change(
+            statement_metadata.get("account_number"),
+            [t.get("date") for t in transactions] + [period.get("from"), period.get("to")],
+            statement.id,
+        )
+        notify_data_change(db, change)
         db.commit()
     finally:
         db.close()
+    # this worker drops its entries now; the others when the NOTIFY arrives (milliseconds)
+    invalidate_response_cache(change)
 
 def compute_statement_confidence(txns: list) -> Optional[float]:
     if not txns:
@@ -629,22 +841,24 @@ def reconcile_statement(
     opening: Optional[float],
     closing: Optional[float],
     txns: list,
-    tolerance: float = 0.05,
+    currency: Optional[str] = None,
+    tolerance_minor: int = 0,
 ):
     """
+    Exact reconciliation in integer minor units (no float drift).
     Returns:
-      (is_reconciled: bool, diff: float|None)
+      (is_reconciled: bool, diff_minor: int|None)
     """
     if opening is None or closing is None:
         return False, None
 
-    total_debit = sum(t.get("debit") or 0 for t in txns)
-    total_credit = sum(t.get("credit") or 0 for t in txns)
+    total_debit = sum(to_minor(t.get("debit"), currency) or 0 for t in txns)
+    total_credit = sum(to_minor(t.get("credit"), currency) or 0 for t in txns)
 
-    expected_closing = opening + total_credit - total_debit
-    diff = round(expected_closing - closing, 2)
+    expected_closing = to_minor(opening, currency) + total_credit - total_debit
+    diff = expected_closing - to_minor(closing, currency)
 
-    return abs(diff) <= tolerance, diff
+    return abs(diff) <= tolerance_minor, diff
 
 
 def detect_duplicates(transactions: list):
@@ -672,9 +886,153 @@ def detect_duplicates(transactions: list):
             seen[key] = idx
 
 def apply_manual_adjustments(opening_balance: float, adjustments: list) -> float:
+    # adjustment amounts are stored in minor units
     debit = sum(a.amount for a in adjustments if a.direction == "DEBIT")
     credit = sum(a.amount for a in adjustments if a.direction == "CREDIT")
-    return opening_balance + credit - debit
+    return from_minor(to_minor(opening_balance) + credit - debit)
+
+
+def resolve_currency(currency_hint: Optional[str]) -> str:
+    currency = (currency_hint or DEFAULT_CURRENCY).strip().upper()
+    if currency not in ("AED", "INR"):
+        currency = DEFAULT_CURRENCY
+    return currency
+
+
+def parse_statement_file(path: str, mime: str, currency: str, progress=None) -> Tuple[str, List[dict], dict]:
+    """
+    CPU-heavy stage (text/OCR extraction + row parsing + balance correction).
+    Module-level and picklable so it can run in the extraction process pool.
+    progress: optional services.progress.ProgressReporter (streaming /extract).
+    Returns (text, transactions, pages) - pages: OCR'd / skipped pages, see extract_text.
+    """
+    word_lines: list = []
+    text, method, pages = extract_text(path, mime, progress, word_lines)
+
+    # Digital PDFs: column assignment from word coordinates (cached per-bank
+    # template, same word pass as the text); the trailing-number heuristic is the fallback.
+    candidates = None
+    if method == "pdf-text":
+        from services.layout_parser import extract_layout_transactions
+
+        try:
+            candidates = extract_layout_transactions(path, progress=progress, word_lines=word_lines)
+        except ExtractionCancelled:
+            raise
+        except Exception as e:
+            print(f"⚠️ layout parser failed, using text heuristic: {e}")
+            candidates = None
+
+    if candidates:
+        txns = [canonicalize_and_set_direction(t, currency) for t in dedup_candidates(candidates)]
+        txns = maybe_reverse_best_order(txns)
+        # columns come from geometry: only run the correction pass if the chain disagrees
+        if compute_chain_error(txns) > 0.05:
+            txns = balance_correct(txns)
+    else:
+        candidates = extract_candidate_transactions(text)
+        txns = [canonicalize_and_set_direction(t, currency) for t in candidates]
+        txns = balance_correct(txns)
+    detect_duplicates(txns)
+    if progress is not None:
+        progress.emit("parsed", rows=len(txns), method=method)
+
+
+    for t in txns:
+        original_desc = t["description"]
+        cleaned_desc, new_raw = clean_description(original_desc, t["raw"])
+        t["description"] = cleaned_desc
+        t["raw"] = new_raw
+        t["merchant"], t["category"] = categorize(cleaned_desc, original_desc)
+
+        d = parse_amount(t.get("debit"))
+        c = parse_amount(t.get("credit"))
+        if d is not None and c is not None:
+            if d >= c:
+                t["credit"] = None
+                t["direction"] = "DEBIT"
+            else:
+                t["debit"] = None
+                t["direction"] = "CREDIT"
+
+    return text, txns, pages
+
+
+def finalize_extract(
+    text: str,
+    txns: List[dict],
+    currency: str,
+    bank_hint: Optional[str],
+    account_holder_hint: Optional[str],
+    pages: Optional[dict] = None,
+) -> dict:
+    """
+    I/O stage: LLM metadata + persistence.
+    """
+    statement_metadata = resolve_statement_metadata(text, currency, bank_hint, account_holder_hint)
+    persist_to_db(statement_metadata, txns)
+
+    # return {
+    #     "statement_metadata": {
+    #         **statement_metadata,
+    #         "is_reconciled": ok,
+    #         "reconciliation_diff": diff,
+    #         "statement_confidence": stmt_conf,
+    #     },
+    #     "transactions": txns,
+    # }
+    return {
+        "statement_metadata": statement_metadata,
+        "transactions": txns,
+        "pages": pages,
+    }
+
+
+def resolve_statement_metadata(
+    text: str,
+    currency: str,
+    bank_hint: Optional[str],
+    account_holder_hint: Optional[str],
+    priority: str = "ingestion",
+) -> dict:
+    meta_prompt = build_metadata_prompt(
+        text, currency, bank_hint, account_holder_hint
+    )
+    short_prompt = build_metadata_prompt(
+        text, currency, bank_hint, account_holder_hint, LLM_DEGRADED_HEAD_CHARS, LLM_DEGRADED_TAIL_CHARS
+    )
+    meta = ollama_metadata(meta_prompt, currency, priority, short_prompt if short_prompt != meta_prompt else None)
+
+    # ---- Bank name reconciliation (deterministic, safe) ----
+    bank_name = meta.get("bank_name")
+
+    if not bank_name:
+        if bank_hint and isinstance(bank_hint, str):
+            bank_hint_clean = bank_hint.strip()
+            if bank_hint_clean:
+                bank_name = bank_hint_clean
+
+
+    statement_metadata = {
+        "bank_name": bank_name,
+        # "bank_name": meta.get("bank_name"),
+        "account_holder_name": meta.get("account_holder_name"),
+        "account_number": meta.get("account_number"),
+        "statement_period": {
+            "from": meta.get("statement_period", {}).get("from"),
+            "to": meta.get("statement_period", {}).get("to"),
+        },
+        "opening_balance": {
+            "amount": safe_round(parse_amount(meta.get("opening_balance", {}).get("amount"))),
+            "currency": currency,
+        },
+        "closing_balance": {
+            "amount": safe_round(parse_amount(meta.get("closing_balance", {}).get("amount"))),
+            "currency": currency,
+        },
+        "llm": meta.get("llm"),  # which cascade tier answered
+    }
+    return statement_metadata
 
 
 def handle_extract(
@@ -683,86 +1041,125 @@ def handle_extract(
     bank_hint: Optional[str],
     account_holder_hint: Optional[str],
 ):
+    """
+    In-process pipeline (used by the profiling path and scripts).
+    """
     try:
         path = save_upload(file)
         mime = file.content_type or "application/octet-stream"
-        text, method = extract_text(path, mime)
+        currency = resolve_currency(currency_hint)
 
-        currency = (currency_hint or DEFAULT_CURRENCY).strip().upper()
-        if currency not in ("AED", "INR"):
-            currency = DEFAULT_CURRENCY
+        text, txns, pages = parse_statement_file(path, mime, currency)
+        return finalize_extract(text, txns, currency, bank_hint, account_holder_hint, pages)
 
-        candidates = extract_candidate_transactions(text)
-        txns = [canonicalize_and_set_direction(t, currency) for t in candidates]
-        txns = balance_correct(txns)
-        detect_duplicates(txns)
-
-
-        for t in txns:
-            cleaned_desc, new_raw = clean_description(t["description"], t["raw"])
-            t["description"] = cleaned_desc
-            t["raw"] = new_raw
-
-            d = parse_amount(t.get("debit"))
-            c = parse_amount(t.get("credit"))
-            if d is not None and c is not None:
-                if d >= c:
-                    t["credit"] = None
-                    t["direction"] = "DEBIT"
-                else:
-                    t["debit"] = None
-                    t["direction"] = "CREDIT"
-
-        meta_prompt = build_metadata_prompt(
-            text, currency, bank_hint, account_holder_hint
-        )
-        meta = ollama_metadata(meta_prompt)
-
-        # ---- Bank name reconciliation (deterministic, safe) ----
-        bank_name = meta.get("bank_name")
-
-        if not bank_name:
-            if bank_hint and isinstance(bank_hint, str):
-                bank_hint_clean = bank_hint.strip()
-                if bank_hint_clean:
-                    bank_name = bank_hint_clean
-
-
-        statement_metadata = {
-            "bank_name": bank_name,
-            # "bank_name": meta.get("bank_name"),
-            "account_holder_name": meta.get("account_holder_name"),
-            "account_number": meta.get("account_number"),
-            "statement_period": {
-                "from": meta.get("statement_period", {}).get("from"),
-                "to": meta.get("statement_period", {}).get("to"),
-            },
-            "opening_balance": {
-                "amount": safe_round(parse_amount(meta.get("opening_balance", {}).get("amount"))),
-                "currency": currency,
-            },
-            "closing_balance": {
-                "amount": safe_round(parse_amount(meta.get("closing_balance", {}).get("amount"))),
-                "currency": currency,
-            },
-        }
-        persist_to_db(statement_metadata, txns)
-
-        # return {
-        #     "statement_metadata": {
-        #         **statement_metadata,
-        #         "is_reconciled": ok,
-        #         "reconciliation_diff": diff,
-        #         "statement_confidence": stmt_conf,
-        #     },
-        #     "transactions": txns,
-        # }
-        return {
-            "statement_metadata": statement_metadata,
-            "transactions": txns,
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("❌ EXTRACT FAILED")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def handle_extract_async(
+    file: UploadFile,
+    currency_hint: Optional[str],
+    bank_hint: Optional[str],
+    account_holder_hint: Optional[str],
+):
+    """
+    Same pipeline as handle_extract, but the CPU-heavy stage runs in the
+    bounded process pool and the blocking I/O stages in the thread pool,
+    so the event loop (and /health, /expenses/summary) stays responsive.
+    """
+    async with admit_extraction():
+        try:
+            path = await run_in_threadpool(save_upload, file)
+            mime = file.content_type or "application/octet-stream"
+            currency = resolve_currency(currency_hint)
+
+            text, txns, pages = await run_cpu(parse_statement_file, path, mime, currency)
+            return await run_in_threadpool(
+                finalize_extract, text, txns, currency, bank_hint, account_holder_hint, pages
+            )
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            print("❌ EXTRACT FAILED")
+            print(traceback.format_exc())
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+# -------------------------------------------------
+# Streaming variant: progress events while the pipeline runs
+# -------------------------------------------------
 
+def _drain(q) -> List[dict]:
+    events = []
+    while True:
+        try:
+            events.append(q.get_nowait())
+        except queue.Empty:
+            return events
+
+
+async def stream_extract(
+    path: str,
+    mime: str,
+    currency: str,
+    bank_hint: Optional[str],
+    account_holder_hint: Optional[str],
+    is_disconnected,
+):
+    """
+    Async generator of event dicts for an already saved upload:
+    accepted -> page* / rows* -> parsed -> metadata -> persisted -> result
+    (or error). The worker reports through a manager queue; when the client
+    disconnects the cancel event is set, the worker stops at the next page
+    and nothing is persisted.
+    """
+    manager = get_manager()
+    progress = ProgressReporter(manager.Queue(), manager.Event())
+
+    try:
+        async with admit_extraction():
+            yield {"event": "accepted", "file": os.path.basename(path)}
+
+            parse = asyncio.ensure_future(run_cpu(parse_statement_file, path, mime, currency, progress))
+            while True:
+                finished = parse.done()
+                for ev in _drain(progress.queue):
+                    yield ev
+                if finished:
+                    break
+                if await is_disconnected():
+                    raise ExtractionCancelled()
+                await asyncio.sleep(STREAM_POLL_INTERVAL)
+            text, txns, pages = parse.result()
+
+            statement_metadata = await run_in_threadpool(
+                resolve_statement_metadata, text, currency, bank_hint, account_holder_hint
+            )
+            yield {"event": "metadata", "statement_metadata": statement_metadata}
+
+            if await is_disconnected():
+                raise ExtractionCancelled()
+            await run_in_threadpool(persist_to_db, statement_metadata, txns)
+            yield {"event": "persisted", "rows": len(txns)}
+
+            yield {"event": "result", "data": {"statement_metadata": statement_metadata, "transactions": txns,
+                                               "pages": pages}}
+
+    except (ExtractionCancelled, asyncio.CancelledError) as e:
+        print(f"⚠️ extraction of {os.path.basename(path)} cancelled: client disconnected")
+        if isinstance(e, asyncio.CancelledError):
+            raise
+    except HTTPException as e:
+        yield {"event": "error", "status": e.status_code, "detail": e.detail}
     except Exception as e:
         print("❌ EXTRACT FAILED")
         print(traceback.format_exc())
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        yield {"event": "error", "status": 500, "detail": str(e)}
+    finally:
+        # also reached when the response task is cancelled on disconnect
+        progress.cancel_event.set()
@@ -0,0 +1,139 @@
+import json, threading, time
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+
+import requests
+from fastapi import HTTPException
+
+from core.config import (
+    FX_PROVIDER, FX_BASE_CURRENCY, FX_HTTP_URL, FX_FILE_PATH,
+    FX_CACHE_TTL, FX_MAX_AGE, FX_FETCH_TIMEOUT,
+)
+from db.database import SessionLocal
+from db.crud import save_fx_rates, get_latest_fx_snapshot
+
+
+# -------------------------------------------------
+# Fetchers: base -> {"base", "as_of", "rates": {quote: rate}, "source"}
+# Pluggable so tests / offline setups can swap the live API for a file.
+# -------------------------------------------------
+
+def fetch_http(base: str) -> dict:
+    r = requests.get(FX_HTTP_URL.format(base=base), timeout=FX_FETCH_TIMEOUT)
+    r.raise_for_status()
+    data = r.json()
+    if data.get("result") not in (None, "success"):
+        raise RuntimeError(f"FX provider error: {data.get('error-type') or data.get('result')}")
+    as_of = datetime.utcfromtimestamp(data["time_last_update_unix"]).date() if data.get("time_last_update_unix") else date.today()
+    return {"base": data.get("base_code", base), "as_of": as_of, "rates": data["rates"], "source": "open.er-api.com"}
+
+
+def fetch_file(base: str) -> dict:
+    # same shape as open.er-api.com: {"base_code": "AED", "rates": {...}, optional "as_of": "YYYY-MM-DD"}
+    with open(FX_FILE_PATH) as f:
+        data = json.load(f)
+    as_of = date.fromisoformat(data["as_of"]) if data.get("as_of") else date.today()
+    return {"base": data.get("base_code", base), "as_of": as_of, "rates": data["rates"], "source": f"file:{FX_FILE_PATH}"}
+
+
+FETCHERS: Dict[str, Callable[[str], dict]] = {"http": fetch_http, "file": fetch_file}
+
+
+def register_fetcher(name: str, fn: Callable[[str], dict]):
+    FETCHERS[name] = fn
+
+
+def _rebase(snapshot: dict, base: str) -> dict:
+    rates = {k.upper(): Decimal(str(v)) for k, v in snapshot["rates"].items()}
+    src = snapshot["base"].upper()
+    rates.setdefault(src, Decimal(1))
+    if src != base:
+        if base not in rates:
+            raise RuntimeError(f"FX snapshot has no rate for base {base}")
+        pivot = rates[base]
+        rates = {k: v / pivot for k, v in rates.items()}
+    return {**snapshot, "base": base, "rates": rates}
+
+
+# -------------------------------------------------
+# Store + TTL cache
+# -------------------------------------------------
+
+_cache: Dict[str, tuple] = {}  # base -> (expires_at_monotonic, snapshot)
+_lock = threading.Lock()
+
+
+def refresh_rates(base: str = FX_BASE_CURRENCY, provider: Optional[str] = None) -> dict:
+    """Fetch from the provider and store the snapshot in fx_rates."""
+    fetcher = FETCHERS[provider or FX_PROVIDER]
+    snap = _rebase(fetcher(base), base)
+
+    db = SessionLocal()
+    try:
+        save_fx_rates(db, base, snap["as_of"], snap["rates"], snap["source"])
+    finally:
+        db.close()
+
+    snap["fetched_at"] = datetime.utcnow()
+    return snap
+
+
+def _load_stored(base: str) -> Optional[dict]:
+    db = SessionLocal()
+    try:
+        stored = get_latest_fx_snapshot(db, base)
+    finally:
+        db.close()
+    if stored is None:
+        return None
+    as_of, fetched_at, source, rates = stored
+    return {"base": base, "as_of": as_of, "fetched_at": fetched_at, "source": source, "rates": rates}
+
+
+def get_snapshot(base: str = FX_BASE_CURRENCY, force_refresh: bool = False) -> dict:
+    """
+    In-memory (FX_CACHE_TTL) -> fx_rates table (younger than FX_MAX_AGE) ->
+    provider. A failing provider falls back to the stored snapshot, however old.
+    """
+    now = time.monotonic()
+    if not force_refresh:
+        with _lock:
+            hit = _cache.get(base)
+        if hit and hit[0] > now:
+            return hit[1]
+
+    snap = None if force_refresh else _load_stored(base)
+    fresh = snap is not None and snap["fetched_at"] and datetime.utcnow() - snap["fetched_at"] < timedelta(seconds=FX_MAX_AGE)
+
+    if not fresh:
+        try:
+            snap = refresh_rates(base)
+        except Exception as e:
+            print(f"⚠️ FX refresh failed: {e}")
+            if snap is None:
+                snap = _load_stored(base)
+            if snap is None:
+                raise HTTPException(status_code=503, detail="No FX rates available")
+
+    with _lock:
+        _cache[base] = (now + FX_CACHE_TTL, snap)
+    return snap
+
+
+def get_rate(from_currency: str, to_currency: str) -> dict:
+    """Cross rate through the base: 1 from = rate to. Same fields as the n8n Rates node output."""
+    frm, to = from_currency.upper(), to_currency.upper()
+    snap = get_snapshot()
+    rates = snap["rates"]
+    missing = [c for c in (frm, to) if c not in rates]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"No FX rate for {', '.join(missing)}")
+    return {
+        "from": frm,
+        "to": to,
+        "rate": float(rates[to] / rates[frm]),
+        "base": snap["base"],
+        "source": snap["source"],
+        "as_of": snap["as_of"].isoformat(),
+    }
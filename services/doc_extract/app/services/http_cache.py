@@ -0,0 +1,134 @@
+import hashlib, json, threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from core.config import RESPONSE_CACHE_SIZE
+from services.data_events import affects, listening
+
+
+# -------------------------------------------------
+# Conditional GET / POST for read endpoints
+#
+# The ETag is derived from (endpoint, normalized params, data version). The
+# data version (db.crud.get_data_version) changes on every ingest, so a
+# matching If-None-Match costs one index lookup and returns 304 without
+# running the aggregation; a miss on the client side but a hit here returns
+# the already-serialized body.
+# Endpoints that pass a `scope` (account / date range / statement they read)
+# are also cached by request key while the data-change listener is
+# connected (services/data_events.py): an ingest then only drops the
+# entries whose scope it overlaps, the rest keep their body and ETag.
+# Other workers learn of a commit asynchronously (NOTIFY), so right after
+# an ingest they can briefly serve the previous body for its scope.
+# -------------------------------------------------
+
+_cache: "OrderedDict[str, bytes]" = OrderedDict()
+_scoped: "OrderedDict[str, tuple]" = OrderedDict()  # request key -> (etag, body, scope)
+_generation = 0  # bumped by every invalidation; a body computed across one is not stored
+_lock = threading.Lock()  # clear_response_cache may be called from any thread
+
+
+def make_etag(key: str, version: str) -> str:
+    digest = hashlib.sha1(f"{key}|{version}".encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def request_key(endpoint: str, params: dict) -> str:
+    return endpoint + "?" + json.dumps(params, sort_keys=True, default=str)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in [t.strip() for t in header.split(",")]
+
+
+def _cache_get(etag: str) -> Optional[bytes]:
+    with _lock:
+        body = _cache.get(etag)
+        if body is not None:
+            _cache.move_to_end(etag)
+        return body
+
+
+def _cache_put(etag: str, body: bytes):
+    with _lock:
+        _cache[etag] = body
+        _cache.move_to_end(etag)
+        while len(_cache) > RESPONSE_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _scoped_put(key: str, etag: str, body: bytes, scope: Dict[str, Any], generation: int):
+    with _lock:
+        if generation != _generation:
+            return
+        _scoped[key] = (etag, body, scope)
+        _scoped.move_to_end(key)
+        while len(_scoped) > RESPONSE_CACHE_SIZE:
+            _scoped.popitem(last=False)
+
+
+def clear_response_cache():
+    global _generation
+    with _lock:
+        _cache.clear()
+        _scoped.clear()
+        _generation += 1
+
+
+def invalidate_response_cache(change: Dict[str, Any]) -> int:
+    """Drop the scoped entries a data change (services/data_events.py) may affect."""
+    global _generation
+    with _lock:
+        _generation += 1
+        stale = [key for key, (_, _, scope) in _scoped.items() if affects(change, scope)]
+        for key in stale:
+            del _scoped[key]
+    return len(stale)
+
+
+async def conditional_response(
+    request: Request, key: str, version: Union[str, Callable[[], Awaitable[str]]],
+    compute: Callable[[], Awaitable[Any]], scope: Optional[Dict[str, Any]] = None,
+) -> Response:
+    """
+    304 if the client already has this version, else the cached or freshly
+    computed JSON body with its ETag. `compute` is a coroutine function
+    returning something jsonable (dict / pydantic model). `version` may be a
+    coroutine function too: it is then only awaited on a scoped miss. With
+    `scope`, the entry stays valid across versions until a data change
+    overlapping it.
+    """
+    scoped = scope is not None and RESPONSE_CACHE_SIZE > 0 and listening()
+    hit = None
+    if scoped:
+        with _lock:
+            generation = _generation
+            hit = _scoped.get(key)
+            if hit is not None:
+                _scoped.move_to_end(key)
+
+    if hit is None and callable(version):
+        version = await version()  # after reading the generation: a change in between is not stored
+    etag = hit[0] if hit else make_etag(key, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}  # always revalidate, never serve stale
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = hit[1] if hit else _cache_get(etag)
+    if body is None:
+        body = json.dumps(jsonable_encoder(await compute()), separators=(",", ":")).encode("utf-8")
+        if RESPONSE_CACHE_SIZE > 0:
+            _cache_put(etag, body)
+    if scoped and hit is None:
+        _scoped_put(key, etag, body, scope, generation)
+
+    return Response(content=body, media_type="application/json", headers=headers)
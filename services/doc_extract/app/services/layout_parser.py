@@ -0,0 +1,249 @@
+import hashlib, re
+from typing import Optional, List, Dict, Tuple
+
+from services.extraction_service import (
+    DATE2, parse_amount, is_amount_like, ddmmyyyy_to_iso, safe_round, normalize_spaces,
+    compute_chain_error, maybe_reverse_best_order,
+)
+
+# -------------------------------------------------
+# Coordinate-based row parser with cached per-bank layout templates
+#
+# PyMuPDF gives every word a bounding box. The amount columns of a
+# statement table (debit / credit / balance) are learned once from the header
+# row geometry, stored as a template keyed by a fingerprint of the header, and
+# later statements with the same header get their amounts assigned to columns
+# by x-position in a single linear pass (no trailing-number guessing).
+# parse_possible_row stays the fallback when no header/template applies.
+# -------------------------------------------------
+
+HEADER_ROLES = {
+    "debit": "debit", "debits": "debit", "withdrawal": "debit", "withdrawals": "debit", "dr": "debit",
+    "credit": "credit", "credits": "credit", "deposit": "credit", "deposits": "credit", "cr": "credit",
+    "balance": "balance",
+}
+LINE_TOLERANCE = 2.5   # pt: words whose tops differ by less are on the same visual line
+MAX_TEMPLATE_CHAIN_ERROR = 0.05
+
+_templates: Dict[str, list] = {}  # per-process cache: fingerprint -> columns
+
+
+def _group_lines(words: list) -> List[list]:
+    # words: (x0, y0, x1, y1, text, ...) from PyMuPDF; single pass after sorting by y
+    lines, current, current_y = [], [], None
+    for w in sorted(words, key=lambda w: (round(w[1], 1), w[0])):
+        if current_y is not None and abs(w[1] - current_y) > LINE_TOLERANCE:
+            lines.append(sorted(current, key=lambda w: w[0]))
+            current = []
+        if not current:
+            current_y = w[1]
+        current.append(w)
+    if current:
+        lines.append(sorted(current, key=lambda w: w[0]))
+    return lines
+
+
+def page_word_lines(page) -> List[list]:
+    """Visual lines of a PyMuPDF page's words (extractors.extract_text builds the page text from them)."""
+    return _group_lines(page.get_text("words"))
+
+
+def _find_header(lines: List[list]) -> Optional[Tuple[int, list]]:
+    for i, line in enumerate(lines):
+        roles = {HEADER_ROLES.get(w[4].strip(".:").lower()) for w in line} - {None}
+        if "balance" in roles and roles & {"debit", "credit"}:
+            return i, line
+    return None
+
+
+def header_fingerprint(header_line: list) -> Tuple[str, str]:
+    header = normalize_spaces(" ".join(w[4] for w in header_line)).lower()
+    return hashlib.sha1(header.encode("utf-8")).hexdigest()[:16], header
+
+
+def learn_columns(header_line: list, page_width: float) -> list:
+    """
+    Amount column x-ranges (page-relative) from the header words: each column
+    spans from the midpoint with its left neighbour to the midpoint with its
+    right neighbour (amounts are usually right-aligned under their header).
+    """
+    cols = []
+    for w in header_line:
+        role = HEADER_ROLES.get(w[4].strip(".:").lower())
+        if role and role not in {c["role"] for c in cols}:
+            cols.append({"role": role, "center": (w[0] + w[2]) / 2, "left": w[0]})
+
+    cols.sort(key=lambda c: c["center"])
+    out = []
+    for i, c in enumerate(cols):
+        if i > 0:
+            x0 = (cols[i - 1]["center"] + c["center"]) / 2
+        else:
+            x0 = c["left"] - (c["center"] - c["left"])  # slack for wide right-aligned amounts
+        x1 = (c["center"] + cols[i + 1]["center"]) / 2 if i + 1 < len(cols) else page_width
+        out.append({"role": c["role"], "x0": round(x0 / page_width, 4), "x1": round(x1 / page_width, 4)})
+    return out
+
+
+def _assign_role(x_center_rel: float, columns: list) -> Optional[str]:
+    for c in columns:
+        if c["x0"] <= x_center_rel < c["x1"]:
+            return c["role"]
+    return None
+
+
+def parse_layout_row(line: list, columns: list, page_width: float) -> Optional[dict]:
+    """
+    One linear pass over the words of a visual line.
+    """
+    texts = [w[4] for w in line]
+    if not texts or not re.fullmatch(DATE2, texts[0]):
+        return None
+
+    dates, desc_tokens = [], []
+    amounts = {"debit": None, "credit": None, "balance": None}
+    for w in line:
+        tok = w[4]
+        if len(dates) < 2 and not desc_tokens and re.fullmatch(DATE2, tok):
+            dates.append(tok)
+            continue
+        role = _assign_role(((w[0] + w[2]) / 2) / page_width, columns)
+        if role and is_amount_like(tok.replace(",", "")):
+            amounts[role] = parse_amount(tok)
+            continue
+        if role is None:
+            desc_tokens.append(tok)
+
+    date_iso = ddmmyyyy_to_iso(dates[0]) if dates else None
+    if not date_iso:
+        return None
+
+    ref_id = None
+    if desc_tokens:
+        last_tok = desc_tokens[-1]
+        if len(last_tok) >= 5 and re.search(r"\d", last_tok) and re.fullmatch(r"[A-Z0-9]+", last_tok, flags=re.IGNORECASE):
+            ref_id = last_tok
+            desc_tokens = desc_tokens[:-1]
+
+    debit, credit, bal = amounts["debit"], amounts["credit"], amounts["balance"]
+    if debit is not None and abs(debit) < 1e-9:
+        debit = None
+    if credit is not None and abs(credit) < 1e-9:
+        credit = None
+
+    desc = " ".join(desc_tokens).strip()
+    row_text = normalize_spaces(" ".join(texts))
+    raw = {
+        "Posting Date": dates[0],
+        "Value Date": dates[1] if len(dates) > 1 else None,
+        "Description": desc or None,
+        "Ref/Cheque No": ref_id,
+        "Debit Amount": safe_round(debit) if debit is not None else None,
+        "Credit Amount": safe_round(credit) if credit is not None else None,
+        "Balance": safe_round(bal) if bal is not None else None,
+        "row_text": row_text,
+        "parser": "layout",
+    }
+    return {
+        "date": date_iso,
+        "description": desc if desc else "UNKNOWN",
+        "debit": safe_round(debit) if debit is not None else None,
+        "credit": safe_round(credit) if credit is not None else None,
+        "balance_after": safe_round(bal) if bal is not None else None,
+        "reference_id": ref_id,
+        "raw": raw,
+    }
+
+
+def _load_template(fingerprint: str) -> Optional[list]:
+    if fingerprint in _templates:
+        return _templates[fingerprint]
+    try:
+        from db.database import SessionLocal
+        from db.crud import get_layout_template
+
+        db = SessionLocal()
+        try:
+            tpl = get_layout_template(db, fingerprint)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"⚠️ layout template lookup failed: {e}")
+        return None
+    if tpl is not None:
+        _templates[fingerprint] = tpl.columns
+    return tpl.columns if tpl is not None else None
+
+
+def _store_template(fingerprint: str, header: str, columns: list):
+    _templates[fingerprint] = columns
+    try:
+        from db.database import SessionLocal
+        from db.crud import save_layout_template
+
+        db = SessionLocal()
+        try:
+            save_layout_template(db, fingerprint, header, columns)
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"⚠️ layout template store failed: {e}")
+
+
+def _read_word_lines(file_path: str, max_pages: int) -> list:
+    import fitz  # PyMuPDF
+
+    with fitz.open(file_path) as doc:
+        return [(page.rect.width, page_word_lines(page)) for page in doc[:max_pages]]
+
+
+def extract_layout_transactions(file_path: str, max_pages: int = 50, progress=None,
+                                word_lines: Optional[list] = None) -> Optional[List[dict]]:
+    """
+    Returns candidate rows parsed by column geometry, or None when the
+    statement has no recognisable table header (caller falls back to the
+    text heuristic). A newly learned layout is only stored as a template
+    once its rows satisfy the balance chain. `progress` receives the running
+    row count after each page. `word_lines`: (page width, word lines) per
+    page as collected by extractors.extract_text; the PDF is read only
+    when it is not given.
+    """
+    rows: List[dict] = []
+    columns = fingerprint = header = None
+    learned = False
+
+    pages = _read_word_lines(file_path, max_pages) if word_lines is None else word_lines[:max_pages]
+    for page_no, (width, lines) in enumerate(pages, start=1):
+        if progress is not None:
+            progress.check_cancelled()
+
+        start = 0
+        found = _find_header(lines)
+        if found is not None:
+            idx, header_line = found
+            start = idx + 1
+            if columns is None:
+                fingerprint, header = header_fingerprint(header_line)
+                columns = _load_template(fingerprint)
+                if columns is None:
+                    columns = learn_columns(header_line, width)
+                    learned = True
+        if columns is None:
+            continue
+
+        for line in lines[start:]:
+            row = parse_layout_row(line, columns, width)
+            if row:
+                rows.append(row)
+        if progress is not None:
+            progress.emit("rows", page=page_no, pages=len(pages), rows_so_far=len(rows))
+
+    if columns is None or not rows:
+        return None
+
+    if learned:
+        ordered = maybe_reverse_best_order(rows)
+        if compute_chain_error(ordered) <= MAX_TEMPLATE_CHAIN_ERROR:
+            _store_template(fingerprint, header, columns)
+
+    return rows
@@ -0,0 +1,177 @@
+import heapq, itertools, threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import requests
+from fastapi import HTTPException
+
+from core.config import (
+    OLLAMA_BASE_URL, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT, LLM_CONCURRENCY,
+    LLM_LIMITS, LLM_DEADLINES, LLM_MAX_QUEUE, LLM_RETRY_AFTER, LLM_PRESSURE_WINDOW,
+)
+
+
+# -------------------------------------------------
+# Priority scheduler for the shared Ollama instance
+#
+# Every LLM call of this process takes a slot first. LLM_CONCURRENCY slots
+# (match OLLAMA_NUM_PARALLEL) are shared by three classes, highest first:
+#   interactive  agent / n8n prompts (someone is waiting on the chat)
+#   ingestion    statement metadata for /extract
+#   background   warm-up, backfills
+# A freed slot goes to the highest-priority waiter whose class is under its
+# own limit (LLM_LIMIT_*): with 2 slots and an ingestion limit of 1, one
+# slot is always left for the chat. Calls are not preempted; a month-end
+# batch can delay a chat prompt by at most one running generation.
+# Under pressure:
+#   - shed: a class whose queue is full (LLM_MAX_QUEUE_*) is rejected at once
+#   - deadline: a call still queued after LLM_DEADLINE_* s gives up
+#   - degrade: non-interactive work granted while higher-priority work is
+#     queued, running or was granted in the last LLM_PRESSURE_WINDOW s (a chat
+#     in progress), or while its own queue is half full, is flagged and the
+#     caller sends its cheaper variant: shorter prompt, so the slot frees sooner
+# Rejections are 503 + Retry-After (LLMBusy). State is per process: the
+# backfill CLI's workers schedule among themselves only.
+# -------------------------------------------------
+
+PRIORITIES = {"interactive": 0, "ingestion": 1, "background": 2}
+WAIT_SAMPLES = 512  # recent queue waits per class kept for percentiles
+
+
+class LLMBusy(HTTPException):
+    """No LLM slot: queue full (shed) or queue-time deadline passed."""
+
+    def __init__(self, priority: str, reason: str):
+        super().__init__(
+            status_code=503,
+            detail=f"LLM capacity exhausted for {priority} work ({reason}), retry later",
+            headers={"Retry-After": str(LLM_RETRY_AFTER)},
+        )
+        self.priority = priority
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("priority", "granted", "cancelled", "degraded")
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.granted = False
+        self.cancelled = False
+        self.degraded = False
+
+
+class LLMScheduler:
+    def __init__(self, capacity: int, limits: Dict[str, int], deadlines: Dict[str, float],
+                 max_queue: Dict[str, int], pressure_window: float = LLM_PRESSURE_WINDOW):
+        self.capacity = capacity
+        self.pressure_window = pressure_window
+        self.limits = limits
+        self.deadlines = deadlines
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._heap: list = []           # (priority rank, arrival seq, waiter)
+        self._seq = itertools.count()
+        self._running = {p: 0 for p in PRIORITIES}
+        self._queued = {p: 0 for p in PRIORITIES}
+        self._last_grant = {p: float("-inf") for p in PRIORITIES}
+        self._counters = {p: {"completed": 0, "shed": 0, "expired": 0, "degraded": 0, "failed": 0}
+                          for p in PRIORITIES}
+        self._waits = {p: deque(maxlen=WAIT_SAMPLES) for p in PRIORITIES}
+
+    def _dispatch(self):
+        # grant free slots in priority order; a class at its limit does not block lower ones
+        skipped = []
+        now = time.monotonic()
+        while self._heap and sum(self._running.values()) < self.capacity:
+            rank, seq, w = heapq.heappop(self._heap)
+            if w.cancelled:
+                continue
+            if self._running[w.priority] >= self.limits[w.priority]:
+                skipped.append((rank, seq, w))
+                continue
+            self._queued[w.priority] -= 1
+            self._running[w.priority] += 1
+            w.granted = True
+            self._last_grant[w.priority] = now
+            # pressure: higher-priority work active or recent, or this class's own backlog half full
+            w.degraded = rank > 0 and (
+                any(self._queued[p] or self._running[p] or now - self._last_grant[p] < self.pressure_window
+                    for p, r in PRIORITIES.items() if r < rank)
+                or self._queued[w.priority] * 2 >= self.max_queue[w.priority]
+            )
+        for item in skipped:
+            heapq.heappush(self._heap, item)
+        self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: str, deadline: Optional[float] = None):
+        """
+        Hold one LLM slot for the block. Yields a dict: {"degraded": bool,
+        "waited_s": float}. Raises LLMBusy when shed or the deadline passes.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown LLM priority: {priority}")
+        deadline = self.deadlines[priority] if deadline is None else deadline
+        t0 = time.perf_counter()
+        w = _Waiter(priority)
+        with self._cond:
+            if self._queued[priority] >= self.max_queue[priority]:
+                self._counters[priority]["shed"] += 1
+                raise LLMBusy(priority, "queue full")
+            self._queued[priority] += 1
+            heapq.heappush(self._heap, (PRIORITIES[priority], next(self._seq), w))
+            self._dispatch()
+            while not w.granted:
+                remaining = deadline - (time.perf_counter() - t0)
+                if remaining <= 0:
+                    w.cancelled = True
+                    self._queued[priority] -= 1
+                    self._counters[priority]["expired"] += 1
+                    raise LLMBusy(priority, f"queued longer than {deadline:g}s")
+                self._cond.wait(remaining)
+            waited = time.perf_counter() - t0
+            self._waits[priority].append(waited)
+            if w.degraded:
+                self._counters[priority]["degraded"] += 1
+
+        ok = False
+        try:
+            yield {"degraded": w.degraded, "waited_s": waited}
+            ok = True
+        finally:
+            with self._cond:
+                self._running[priority] -= 1
+                self._counters[priority]["completed" if ok else "failed"] += 1
+                self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            classes = {}
+            for p in PRIORITIES:
+                waits = sorted(self._waits[p])
+                pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else None
+                classes[p] = {
+                    "queued": self._queued[p], "running": self._running[p], "limit": self.limits[p],
+                    "deadline_s": self.deadlines[p], "max_queue": self.max_queue[p], **self._counters[p],
+                    "wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": pct(1.0), "samples": len(waits)},
+                }
+            return {"capacity": self.capacity, "running": sum(self._running.values()), "classes": classes}
+
+
+scheduler = LLMScheduler(LLM_CONCURRENCY, LLM_LIMITS, LLM_DEADLINES, LLM_MAX_QUEUE)
+
+
+def ollama_generate(body: dict, priority: str, degraded_body: Optional[dict] = None,
+                    path: str = "/api/generate") -> requests.Response:
+    """
+    POST to Ollama inside a scheduler slot. `degraded_body` (optional) is
+    sent instead of `body` when the slot was granted under pressure.
+    """
+    with scheduler.slot(priority) as ticket:
+        payload = degraded_body if ticket["degraded"] and degraded_body is not None else body
+        r = requests.post(
+            f"{OLLAMA_BASE_URL}{path}", json=payload, timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
+        )
+    return r
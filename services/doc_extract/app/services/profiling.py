@@ -0,0 +1,87 @@
+import os, io, json, time, pstats, cProfile, tracemalloc, uuid
+from typing import Any, Callable, Dict, Tuple
+
+from core.config import PROFILE_DIR, PROFILE_TOP_N
+
+
+# -------------------------------------------------
+# On-demand profiling (opt-in per request)
+# -------------------------------------------------
+
+def _top_functions(profiler: cProfile.Profile, top_n: int) -> list:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    stats.sort_stats("cumulative")
+
+    rows = []
+    for func in stats.fcn_list[:top_n]:
+        cc, nc, tt, ct, _callers = stats.stats[func]
+        filename, lineno, name = func
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{lineno}({name})",
+            "calls": nc,
+            "total_time_s": round(tt, 6),
+            "cumulative_time_s": round(ct, 6),
+        })
+    return rows
+
+
+def _top_allocations(snapshot: tracemalloc.Snapshot, top_n: int) -> list:
+    rows = []
+    for stat in snapshot.statistics("lineno")[:top_n]:
+        frame = stat.traceback[0]
+        rows.append({
+            "location": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        })
+    return rows
+
+
+def _store_artifact(profiler: cProfile.Profile, report: dict) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}_{report['profile_id']}")
+    profiler.dump_stats(base + ".prof")  # open with snakeviz / pstats
+    with open(base + ".json", "w") as f:
+        json.dump(report, f, indent=2)
+    return base + ".prof"
+
+
+def run_profiled(fn: Callable[..., Any], **kwargs) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Run fn(**kwargs) under cProfile + tracemalloc.
+    Returns (result, report). The report holds the top functions by
+    cumulative time and the top allocation sites, and is also written to
+    PROFILE_DIR together with the raw .prof file.
+    Only called when profiling was requested, so the normal path pays nothing.
+    """
+    profiler = cProfile.Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    t0 = time.perf_counter()
+    profiler.enable()
+    try:
+        result = fn(**kwargs)
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - t0
+        snapshot = tracemalloc.take_snapshot()
+        _current, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+    report = {
+        "profile_id": uuid.uuid4().hex[:12],
+        "wall_time_s": round(elapsed, 4),
+        "peak_alloc_kb": round(peak / 1024, 1),
+        "top_functions": _top_functions(profiler, PROFILE_TOP_N),
+        "top_allocations": _top_allocations(snapshot, PROFILE_TOP_N),
+    }
+    try:
+        report["artifact_path"] = _store_artifact(profiler, report)
+    except OSError as e:
+        print(f"⚠️ could not store profile artifact: {e}")
+        report["artifact_path"] = None
+
+    return result, report
@@ -0,0 +1,28 @@
+from typing import Any
+
+
+# -------------------------------------------------
+# Progress + cancellation channel between a streaming request and the
+# pool worker running its extraction
+# -------------------------------------------------
+
+class ExtractionCancelled(Exception):
+    """The client went away; the worker stops at the next page boundary."""
+
+
+class ProgressReporter:
+    """
+    Picklable handle passed to the worker: events go to a manager queue, the
+    request sets the manager event when the client disconnects.
+    """
+
+    def __init__(self, queue, cancel_event):
+        self.queue = queue
+        self.cancel_event = cancel_event
+
+    def emit(self, event: str, **data: Any):
+        self.queue.put({"event": event, **data})
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise ExtractionCancelled()
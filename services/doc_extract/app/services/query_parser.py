@@ -0,0 +1,280 @@
+import re, calendar
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+
+# -------------------------------------------------
+# Deterministic parsing of agent questions: period, currency pair, city.
+# Replaces the per-question Ollama calls of the n8n flow for the common
+# phrasings; callers fall back to the LLM only when confidence is low.
+# All patterns are compiled once at import.
+# -------------------------------------------------
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3, "apr": 4, "april": 4,
+    "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7, "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10, "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
+_MONTH_ALT = "|".join(sorted(MONTHS, key=len, reverse=True))
+_ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4}
+
+# a year is 4 digits or '24; a bare 1-2 digit number after a month name is a day ("March 15")
+_YEAR = r"(\d{4}|'\d{2})(?!\d)"
+_DAY = r"(\d{1,2})(?:st|nd|rd|th)?(?!\d)"
+RE_MONTH_YEAR = re.compile(rf"\b({_MONTH_ALT})\.?,?\s*(?:of\s+)?{_YEAR}", re.I)
+RE_DAY_DATE = re.compile(
+    rf"\b(?:({_MONTH_ALT})\b\.?\s+{_DAY}(?:,?\s*{_YEAR})?"           # March 15, oct 3rd, May 10 2024
+    rf"|{_DAY}\s+(?:of\s+)?({_MONTH_ALT})\b\.?(?:,?\s*{_YEAR})?)",     # 5 Oct, 3rd of October '24
+    re.I,
+)
+RE_DAY_SPAN = re.compile(rf"\b{_DAY}\s*(?:-|–|to|until|till|through)\s*{_DAY}\s+(?:of\s+)?({_MONTH_ALT})\b\.?(?:,?\s*{_YEAR})?", re.I)
+RE_RANGE_SEP = re.compile(r"\s*(?:-|–|to|until|till|through|and)\s*$", re.I)
+RE_MONTH_NUMBER = re.compile(rf"\b({_MONTH_ALT})\b\.?\s+\d{{2}}(?!\d)", re.I)  # "March 45": neither day nor year
+RE_MONTH_ONLY = re.compile(rf"\b(?:in|for|during|of)\s+({_MONTH_ALT})\b|\b({_MONTH_ALT})\s+(?:expenses?|spend|spending|transactions?)\b", re.I)
+RE_NUMERIC_MONTH = re.compile(r"\b(\d{4})-(\d{1,2})\b|\b(\d{1,2})/(\d{4})\b")
+RE_QUARTER = re.compile(r"\bq([1-4])\s*(?:of\s+)?(\d{4})?\b|\b(first|1st|second|2nd|third|3rd|fourth|4th)\s+quarter(?:\s+(?:of\s+)?(\d{4}))?\b", re.I)
+RE_SINCE = re.compile(rf"\bsince\s+({_MONTH_ALT})(?:\s+(\d{{4}}))?\b", re.I)
+RE_LAST_N = re.compile(r"\b(?:last|past|previous)\s+(\d{1,2})\s+months?\b", re.I)
+RE_RELATIVE = re.compile(r"\b(last|previous|this|current)\s+(month|year)\b", re.I)
+RE_YEAR_ONLY = re.compile(r"\b(?:in|for|during|year)\s+(\d{4})\b", re.I)
+
+CURRENCIES = {"AED", "INR", "USD", "EUR", "GBP", "JPY", "SAR", "QAR", "KWD", "BHD", "OMR", "CAD", "AUD", "CHF", "CNY", "SGD", "PKR"}
+CURRENCY_WORDS = {
+    "dirham": "AED", "dirhams": "AED", "rupee": "INR", "rupees": "INR", "dollar": "USD", "dollars": "USD",
+    "euro": "EUR", "euros": "EUR", "pound": "GBP", "pounds": "GBP", "sterling": "GBP", "yen": "JPY", "riyal": "SAR",
+}
+COUNTRY_CURRENCY = {
+    "united kingdom": "GBP", "uk": "GBP", "england": "GBP", "britain": "GBP",
+    "united arab emirates": "AED", "uae": "AED", "india": "INR",
+    "united states": "USD", "usa": "USD", "america": "USD",
+    "germany": "EUR", "france": "EUR", "italy": "EUR", "spain": "EUR", "japan": "JPY",
+    "saudi arabia": "SAR", "qatar": "QAR", "kuwait": "KWD", "oman": "OMR", "canada": "CAD", "australia": "AUD",
+}
+CITIES = {
+    "dubai": ("Dubai", "AE"), "abu dhabi": ("Abu Dhabi", "AE"), "sharjah": ("Sharjah", "AE"), "ajman": ("Ajman", "AE"),
+    "al ain": ("Al Ain", "AE"), "ras al khaimah": ("Ras Al Khaimah", "AE"), "fujairah": ("Fujairah", "AE"),
+    "mumbai": ("Mumbai", "IN"), "delhi": ("Delhi", "IN"), "new delhi": ("New Delhi", "IN"), "bangalore": ("Bangalore", "IN"),
+    "bengaluru": ("Bengaluru", "IN"), "chennai": ("Chennai", "IN"), "hyderabad": ("Hyderabad", "IN"), "kolkata": ("Kolkata", "IN"),
+    "pune": ("Pune", "IN"), "kochi": ("Kochi", "IN"), "jaipur": ("Jaipur", "IN"), "ahmedabad": ("Ahmedabad", "IN"),
+    "london": ("London", "GB"), "manchester": ("Manchester", "GB"), "edinburgh": ("Edinburgh", "GB"),
+    "new york": ("New York", "US"), "san francisco": ("San Francisco", "US"), "los angeles": ("Los Angeles", "US"),
+    "chicago": ("Chicago", "US"), "paris": ("Paris", "FR"), "berlin": ("Berlin", "DE"), "munich": ("Munich", "DE"),
+    "rome": ("Rome", "IT"), "madrid": ("Madrid", "ES"), "amsterdam": ("Amsterdam", "NL"), "zurich": ("Zurich", "CH"),
+    "tokyo": ("Tokyo", "JP"), "singapore": ("Singapore", "SG"), "hong kong": ("Hong Kong", "HK"),
+    "riyadh": ("Riyadh", "SA"), "jeddah": ("Jeddah", "SA"), "doha": ("Doha", "QA"), "muscat": ("Muscat", "OM"),
+    "kuwait city": ("Kuwait City", "KW"), "manama": ("Manama", "BH"), "cairo": ("Cairo", "EG"), "istanbul": ("Istanbul", "TR"),
+    "karachi": ("Karachi", "PK"), "lahore": ("Lahore", "PK"), "toronto": ("Toronto", "CA"), "sydney": ("Sydney", "AU"),
+}
+
+RE_CITY = re.compile(r"\b(" + "|".join(re.escape(c) for c in sorted(CITIES, key=len, reverse=True)) + r")\b", re.I)
+RE_COUNTRY = re.compile(r"\b(" + "|".join(re.escape(c) for c in sorted(COUNTRY_CURRENCY, key=len, reverse=True)) + r")\b", re.I)
+RE_CODE = re.compile(r"\b(" + "|".join(sorted(CURRENCIES)) + r")\b", re.I)
+RE_CUR_WORD = re.compile(r"\b(" + "|".join(CURRENCY_WORDS) + r")\b", re.I)
+RE_PAIR = re.compile(r"\b([A-Z]{3})\s*(?:/|->|to|in|into)\s*([A-Z]{3})\b", re.I)
+
+DEFAULT_FROM_CURRENCY = "AED"
+LLM_FALLBACK_THRESHOLD = 0.6
+
+
+def _today(timezone: Optional[str]) -> date:
+    if timezone:
+        try:
+            from zoneinfo import ZoneInfo
+            return datetime.now(ZoneInfo(timezone)).date()
+        except Exception:
+            pass
+    return datetime.utcnow().date()
+
+
+def _year(token: Optional[str], today: date, month: Optional[int] = None) -> Tuple[int, bool]:
+    # Returns (year, explicit). Without a year, pick the most recent occurrence of that month.
+    if token:
+        token = token.lstrip("'")
+        return (2000 + int(token) if len(token) == 2 else int(token)), True
+    if month and month > today.month:
+        return today.year - 1, False
+    return today.year, False
+
+
+def _day(mon: int, day: str, year: Optional[str], today: date) -> Optional[Tuple[date, bool]]:
+    # (date, explicit year); without a year, the most recent occurrence of that day
+    y, explicit = _year(year, today, mon)
+    if not 1 <= int(day) <= calendar.monthrange(y, mon)[1]:
+        return None
+    d = date(y, mon, int(day))
+    if not explicit and d > today:
+        d = date(y - 1, mon, int(day)) if int(day) <= calendar.monthrange(y - 1, mon)[1] else d
+    return d, explicit
+
+
+def _day_match(m) -> Tuple[int, str, Optional[str]]:
+    # RE_DAY_DATE groups: (month, day, year) | (day, month, year)
+    if m.group(1):
+        return MONTHS[m.group(1).lower()], m.group(2), m.group(3)
+    return MONTHS[m.group(5).lower()], m.group(4), m.group(6)
+
+
+def _day_period(start: date, end: date) -> Dict[str, Any]:
+    same_month = (start.year, start.month) == (end.year, end.month)
+    return {"from": start.isoformat(), "to": end.isoformat(), "month": start.month if same_month else None,
+            "year": start.year if same_month else None, "granularity": "day"}
+
+
+def _parse_days(text: str, today: date) -> Tuple[Optional[Dict[str, Any]], float]:
+    m = RE_DAY_SPAN.search(text)  # 5-20 Oct, 1 to 15 March 2024
+    if m:
+        mon = MONTHS[m.group(3).lower()]
+        a, b = _day(mon, m.group(1), m.group(4), today), _day(mon, m.group(2), m.group(4), today)
+        if a and b and a[0] <= b[0]:
+            return _day_period(a[0], b[0]), 0.95 if a[1] else 0.85
+
+    found = [(m, _day(*_day_match(m), today)) for m in RE_DAY_DATE.finditer(text)]
+    found = [(m, d) for m, d in found if d]
+    if not found:
+        return None, 0.0
+    (m1, (start, explicit)), end = found[0], None
+    if len(found) > 1 and RE_RANGE_SEP.search(text[m1.end():found[1][0].start()]):  # 5 Oct to 20 Oct
+        end, end_explicit = found[1][1]
+        if end_explicit and not explicit:
+            start, explicit = date(end.year, start.month, start.day), True  # "5 Oct to 20 Oct 2024"
+        if end < start and not explicit:
+            start = date(start.year - 1, start.month, start.day)             # "20 Dec to 5 Jan"
+        if end < start:
+            end = None
+    return _day_period(start, end or start), 0.95 if explicit else 0.85
+
+
+def _month_period(y: int, m: int) -> Dict[str, Any]:
+    last = calendar.monthrange(y, m)[1]
+    return {"from": date(y, m, 1).isoformat(), "to": date(y, m, last).isoformat(), "month": m, "year": y, "granularity": "month"}
+
+
+def _add_months(d: date, n: int) -> date:
+    idx = d.year * 12 + d.month - 1 + n
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def parse_period(text: str, today: date) -> Tuple[Optional[Dict[str, Any]], float]:
+    m = RE_QUARTER.search(text)
+    if m:
+        q = int(m.group(1)) if m.group(1) else _ORDINALS[m.group(3).lower()]
+        y, explicit = _year(m.group(2) or m.group(4), today)
+        start = date(y, 3 * q - 2, 1)
+        end = _add_months(start, 3) - timedelta(days=1)
+        return {"from": start.isoformat(), "to": end.isoformat(), "month": None, "year": y, "quarter": q, "granularity": "quarter"}, 0.95 if explicit else 0.8
+
+    m = RE_SINCE.search(text)
+    if m:
+        mon = MONTHS[m.group(1).lower()]
+        y, explicit = _year(m.group(2), today, mon)
+        return {"from": date(y, mon, 1).isoformat(), "to": today.isoformat(), "month": None, "year": None, "granularity": "range"}, 0.9
+
+    m = RE_LAST_N.search(text)
+    if m:
+        n = max(1, int(m.group(1)))
+        start = _add_months(today.replace(day=1), -n)
+        end = today.replace(day=1) - timedelta(days=1)
+        return {"from": start.isoformat(), "to": end.isoformat(), "month": None, "year": None, "granularity": "range"}, 0.9
+
+    period, conf = _parse_days(text, today)
+    if period:
+        return period, conf
+
+    m = RE_MONTH_YEAR.search(text)
+    if m:
+        mon = MONTHS[m.group(1).lower()]
+        y, _ = _year(m.group(2), today)
+        return _month_period(y, mon), 0.97
+
+    m = RE_MONTH_NUMBER.search(text)
+    if m:
+        # "March 45": not a day, not a year; below LLM_FALLBACK_THRESHOLD so the LLM decides
+        mon = MONTHS[m.group(1).lower()]
+        y, _ = _year(None, today, mon)
+        return _month_period(y, mon), 0.5
+
+    m = RE_NUMERIC_MONTH.search(text)
+    if m:
+        y, mon = (int(m.group(1)), int(m.group(2))) if m.group(1) else (int(m.group(4)), int(m.group(3)))
+        if 1 <= mon <= 12:
+            return _month_period(y, mon), 0.9
+
+    m = RE_RELATIVE.search(text)
+    if m:
+        which, unit = m.group(1).lower(), m.group(2).lower()
+        if unit == "month":
+            start = _add_months(today.replace(day=1), -1 if which in ("last", "previous") else 0)
+            return _month_period(start.year, start.month), 0.95
+        y = today.year - 1 if which in ("last", "previous") else today.year
+        return {"from": date(y, 1, 1).isoformat(), "to": date(y, 12, 31).isoformat(), "month": None, "year": y, "granularity": "year"}, 0.95
+
+    m = RE_MONTH_ONLY.search(text)
+    if m:
+        mon = MONTHS[(m.group(1) or m.group(2)).lower()]
+        y, _ = _year(None, today, mon)
+        return _month_period(y, mon), 0.75
+
+    m = RE_YEAR_ONLY.search(text)
+    if m:
+        y = int(m.group(1))
+        return {"from": date(y, 1, 1).isoformat(), "to": date(y, 12, 31).isoformat(), "month": None, "year": y, "granularity": "year"}, 0.85
+
+    return None, 0.0
+
+
+def parse_currency_pair(text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+    m = RE_PAIR.search(text)
+    if m and m.group(1).upper() in CURRENCIES and m.group(2).upper() in CURRENCIES:
+        return {"from": m.group(1).upper(), "to": m.group(2).upper(), "country": None, "inferred_from_country": False}, 0.97
+
+    codes = [c.upper() for c in RE_CODE.findall(text)]
+    codes += [CURRENCY_WORDS[w.lower()] for w in RE_CUR_WORD.findall(text)]
+    codes = list(dict.fromkeys(codes))  # keep order, unique
+
+    country = None
+    cm = RE_COUNTRY.search(text)
+    if cm:
+        country = cm.group(1)
+
+    if len(codes) >= 2:
+        return {"from": codes[0], "to": codes[1], "country": country, "inferred_from_country": False}, 0.85
+    if len(codes) == 1:
+        frm, to = (DEFAULT_FROM_CURRENCY, codes[0]) if codes[0] != DEFAULT_FROM_CURRENCY else (codes[0], None)
+        if to is None and country:
+            to = COUNTRY_CURRENCY[country.lower()]
+        if to:
+            return {"from": frm, "to": to, "country": country, "inferred_from_country": False}, 0.75
+    if country:
+        return {"from": DEFAULT_FROM_CURRENCY, "to": COUNTRY_CURRENCY[country.lower()], "country": country, "inferred_from_country": True}, 0.7
+    return None, 0.0
+
+
+def parse_city(text: str) -> Tuple[Optional[Dict[str, Any]], float]:
+    m = RE_CITY.search(text)
+    if not m:
+        return None, 0.0
+    name, cc = CITIES[m.group(1).lower()]
+    return {"name": name, "country_code": cc}, 0.95
+
+
+def parse_query(message: str, timezone: Optional[str] = None, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Returns period / currency pair / city with per-field confidence (0..1).
+    `needs_llm` lists the fields that were not resolved confidently.
+    """
+    text = message or ""
+    today = today or _today(timezone)
+
+    period, p_conf = parse_period(text, today)
+    pair, c_conf = parse_currency_pair(text)
+    city, city_conf = parse_city(text)
+
+    confidence = {"period": p_conf, "currency_pair": c_conf, "city": city_conf}
+    return {
+        "period": period,
+        "currency_pair": pair,
+        "city": city,
+        "confidence": confidence,
+        "needs_llm": [k for k, v in confidence.items() if v < LLM_FALLBACK_THRESHOLD],
+        "reference_date": today.isoformat(),
+    }
@@ -0,0 +1,226 @@
+import json, os, shutil, threading, time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+from core.config import ANALYTICS_DIR, SNAPSHOT_INTERVAL
+from db.database import engine
+from services.export import EXPORT_COLUMNS, iter_export
+
+
+# -------------------------------------------------
+# Parquet snapshots of transactions / statements for analytics
+#
+# Layout under ANALYTICS_DIR (hive-style, read by services/analytics.py):
+#   transactions/month=YYYY-MM/part.parquet   one file per calendar month
+#   statements/part.parquet                   small, rewritten whole
+#   manifest.json                             watermarks + per-month row counts
+# Refreshes are incremental: only months that received rows since the last
+# refresh are re-exported. Ids are taken at insert time, not commit, so a row
+# committed after a refresh can have an id below that refresh's max id; next
+# to the id watermark, each refresh keeps the xmin of its snapshot (oldest
+# transaction it could not see) and re-exports the months of statements
+# written by any transaction from there on. Every ingest writes its statement
+# row in the transaction of its transactions. A data revision
+# bump (bulk rewrite of existing rows, e.g. cli.recategorize) cannot be
+# traced to months, so it rebuilds every month. Files are written next to
+# their target and renamed into place; the manifest is written last.
+# -------------------------------------------------
+
+# transaction columns only; statement attributes live in the statements snapshot
+SNAPSHOT_COLUMNS = [c for c, (expr, _) in EXPORT_COLUMNS.items() if expr.startswith("t.")]
+STATEMENT_COLUMNS = [
+    ("id", "int32"), ("bank_name", "string"), ("account_number", "string"), ("period_from", "date32"),
+    ("period_to", "date32"), ("uploaded_at", "timestamp"), ("is_reconciled", "bool_"),
+]
+
+_lock = threading.Lock()  # one refresh per process; other processes: advisory lock below
+_ADVISORY_LOCK = 727002
+
+
+def _path(*parts: str) -> str:
+    return os.path.join(ANALYTICS_DIR, *parts)
+
+
+def load_manifest() -> Optional[Dict[str, Any]]:
+    try:
+        with open(_path("manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path: str, chunks) -> int:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    size = 0
+    with open(tmp, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    os.replace(tmp, path)
+    return size
+
+
+def _month_bounds(month: date) -> tuple:
+    nxt = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+    return month, date.fromordinal(nxt.toordinal() - 1)
+
+
+def _all_months(cur) -> List[date]:
+    # min/max are index lookups per partition; months without rows are skipped by the writer
+    cur.execute("SELECT min(date), max(date) FROM transactions")
+    lo, hi = cur.fetchone()
+    if lo is None:
+        return []
+    months, m = [], date(lo.year, lo.month, 1)
+    while m <= hi:
+        months.append(m)
+        m = date(m.year + (m.month == 12), m.month % 12 + 1, 1)
+    return months
+
+
+# statements written by transactions the snapshot with this xmin did not see
+# (age() is wraparound-safe; frozen rows have the maximum age)
+_UNSEEN_STATEMENTS = "SELECT id FROM statements WHERE age(xmin) <= age((%s %% 4294967296)::text::xid)"
+
+
+def _changed_months(cur, watermark: int, snapshot_xmin: int) -> List[date]:
+    # new ids: a range scan of each partition's (id, date) primary key;
+    # rows committed late under older ids: via their statement (statement_id index)
+    cur.execute(
+        "SELECT DISTINCT date_trunc('month', date)::date FROM transactions "
+        f"WHERE id > %s OR statement_id IN ({_UNSEEN_STATEMENTS}) ORDER BY 1",
+        (watermark, snapshot_xmin),
+    )
+    return [r[0] for r in cur.fetchall()]
+
+
+def _write_statements(cur) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cur.execute("SELECT " + ", ".join(c for c, _ in STATEMENT_COLUMNS) + " FROM statements ORDER BY id")
+    rows = cur.fetchall()
+    fields = [(c, pa.timestamp("us") if t == "timestamp" else getattr(pa, t)()) for c, t in STATEMENT_COLUMNS]
+    schema = pa.schema(fields)
+    columns = list(zip(*rows)) if rows else [[] for _ in fields]
+    table = pa.Table.from_arrays([pa.array(v, type=f.type) for v, f in zip(columns, schema)], schema=schema)
+
+    path = _path("statements", "part.parquet")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+    return len(rows)
+
+
+def _write_month(month: date) -> int:
+    import pyarrow.parquet as pq
+
+    first, last = _month_bounds(month)
+    path = _path("transactions", f"month={month:%Y-%m}", "part.parquet")
+    _write_atomic(path, iter_export("parquet", SNAPSHOT_COLUMNS, first, last))
+    rows = pq.ParquetFile(path).metadata.num_rows
+    if rows == 0:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    return rows
+
+
+def refresh_snapshots(full: bool = False) -> Dict[str, Any]:
+    """
+    Bring the Parquet snapshots up to date with Postgres. Returns a report:
+    {"status": "refreshed" | "up_to_date" | "busy", "months": [...], "rows", "seconds", "version"}.
+    """
+    if not _lock.acquire(blocking=False):
+        return {"status": "busy"}
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_try_advisory_lock(%s)", (_ADVISORY_LOCK,))
+        if not cur.fetchone()[0]:
+            return {"status": "busy"}
+        try:
+            return _refresh(cur, full)
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK,))
+    finally:
+        conn.close()
+        _lock.release()
+
+
+def _refresh(cur, full: bool) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    # same watermark as db.crud.get_data_version, and the snapshot xmin, in one
+    # statement (one snapshot) before any export: rows committed while we
+    # export are picked up again next time
+    cur.execute(
+        "SELECT (SELECT coalesce(max(id), 0) FROM transactions), "
+        "(SELECT coalesce(max(id), 0) FROM data_revisions), (SELECT coalesce(max(id), 0) FROM statements), "
+        "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+    )
+    max_id, revision, max_statement, snapshot_xmin = cur.fetchone()
+    version = f"{max_id}.{revision}"
+
+    manifest = None if full else load_manifest()
+    # a manifest older than 2^31 transactions can no longer be compared by age()
+    if manifest and manifest.get("revision") == revision and \
+            0 <= snapshot_xmin - manifest.get("snapshot_xmin", -2 ** 31) < 2 ** 31:
+        cur.execute(f"SELECT EXISTS ({_UNSEEN_STATEMENTS})", (manifest["snapshot_xmin"],))
+        unseen = cur.fetchone()[0]
+        if not unseen and manifest["max_id"] == max_id and manifest["max_statement_id"] == max_statement:
+            return {"status": "up_to_date", "months": [], "rows": 0,
+                    "seconds": round(time.perf_counter() - t0, 3), "version": version}
+        months = _changed_months(cur, manifest["max_id"], manifest["snapshot_xmin"])
+        month_rows = dict(manifest["months"])
+        rebuild = False
+    else:
+        months = _all_months(cur)
+        month_rows = {}
+        rebuild = True
+
+    _write_statements(cur)
+    cur.connection.commit()  # end the read transaction before the long exports
+    written = 0
+    for month in months:
+        rows = _write_month(month)
+        key = f"{month:%Y-%m}"
+        if rows:
+            month_rows[key] = rows
+        else:
+            month_rows.pop(key, None)
+        written += rows
+    if rebuild:
+        # months that no longer have rows; removed only now so queries never see a gap
+        for name in os.listdir(_path("transactions")) if os.path.isdir(_path("transactions")) else []:
+            if name.removeprefix("month=") not in month_rows:
+                shutil.rmtree(_path("transactions", name), ignore_errors=True)
+
+    manifest = {
+        "version": version,
+        "max_id": max_id,
+        "revision": revision,
+        "max_statement_id": max_statement,
+        "snapshot_xmin": snapshot_xmin,
+        "months": dict(sorted(month_rows.items())),
+        "refreshed_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    _write_atomic(_path("manifest.json"), [json.dumps(manifest, indent=1).encode("utf-8")])
+    return {"status": "refreshed", "months": [f"{m:%Y-%m}" for m in months], "rows": written,
+            "seconds": round(time.perf_counter() - t0, 3), "version": version}
+
+
+def _run_periodic():
+    while True:
+        try:
+            report = refresh_snapshots()
+            if report["status"] == "refreshed":
+                print(f"analytics snapshot: {len(report['months'])} month(s), {report['rows']} rows "
+                      f"in {report['seconds']}s")
+        except Exception as e:
+            print(f"⚠️ analytics snapshot refresh failed: {e}")
+        time.sleep(SNAPSHOT_INTERVAL)
+
+
+def start_snapshot_scheduler():
+    """Periodic incremental refresh in a daemon thread (SNAPSHOT_INTERVAL=0 disables it)."""
+    if SNAPSHOT_INTERVAL > 0:
+        threading.Thread(target=_run_periodic, name="analytics-snapshots", daemon=True).start()
@@ -0,0 +1,81 @@
+import threading, time
+from typing import Dict, Any
+
+from sqlalchemy import text
+
+from core.config import (
+    OLLAMA_MODEL, OLLAMA_METADATA_MODELS, OLLAMA_KEEP_ALIVE, WARMUP_ON_STARTUP, EXTRACT_WORKERS,
+)
+from db.database import engine
+from services.executor import get_pool
+from services.llm_scheduler import ollama_generate
+
+
+# -------------------------------------------------
+# Startup warm-up + readiness state
+# -------------------------------------------------
+
+_state: Dict[str, Any] = {
+    "warmup": "disabled" if not WARMUP_ON_STARTUP else "pending",
+    "ollama": None,
+    "tesseract": None,
+    "workers": None,
+    "warmup_s": None,
+}
+
+
+def warm_ollama() -> str:
+    # An empty prompt loads the model into memory without generating anything.
+    # Agent model + first metadata tier; escalation tiers load on first use.
+    models = list(dict.fromkeys([OLLAMA_MODEL, OLLAMA_METADATA_MODELS[0]]))
+    for model in models:
+        r = ollama_generate(
+            {"model": model, "prompt": "", "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE}, "background"
+        )
+        r.raise_for_status()
+    return ", ".join(models)
+
+
+def warm_workers() -> str:
+    # One task per worker: spawns the pool and imports cv2/fitz/tesseract in each child
+    from extractors import warm_up_ocr
+
+    pool = get_pool()
+    versions = [f.result() for f in [pool.submit(warm_up_ocr) for _ in range(EXTRACT_WORKERS)]]
+    return versions[0] if versions else ""
+
+
+def _run_warmup():
+    t0 = time.perf_counter()
+    _state["warmup"] = "running"
+    for key, fn in (("tesseract", warm_workers), ("ollama", warm_ollama)):
+        try:
+            _state[key] = f"ok: {fn()}"
+        except Exception as e:
+            print(f"⚠️ warm-up of {key} failed: {e}")
+            _state[key] = f"failed: {e}"
+    _state["workers"] = EXTRACT_WORKERS
+    _state["warmup_s"] = round(time.perf_counter() - t0, 3)
+    _state["warmup"] = "done"
+
+
+def start_warmup():
+    """
+    Runs in a daemon thread so liveness (/health) answers immediately;
+    /ready reports not-ready until the warm-up has finished.
+    """
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=_run_warmup, name="warmup", daemon=True).start()
+
+
+def readiness() -> Dict[str, Any]:
+    checks: Dict[str, Any] = {}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"failed: {e}"
+
+    ready = checks["database"] == "ok" and _state["warmup"] in ("disabled", "done")
+    return {"ready": ready, **checks, **_state}
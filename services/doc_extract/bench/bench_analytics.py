@@ -0,0 +1,75 @@
+"""
+Analytics benchmark: multi-year aggregations on Postgres vs the embedded
+DuckDB over the Parquet snapshots.
+
+    cd services/doc_extract/app && POSTGRES_DSN=... ANALYTICS_DIR=/tmp/analytics \
+        python ../bench/bench_analytics.py [--repeat 3] [--full]
+
+Refreshes the snapshots first (incremental unless --full) and reports its
+time, then runs each query --repeat times on both engines (best time).
+The Postgres side is the equivalent GROUP BY over the partitioned
+transactions table. Needs seeded transactions (bench/seed_partitions.py).
+"""
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from db.database import engine
+from services.analytics import year_over_year, rolling_spend, category_trends
+from services.snapshots import refresh_snapshots
+
+MAJOR = "t.debit::float8 / 10 ^ t.currency_exponent"
+PG_QUERIES = {
+    "yoy (year)": f"""
+        SELECT extract(year FROM date) y, currency, sum({MAJOR}), count(*)
+        FROM transactions t GROUP BY 1, 2""",
+    "yoy (month)": f"""
+        SELECT extract(year FROM date) y, extract(month FROM date) m, currency, sum({MAJOR}), count(*)
+        FROM transactions t GROUP BY 1, 2, 3""",
+    "rolling 3m": f"""
+        SELECT m, currency, s, avg(s) OVER (PARTITION BY currency ORDER BY m ROWS 2 PRECEDING)
+        FROM (SELECT date_trunc('month', date) m, currency, sum({MAJOR}) s FROM transactions t GROUP BY 1, 2) x""",
+    "category trends": f"""
+        SELECT coalesce(category, 'Uncategorized'), currency, date_trunc('month', date), sum({MAJOR}), count(*)
+        FROM transactions t WHERE debit IS NOT NULL GROUP BY 1, 2, 3""",
+}
+DUCK_QUERIES = {
+    "yoy (year)": lambda: year_over_year("year"),
+    "yoy (month)": lambda: year_over_year("month"),
+    "rolling 3m": lambda: rolling_spend(3),
+    "category trends": lambda: category_trends(top=10),
+}
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--full", action="store_true", help="rebuild all months before measuring")
+    args = ap.parse_args()
+
+    report = refresh_snapshots(full=args.full)
+    print(f"snapshot {report['status']}: {len(report.get('months', []))} month(s), "
+          f"{report.get('rows', 0)} rows in {report.get('seconds', 0)}s")
+
+    def pg(sql):
+        with engine.connect() as conn:
+            conn.exec_driver_sql(sql).fetchall()
+
+    for name, sql in PG_QUERIES.items():
+        t_pg = best_of(lambda: pg(sql), args.repeat)
+        t_duck = best_of(DUCK_QUERIES[name], args.repeat)
+        print(f"{name:<16} postgres {t_pg * 1000:8.1f} ms | duckdb {t_duck * 1000:8.1f} ms | "
+              f"x{t_pg / max(t_duck, 1e-9):5.1f}")
+
+
+if __name__ == "__main__":
+    main()
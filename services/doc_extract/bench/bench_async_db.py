@@ -0,0 +1,117 @@
+"""
+Read-endpoint concurrency benchmark: sync SQLAlchemy on the thread pool
+(DB_ASYNC_READS=false) vs the asyncpg engine (DB_ASYNC_READS=true).
+
+    cd services/doc_extract/app && POSTGRES_DSN=... python ../bench/bench_async_db.py \
+        [--clients 50 200 500] [--seconds 10] [--endpoint search|summary|mixed]
+
+For each mode a uvicorn server is started with the response cache off (every
+request reaches the database), then each client count runs closed-loop for
+--seconds: requests/sec, p50 / p99 latency and errors. Needs seeded
+transactions (bench/seed_partitions.py). The load generator shares the
+machine with the server; run it from another host for absolute numbers.
+"""
+import argparse, asyncio, os, random, statistics, subprocess, sys, time
+import urllib.request
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+TERMS = ["carrefour", "careem", "pos", "transfer", "salary", "atm", "noon", "dewa"]
+
+
+def start_server(port: int, async_reads: bool) -> subprocess.Popen:
+    env = dict(os.environ, DB_INIT_ON_STARTUP="false", WARMUP_ON_STARTUP="false",
+               RESPONSE_CACHE_SIZE="0", DB_ASYNC_READS="true" if async_reads else "false")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning",
+         "--backlog", "2048"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < 30:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise RuntimeError("service did not become live within 30s")
+
+
+def make_request(endpoint: str, years: tuple):
+    if endpoint == "mixed":
+        endpoint = random.choice(("search", "summary"))
+    if endpoint == "summary":
+        return "POST", "/expenses/summary", {"json": {"year": random.choice(years), "month": random.randint(1, 12)}}
+    y = random.choice(years)
+    m = random.randint(1, 12)
+    return "GET", "/transactions/search", {"params": {
+        "q": random.choice(TERMS), "date_from": f"{y}-{m:02d}-01", "date_to": f"{y}-{m:02d}-07", "page_size": 20,
+    }}
+
+
+async def run_level(base_url: str, clients: int, seconds: float, endpoint: str, years: tuple) -> dict:
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                method, path, kwargs = make_request(endpoint, years)
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, **kwargs)
+                    if r.status_code != 200:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - t0)
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - t_start
+
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else float("nan")
+    return {"rps": len(latencies) / elapsed, "p50": p(0.50), "p99": p(0.99), "ok": len(latencies), "errors": errors}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, nargs="+", default=[50, 200, 500])
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--endpoint", choices=("search", "summary", "mixed"), default="mixed")
+    ap.add_argument("--years", type=int, nargs="+", default=[2021, 2022], help="years with seeded data")
+    ap.add_argument("--port", type=int, default=8766)
+    args = ap.parse_args()
+
+    results = {}
+    for async_reads in (False, True):
+        mode = "async (asyncpg)" if async_reads else "sync (thread pool)"
+        proc = start_server(args.port, async_reads)
+        try:
+            asyncio.run(run_level(f"http://127.0.0.1:{args.port}", 10, 2, args.endpoint, tuple(args.years)))  # warm-up
+            for clients in args.clients:
+                r = asyncio.run(run_level(f"http://127.0.0.1:{args.port}", clients, args.seconds,
+                                          args.endpoint, tuple(args.years)))
+                results[(mode, clients)] = r
+                print(f"{mode:<19} {clients:4d} clients: {r['rps']:8.1f} req/s | p50 {r['p50']:8.1f} ms | "
+                      f"p99 {r['p99']:8.1f} ms | {r['ok']} ok, {r['errors']} errors")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print()
+    for clients in args.clients:
+        s, a = results[("sync (thread pool)", clients)], results[("async (asyncpg)", clients)]
+        print(f"{clients:4d} clients: req/s x{a['rps'] / max(s['rps'], 1e-9):4.2f} | "
+              f"p99 {s['p99']:8.1f} -> {a['p99']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
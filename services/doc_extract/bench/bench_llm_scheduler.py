@@ -0,0 +1,109 @@
+"""
+LLM scheduler benchmark: chat latency while a statement batch is ingesting.
+
+    cd services/doc_extract/app && python ../bench/bench_llm_scheduler.py \
+        [--ingest-threads 12] [--seconds 30] [--latency-ms 400] [--parallel 1]
+
+Starts bench/ollama_stub.py in-process, then for two setups runs
+--ingest-threads back-to-back metadata calls (long prompts, priority
+"ingestion") plus one interactive prompt every --chat-interval seconds:
+  fifo       no scheduling (every call goes straight to Ollama's own queue),
+             full metadata prompts only
+  scheduled  LLM_CONCURRENCY = --parallel slots, interactive first, degraded
+             (short) metadata prompts while a chat is active
+Reports interactive p50 / p95 / max, ingestion calls/s and the scheduler's
+shed / expired / degraded counters.
+"""
+import argparse, os, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import ollama_stub
+from services import llm_scheduler
+from services.llm_scheduler import LLMScheduler, LLMBusy, ollama_generate
+
+LONG_PROMPT = "Extract ONLY statement metadata from the statement text snippet.\n" + "01/10/2025 POS 12.50 " * 1200
+SHORT_PROMPT = "Extract ONLY statement metadata from the statement text snippet.\n" + "01/10/2025 POS 12.50 " * 250
+CHAT_PROMPT = "You are a date extraction engine.\nToday is 2025-11-03.\nUser message: what did I spend lately?"
+
+
+def run(seconds: float, ingest_threads: int, chat_interval: float, degrade: bool) -> dict:
+    stop = time.perf_counter() + seconds
+    chat, ingest = [], []
+    errors = {"interactive": 0, "ingestion": 0}
+
+    def body(prompt):
+        return {"model": "stub", "prompt": prompt, "stream": False}
+
+    def ingester():
+        while time.perf_counter() < stop:
+            try:
+                ollama_generate(body(LONG_PROMPT), "ingestion", body(SHORT_PROMPT) if degrade else None)
+                ingest.append(time.perf_counter())
+            except LLMBusy:
+                errors["ingestion"] += 1
+                time.sleep(0.5)
+
+    def chatter():
+        time.sleep(1.0)  # let the ingestion backlog build up first
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            try:
+                ollama_generate(body(CHAT_PROMPT), "interactive")
+                chat.append(time.perf_counter() - t0)
+            except LLMBusy:
+                errors["interactive"] += 1
+            time.sleep(max(0.0, chat_interval - (time.perf_counter() - t0)))
+
+    threads = [threading.Thread(target=ingester) for _ in range(ingest_threads)] + [threading.Thread(target=chatter)]
+    t_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+
+    chat.sort()
+    pct = lambda q: chat[min(len(chat) - 1, int(q * len(chat)))] * 1000 if chat else float("nan")
+    return {"chat_p50": pct(0.5), "chat_p95": pct(0.95), "chat_max": pct(1.0), "chats": len(chat),
+            "ingest_rps": len(ingest) / elapsed, "errors": errors}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ingest-threads", type=int, default=12)
+    ap.add_argument("--seconds", type=float, default=30)
+    ap.add_argument("--chat-interval", type=float, default=2.0)
+    ap.add_argument("--latency-ms", type=float, default=400)
+    ap.add_argument("--parallel", type=int, default=1, help="stub slots (OLLAMA_NUM_PARALLEL)")
+    ap.add_argument("--port", type=int, default=11997)
+    args = ap.parse_args()
+
+    stub_args = ollama_stub.parse_args(["--port", str(args.port), "--latency-ms", str(args.latency_ms),
+                                        "--jitter-ms", "0", "--parallel", str(args.parallel)])
+    server = ollama_stub.serve(stub_args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm_scheduler.OLLAMA_BASE_URL = f"http://127.0.0.1:{args.port}"
+
+    big = 10 ** 6
+    setups = {
+        "fifo": LLMScheduler(big, {p: big for p in llm_scheduler.PRIORITIES}, {p: 600 for p in llm_scheduler.PRIORITIES},
+                             {p: big for p in llm_scheduler.PRIORITIES}),
+        "scheduled": LLMScheduler(args.parallel, {"interactive": args.parallel, "ingestion": args.parallel,
+                                                  "background": 1},
+                                  {"interactive": 20, "ingestion": 600, "background": 120},
+                                  {"interactive": 64, "ingestion": 32, "background": 4}),
+    }
+    for name, sched in setups.items():
+        llm_scheduler.scheduler = sched
+        r = run(args.seconds, args.ingest_threads, args.chat_interval, degrade=name == "scheduled")
+        s = sched.stats()["classes"]
+        print(f"{name:<10} chat p50 {r['chat_p50']:8.1f} | p95 {r['chat_p95']:8.1f} | max {r['chat_max']:8.1f} ms "
+              f"({r['chats']} prompts) | ingestion {r['ingest_rps']:5.2f} calls/s, "
+              f"{s['ingestion']['degraded'] if name == 'scheduled' else '-'} degraded | busy: {r['errors']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Metadata model cascade benchmark: large model only vs small-first cascade.
+
+    cd services/doc_extract/app && POSTGRES_DSN=... python ../bench/bench_metadata_cascade.py \
+        [--statements 40] [--small-ms 600] [--large-ms 2400] [--weak-rate 0.2]
+
+Starts bench/ollama_stub.py in-process with per-model latencies and a
+small model that answers --weak-rate of metadata prompts badly (truncated
+JSON or a null account number). Runs the same statement prompts through
+services.extraction_service.ollama_metadata for two tier lists:
+  large      [large model]
+  cascade    [small model, large model]
+Reports mean / p95 latency per statement, which tier answered, escalations
+and failures (no valid metadata from any tier). No database access; the DSN
+is only needed to import the app.
+"""
+import argparse, os, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import ollama_stub
+from fastapi import HTTPException
+from services import llm_scheduler, extraction_service
+from services.extraction_service import build_metadata_prompt, ollama_metadata
+
+SMALL, LARGE = "qwen2.5:3b", "qwen2.5:7b"
+
+
+def statement_text(i: int) -> str:
+    return (f"EXAMPLE BANK\nJOHN DOE\nAccount number: CB{i:06d}\n"
+            f"Statement period: 01/{i % 12 + 1:02d}/2025 - 28/{i % 12 + 1:02d}/2025\n"
+            f"Opening balance: 1,000.00\nClosing balance: 900.00\n" + "01/10/2025 POS 12.50 900.00\n" * 200)
+
+
+def run(models: list, statements: int) -> dict:
+    extraction_service.OLLAMA_METADATA_MODELS = models
+    latencies, tiers, failed = [], [], 0
+    for i in range(statements):
+        prompt = build_metadata_prompt(statement_text(i), "AED", None, None)
+        t0 = time.perf_counter()
+        try:
+            meta = ollama_metadata(prompt, "AED")
+            tiers.append(meta["llm"]["tier"])
+        except HTTPException:
+            failed += 1
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    return {
+        "mean": sum(latencies) / len(latencies) * 1000,
+        "p95": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000,
+        "tiers": {models[t]: tiers.count(t) for t in sorted(set(tiers))},
+        "failed": failed,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--statements", type=int, default=40)
+    ap.add_argument("--small-ms", type=float, default=600)
+    ap.add_argument("--large-ms", type=float, default=2400)
+    ap.add_argument("--weak-rate", type=float, default=0.2, help="bad metadata answers from the small model")
+    ap.add_argument("--port", type=int, default=11996)
+    args = ap.parse_args()
+
+    stub_args = ollama_stub.parse_args([
+        "--port", str(args.port), "--jitter-ms", "0", "--per-kchar-ms", "0",
+        "--model-latency", f"{SMALL}={args.small_ms}", f"{LARGE}={args.large_ms}",
+        "--weak-models", SMALL, "--weak-rate", str(args.weak_rate),
+    ])
+    server = ollama_stub.serve(stub_args)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    llm_scheduler.OLLAMA_BASE_URL = f"http://127.0.0.1:{args.port}"
+
+    for name, models in (("large", [LARGE]), ("cascade", [SMALL, LARGE])):
+        r = run(models, args.statements)
+        print(f"{name:<8} mean {r['mean']:7.1f} | p95 {r['p95']:7.1f} ms per statement | "
+              f"answered by {r['tiers']} | failed {r['failed']}")
+    print(f"cascade stats: {extraction_service.cascade_stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
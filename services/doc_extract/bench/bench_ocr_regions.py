@@ -0,0 +1,111 @@
+"""
+Region OCR benchmark: one --psm 6 pass over the whole page vs OCR of the
+detected table (amount columns with a digits whitelist) + header region.
+
+    cd services/doc_extract/app && python ../bench/bench_ocr_regions.py [pdf] [--pages N]
+
+Without a pdf argument a synthetic scanned statement page is generated
+(logo, address block, transaction table, disclaimer footer). Reports OCR
+time, output lines, transaction-like lines and junk lines per page. Without
+a tesseract binary only table detection and the OCR'd area are reported.
+"""
+import argparse, os, re, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import fitz
+
+from extractors import _render_page_gray, _tesseract
+from ocr_regions import find_table, ocr_page
+from page_triage import _tesseract_available
+
+DISCLAIMER = ("This statement is issued for information only. Please examine it and report any discrepancy "
+              "within 15 days, failing which the entries will be deemed correct. ")
+
+
+def synthetic_scan() -> fitz.Document:
+    src = fitz.open()
+    page = src.new_page()
+    page.draw_rect(fitz.Rect(40, 30, 190, 80), color=(0, 0, 0), fill=(0.2, 0.2, 0.2))  # logo
+    y = 40
+    for line in ["Customer Care 800 1234", "P.O. Box 1234, Dubai, UAE", "www.example-bank.ae"]:
+        page.insert_text((380, y), line, fontsize=8)
+        y += 12
+    y = 110
+    for line in ["JOHN DOE", "Villa 12, Street 4, Jumeirah", "Account number: 1234567890",
+                 "Statement period: 01/10/2025 - 31/10/2025"]:
+        page.insert_text((40, y), line, fontsize=9)
+        y += 14
+    x_cols = (40, 110, 360, 440, 510)
+    y = 190
+    for col, label in zip(x_cols, ["Date", "Description", "Debit", "Credit", "Balance"]):
+        page.insert_text((col, y), label, fontsize=8)
+    page.draw_line((40, y + 4), (560, y + 4))
+    y += 16
+    for i in range(40):
+        cells = [f"{i % 28 + 1:02d}/10/2025", f"POS PURCHASE MERCHANT {i} REF{100000 + i}",
+                 f"{10 + i:,.2f}" if i % 3 else "", "" if i % 3 else f"{1100 + i:,.2f}", f"{9000 - i:,.2f}"]
+        for col, cell in zip(x_cols, cells):
+            page.insert_text((col, y), cell, fontsize=7)
+        y += 13
+    page.insert_textbox(fitz.Rect(40, y + 20, 560, 820), DISCLAIMER * 6, fontsize=7)
+
+    png = page.get_pixmap(dpi=150).tobytes("png")
+    doc = fitz.open()
+    out = doc.new_page()
+    out.insert_image(out.rect, stream=png)
+    return doc
+
+
+def looks_like_txn_line(line: str) -> bool:
+    # same test as services.extraction_service.looks_like_txn_line (importing it needs a DB config)
+    return bool(re.search(r"\d{2}/\d{2}/\d{4}", line)) and \
+        len(re.findall(r"-?\d[\d,]*\.\d{1,2}|\b-?\d[\d,]*\b", line)) >= 2
+
+
+def text_stats(text: str) -> tuple:
+    lines = [l for l in text.splitlines() if l.strip()]
+    txn = sum(1 for l in lines if looks_like_txn_line(l))
+    return len(lines), txn, len(lines) - txn
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdf", nargs="?")
+    ap.add_argument("--pages", type=int, default=1)
+    args = ap.parse_args()
+
+    doc = fitz.open(args.pdf) if args.pdf else synthetic_scan()
+    ocr = _tesseract_available()
+    if not ocr:
+        print("tesseract not found: reporting table detection and OCR'd area only")
+
+    for i, page in enumerate(doc[: args.pages]):
+        img = _render_page_gray(page, dpi=300)
+        t0 = time.perf_counter()
+        table = find_table(img)
+        t_detect = time.perf_counter() - t0
+        h, w = img.shape
+        if table is None:
+            print(f"page {i + 1}: no table found ({t_detect * 1000:.1f} ms) - whole page OCR")
+            continue
+        x0, y0, x1, y1 = table["box"]
+        print(f"page {i + 1}: table {table['box']} {len(table['lines'])} lines, {len(table['columns'])} columns, "
+              f"{(x1 - x0) * (y1 - y0) / (w * h) * 100:4.1f}% of the page | detection {t_detect * 1000:.1f} ms")
+        if not ocr:
+            continue
+
+        t0 = time.perf_counter()
+        whole = _tesseract(img)
+        t_whole = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        regions = ocr_page(img, i == 0, _tesseract)
+        t_regions = time.perf_counter() - t0
+        for name, t, text in (("whole page", t_whole, whole), ("regions", t_regions, regions)):
+            lines, txn, junk = text_stats(text)
+            print(f"  {name:<10} {t * 1000:7.1f} ms | {lines:3d} lines, {txn:3d} transaction-like, {junk:3d} other")
+        print(f"  speedup {t_whole / max(t_regions, 1e-9):4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
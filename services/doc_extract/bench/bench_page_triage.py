@@ -0,0 +1,128 @@
+"""
+Low-dpi page triage benchmark: full 300 dpi OCR of every page vs triage
+first and full OCR only for the header / transaction pages.
+
+    cd services/doc_extract/app && python ../bench/bench_page_triage.py [pdf] [--copies N]
+
+Without a pdf argument a synthetic scanned statement is generated: cover
+page, transaction pages, a T&C page, a marketing insert and a blank back
+page, repeated --copies times. Without a tesseract binary only the render +
+threshold part of the full pass is timed (the OCR share is reported as n/a).
+"""
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import fitz
+
+from extractors import _render_page_gray, _tesseract
+from page_triage import _tesseract_available, classify_page
+
+LOREM = (
+    "The Bank may amend these terms and conditions at any time by giving notice to the customer. "
+    "Charges are applied in accordance with the schedule of tariffs in force from time to time and "
+    "the customer authorises the Bank to debit any account held with it for such charges. "
+)
+
+
+def _cover(page):
+    page.draw_rect(fitz.Rect(40, 40, 200, 100), color=(0, 0, 0), fill=(0.2, 0.2, 0.2))
+    y = 140
+    for line in ["ACCOUNT STATEMENT", "Account holder: JOHN DOE", "Account number: 1234567890",
+                 "Statement period: 01/10/2025 - 31/10/2025", "Opening balance: 10,000.00",
+                 "Closing balance: 8,765.43"]:
+        page.insert_text((40, y), line, fontsize=10)
+        y += 18
+
+
+def _transactions(page, start):
+    x_cols = (40, 110, 360, 440, 510)
+    y = 60
+    for col, label in zip(x_cols, ["Date", "Description", "Debit", "Credit", "Balance"]):
+        page.insert_text((col, y), label, fontsize=8)
+    page.draw_line((40, y + 4), (560, y + 4))
+    y += 16
+    for i in range(start, start + 55):
+        cells = [f"{i % 28 + 1:02d}/10/2025", f"POS PURCHASE MERCHANT {i} REF{100000 + i}",
+                 f"{10 + i:.2f}" if i % 3 else "", "" if i % 3 else f"{100 + i:.2f}", f"{9000 - i:.2f}"]
+        for col, cell in zip(x_cols, cells):
+            page.insert_text((col, y), cell, fontsize=7)
+        y += 13
+
+
+def _terms(page):
+    page.insert_textbox(fitz.Rect(40, 50, 560, 800), LOREM * 14, fontsize=8, align=fitz.TEXT_ALIGN_JUSTIFY)
+
+
+def _marketing(page):
+    page.draw_rect(fitz.Rect(40, 60, 560, 420), color=(0, 0, 0), fill=(0.35, 0.35, 0.35))
+    page.draw_circle((300, 560), 90, color=(0, 0, 0), fill=(0.1, 0.1, 0.1))
+    page.insert_text((60, 720), "Earn 5% cashback with the new Platinum card", fontsize=14)
+    page.insert_text((60, 745), "Apply today in the mobile app", fontsize=10)
+
+
+def synthetic_scan(copies: int) -> fitz.Document:
+    src = fitz.open()
+    for c in range(copies):
+        _cover(src.new_page())
+        for k in range(3):
+            _transactions(src.new_page(), c * 1000 + k * 55)
+        _terms(src.new_page())
+        _marketing(src.new_page())
+        src.new_page()  # blank back page
+    # rasterise and re-embed every page = "scanned" statement
+    doc = fitz.open()
+    for page in src:
+        png = page.get_pixmap(dpi=150).tobytes("png")
+        out = doc.new_page()
+        out.insert_image(out.rect, stream=png)
+    return doc
+
+
+def full_pass(page, ocr: bool) -> float:
+    t0 = time.perf_counter()
+    img = _render_page_gray(page, dpi=300)
+    if ocr:
+        _tesseract(img)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdf", nargs="?")
+    ap.add_argument("--copies", type=int, default=1, help="synthetic statements concatenated")
+    args = ap.parse_args()
+
+    doc = fitz.open(args.pdf) if args.pdf else synthetic_scan(args.copies)
+    pages = doc[:25]  # same cap as extract_text
+    ocr = _tesseract_available()
+    if not ocr:
+        print("tesseract not found: full pass = 300 dpi render + threshold only")
+
+    t_full = t_triage = t_kept = 0.0
+    skipped = 0
+    for i, page in enumerate(pages):
+        full = full_pass(page, ocr)
+        t0 = time.perf_counter()
+        triage = classify_page(page, i)
+        tri = time.perf_counter() - t0
+        t_full += full
+        t_triage += tri
+        if triage["ocr"]:
+            t_kept += full
+        else:
+            skipped += 1
+        f = triage["features"]
+        print(f"page {i + 1:2d}: {triage['kind']:<12} {'OCR ' if triage['ocr'] else 'skip'} "
+              f"triage {tri * 1000:6.1f} ms | full {full * 1000:7.1f} ms | "
+              f"lines {f['text_lines']:3d} gutters {f['gutters']} rules {f['h_rules']}/{f['v_rules']} "
+              f"graphic {f['graphic']:.2f} | {triage['reason']}")
+
+    t_new = t_triage + t_kept
+    print(f"\n{len(pages)} pages, {skipped} skipped | all pages full: {t_full:6.2f} s | "
+          f"triage {t_triage:5.2f} s + full on kept {t_kept:6.2f} s = {t_new:6.2f} s | "
+          f"speedup {t_full / max(t_new, 1e-9):4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
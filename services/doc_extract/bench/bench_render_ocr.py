@@ -0,0 +1,80 @@
+"""
+Render-to-OCR preprocessing benchmark: legacy RGB/PIL path vs the
+grayscale zero-copy path in extractors.py (tesseract itself is excluded).
+
+    cd services/doc_extract/app && python ../bench/bench_render_ocr.py [pdf] [--pages N]
+
+Without a pdf argument a synthetic scanned statement page is generated.
+"""
+import argparse, os, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+import cv2
+import fitz
+import numpy as np
+from PIL import Image
+
+from extractors import _render_page_gray
+
+
+def legacy_preprocess(page, dpi=300):
+    pix = page.get_pixmap(dpi=dpi)
+    pil = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    img = np.array(pil.convert("RGB"))
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    gray = cv2.bilateralFilter(gray, 9, 75, 75)
+    thr = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 35, 11
+    )
+    return Image.fromarray(thr)
+
+
+def synthetic_scan() -> fitz.Document:
+    # Text page rasterised and re-embedded as an image = "scanned" page
+    src = fitz.open()
+    page = src.new_page()
+    y = 60
+    for i in range(60):
+        page.insert_text((40, y), f"{i+1:02d}/10/2025 POS PURCHASE MERCHANT {i} REF{100000+i} {10+i:.2f} {9000-i:.2f}", fontsize=8)
+        y += 12
+    png = page.get_pixmap(dpi=150).tobytes("png")
+    doc = fitz.open()
+    out = doc.new_page()
+    out.insert_image(out.rect, stream=png)
+    return doc
+
+
+def measure(fn, page, runs):
+    fn(page)  # warm-up
+    times = []
+    peaks = []
+    for _ in range(runs):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fn(page)
+        times.append(time.perf_counter() - t0)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    times.sort()
+    return times[len(times) // 2], max(peaks)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("pdf", nargs="?")
+    ap.add_argument("--pages", type=int, default=1)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    doc = fitz.open(args.pdf) if args.pdf else synthetic_scan()
+    for i, page in enumerate(doc[: args.pages]):
+        t_old, m_old = measure(legacy_preprocess, page, args.runs)
+        t_new, m_new = measure(_render_page_gray, page, args.runs)
+        print(f"page {i}: legacy {t_old*1000:7.1f} ms  peak {m_old/2**20:6.1f} MiB | "
+              f"gray zero-copy {t_new*1000:7.1f} ms  peak {m_new/2**20:6.1f} MiB | "
+              f"speedup {t_old/t_new:4.2f}x  alloc -{(1 - m_new/m_old)*100:4.1f}%")
+
+
+if __name__ == "__main__":
+    main()
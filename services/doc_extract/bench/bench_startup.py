@@ -0,0 +1,76 @@
+"""
+Startup budget check for doc-extract.
+
+    cd services/doc_extract/app && POSTGRES_DSN=... python ../bench/bench_startup.py
+
+Measures (median of --runs):
+  - import time of main.py in a fresh interpreter, and that no heavy
+    PDF/OCR module is imported by it
+  - cold start: uvicorn spawn -> first 200 from /health (liveness)
+Exits non-zero when a budget is exceeded.
+"""
+import argparse, os, statistics, subprocess, sys, time
+import urllib.request
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+IMPORT_BUDGET_S = 1.5
+COLD_START_BUDGET_S = 3.0
+HEAVY_MODULES = ("cv2", "fitz", "pytesseract", "numpy", "PIL")
+
+IMPORT_PROBE = (
+    "import time, sys; t = time.perf_counter(); import main; "
+    "print(time.perf_counter() - t); "
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def measure_import():
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(out[0]), out[1] if len(out) > 1 else ""
+
+
+def measure_cold_start(port: int) -> float:
+    env = dict(os.environ, DB_INIT_ON_STARTUP="false", WARMUP_ON_STARTUP="false")
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < 30:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("service did not become live within 30s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_s = statistics.median(t for t, _ in imports)
+    heavy = imports[0][1]
+    cold_s = statistics.median(measure_cold_start(args.port) for _ in range(args.runs))
+
+    ok = import_s <= IMPORT_BUDGET_S and cold_s <= COLD_START_BUDGET_S and not heavy
+    print(f"import main : {import_s:.3f}s (budget {IMPORT_BUDGET_S}s)")
+    print(f"heavy mods  : {heavy or 'none'}")
+    print(f"cold start  : {cold_s:.3f}s to first /health 200 (budget {COLD_START_BUDGET_S}s)")
+    print("OK" if ok else "BUDGET EXCEEDED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Load test for doc-extract: /extract, /expenses/summary and /agent at a fixed
+concurrency, against an Ollama stand-in (bench/ollama_stub.py).
+
+    # everything local: starts the stub and a uvicorn pointed at it
+    cd services/doc_extract/app && POSTGRES_DSN=... python ../bench/load_test.py --spawn \
+        [--concurrency 8] [--seconds 30] [--mix extract=1,summary=4,agent=2] [--stub-latency-ms 800]
+
+    # a running stack (docker compose --profile loadtest, OLLAMA_BASE_URL=http://ollama-stub:11434)
+    python services/doc_extract/bench/load_test.py --base-url http://localhost:8000 --stub-url http://localhost:11434
+
+Closed loop: each of --concurrency clients picks an endpoint by the --mix
+weights, waits for the answer and sends the next request. /extract uploads
+synthetic digital statements (unique account number per PDF, so each one is
+a new statement); use a scratch database, every upload is persisted. Per
+endpoint: requests/s, p50 / p95 / p99 latency and the error rate (503 =
+admission control shedding, counted separately). Needs httpx and pymupdf.
+"""
+import argparse, asyncio, io, os, random, statistics, subprocess, sys, time, uuid
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+
+EXPENSE_QUESTIONS = [
+    # parsed deterministically: no LLM call
+    "How much did I spend in {month} {year}?",
+    "What were my expenses in {month} {year}?",
+    # vague period: the agent asks the LLM (stub)
+    "How much did I spend lately?",
+]
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+
+
+# -------------------------------------------------
+# Synthetic statements
+# -------------------------------------------------
+
+def synthetic_statement(account: str, start: date, rows: int) -> bytes:
+    """Digital (text layer) statement PDF: header, balances, a table of `rows` transactions."""
+    import fitz  # PyMuPDF
+
+    end = start + timedelta(days=27)
+    opening = round(random.uniform(5000, 20000), 2)
+    balance = opening
+    lines = []
+    for i in range(rows):
+        d = start + timedelta(days=i * 27 // max(rows, 1))
+        if i % 5 == 4:
+            credit, debit = round(random.uniform(500, 3000), 2), None
+            balance += credit
+        else:
+            debit, credit = round(random.uniform(5, 400), 2), None
+            balance -= debit
+        desc = random.choice(["POS CARREFOUR DXB", "CAREEM RIDE", "NOON.COM", "DEWA BILL", "SALARY TRANSFER",
+                              "ATM WITHDRAWAL", "TALABAT ORDER"]) + f" REF{100000 + i}"
+        lines.append((f"{d:%d/%m/%Y}", desc, debit, credit, round(balance, 2)))
+
+    doc = fitz.open()
+    page = doc.new_page()
+    y = 50
+    for text in ["EXAMPLE BANK", "JOHN DOE", f"Account number: {account}",
+                 f"Statement period: {start:%d/%m/%Y} - {end:%d/%m/%Y}",
+                 f"Opening balance: {opening:,.2f}", f"Closing balance: {balance:,.2f}"]:
+        page.insert_text((40, y), text, fontsize=9)
+        y += 14
+    y += 10
+    cols = (40, 110, 380, 450, 520)
+    for x, label in zip(cols, ["Date", "Description", "Debit", "Credit", "Balance"]):
+        page.insert_text((x, y), label, fontsize=8)
+    y += 14
+    for d, desc, debit, credit, bal in lines:
+        if y > 800:
+            page = doc.new_page()
+            y = 50
+        cells = [d, desc, f"{debit:,.2f}" if debit else "", f"{credit:,.2f}" if credit else "", f"{bal:,.2f}"]
+        for x, cell in zip(cols, cells):
+            if cell:
+                page.insert_text((x, y), cell, fontsize=7)
+        y += 12
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+# -------------------------------------------------
+# Requests
+# -------------------------------------------------
+
+class Workload:
+    def __init__(self, args):
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:6].upper()
+        self.seq = 0
+        # generated up front: PDF rendering would otherwise compete with the server for CPU
+        self.pdfs = [self._pdf() for _ in range(args.pdfs)]
+
+    def _pdf(self) -> tuple:
+        self.seq += 1
+        start = date(2025, random.randint(1, 12), 1)
+        account = f"LT{self.run_id}{self.seq:05d}"
+        return account, synthetic_statement(account, start, self.args.rows)
+
+    def request(self, endpoint: str) -> tuple:
+        """(method, path, httpx kwargs)"""
+        year = random.choice(self.args.years)
+        if endpoint == "extract":
+            account, pdf = self.pdfs[self.seq % len(self.pdfs)]
+            self.seq += 1
+            return "POST", "/extract", {"files": {"file": (f"{account}.pdf", pdf, "application/pdf")}}
+        if endpoint == "summary":
+            return "POST", "/expenses/summary", {"json": {"year": year, "month": random.randint(1, 12)}}
+        question = random.choice(EXPENSE_QUESTIONS).format(month=random.choice(MONTHS), year=year)
+        return "POST", "/agent", {"json": {"message": question, "meta": {"timezone": "Asia/Dubai"}}}
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, w = part.partition("=")
+        if name.strip() not in ("extract", "summary", "agent"):
+            raise SystemExit(f"unknown endpoint in --mix: {name}")
+        weights[name.strip()] = float(w or 1)
+    return weights
+
+
+async def run(base_url: str, workload: Workload, weights: dict, concurrency: int, seconds: float,
+              timeout: float) -> dict:
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    names, w = list(weights), list(weights.values())
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                endpoint = random.choices(names, w)[0]
+                method, path, kwargs = workload.request(endpoint)
+                t0 = time.perf_counter()
+                try:
+                    r = await client.request(method, path, **kwargs)
+                    status = r.status_code
+                except httpx.TimeoutException:
+                    status = "timeout"
+                except httpx.HTTPError:
+                    status = "conn"
+                statuses[endpoint][status] += 1
+                if status == 200:
+                    latencies[endpoint].append(time.perf_counter() - t0)
+                elif status == 503:
+                    await asyncio.sleep(0.2)  # shed: back off a little, like a client honouring Retry-After
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t_start
+
+    report = {}
+    for endpoint in names:
+        lat = sorted(latencies[endpoint])
+        total = sum(statuses[endpoint].values())
+        p = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else float("nan")
+        shed = statuses[endpoint].get(503, 0)
+        report[endpoint] = {
+            "requests": total, "ok": len(lat), "rps": len(lat) / elapsed,
+            "p50": p(0.50), "p95": p(0.95), "p99": p(0.99),
+            "mean": statistics.fmean(lat) * 1000 if lat else float("nan"),
+            "error_rate": (total - len(lat) - shed) / total if total else 0.0,
+            "shed": shed, "statuses": dict(statuses[endpoint]),
+        }
+    return {"elapsed": elapsed, "endpoints": report}
+
+
+# -------------------------------------------------
+# Local processes (--spawn)
+# -------------------------------------------------
+
+def wait_http(url: str, proc: subprocess.Popen, what: str, timeout: float = 30):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{what} exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{what} did not answer within {timeout:.0f}s")
+
+
+def spawn(args) -> list:
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "ollama_stub.py"), "--port", str(args.stub_port),
+         "--latency-ms", str(args.stub_latency_ms), "--parallel", str(args.stub_parallel),
+         "--error-rate", str(args.stub_error_rate)],
+        stdout=subprocess.DEVNULL,
+    )
+    wait_http(f"http://127.0.0.1:{args.stub_port}/api/tags", stub, "ollama stub")
+    env = dict(os.environ, OLLAMA_BASE_URL=f"http://127.0.0.1:{args.stub_port}",
+               DB_INIT_ON_STARTUP=os.environ.get("DB_INIT_ON_STARTUP", "true"), WARMUP_ON_STARTUP="false",
+               SNAPSHOT_INTERVAL="0", AGENT_LLM_FALLBACK="true")
+    service = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL,
+    )
+    wait_http(f"http://127.0.0.1:{args.port}/health", service, "doc-extract")
+    return [service, stub]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[8], help="one run per value")
+    ap.add_argument("--seconds", type=float, default=30)
+    ap.add_argument("--mix", default="extract=1,summary=4,agent=2", help="endpoint=weight,...")
+    ap.add_argument("--pdfs", type=int, default=50, help="distinct synthetic statements")
+    ap.add_argument("--rows", type=int, default=40, help="transactions per statement")
+    ap.add_argument("--years", type=int, nargs="+", default=[2021, 2022, 2025])
+    ap.add_argument("--timeout", type=float, default=300)
+    ap.add_argument("--stub-url", default=None, help="report the stub's /stats after each run")
+    ap.add_argument("--spawn", action="store_true", help="start the stub and a local uvicorn")
+    ap.add_argument("--port", type=int, default=8767)
+    ap.add_argument("--stub-port", type=int, default=11998)
+    ap.add_argument("--stub-latency-ms", type=float, default=800)
+    ap.add_argument("--stub-parallel", type=int, default=1)
+    ap.add_argument("--stub-error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    weights = parse_mix(args.mix)
+    procs = []
+    if args.spawn:
+        procs = spawn(args)
+        args.base_url = f"http://127.0.0.1:{args.port}"
+        args.stub_url = f"http://127.0.0.1:{args.stub_port}"
+    try:
+        workload = Workload(args)
+        for concurrency in args.concurrency:
+            result = asyncio.run(run(args.base_url, workload, weights, concurrency, args.seconds, args.timeout))
+            print(f"\nconcurrency {concurrency}, {result['elapsed']:.1f}s:")
+            for endpoint, r in result["endpoints"].items():
+                print(f"  {endpoint:<8} {r['rps']:7.2f} req/s | p50 {r['p50']:8.1f} | p95 {r['p95']:8.1f} | "
+                      f"p99 {r['p99']:8.1f} ms | {r['ok']}/{r['requests']} ok, errors {r['error_rate'] * 100:4.1f}%, "
+                      f"shed {r['shed']} | {r['statuses']}")
+            if args.stub_url:
+                with urllib.request.urlopen(f"{args.stub_url}/stats", timeout=2) as resp:
+                    print(f"  ollama stub: {resp.read().decode()}")
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
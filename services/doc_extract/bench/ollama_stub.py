@@ -0,0 +1,217 @@
+"""
+Offline stand-in for Ollama: just enough of the HTTP API for doc-extract.
+
+    python ollama_stub.py [--port 11434] [--latency-ms 800] [--jitter-ms 200] \
+        [--per-kchar-ms 20] [--parallel 1] [--error-rate 0] [--responses canned.json] \
+        [--model-latency qwen2.5:7b=2400] [--weak-models qwen2.5:3b --weak-rate 0.3]
+
+Standard library only, so it runs in a bare python image (docker compose
+--profile loadtest). Endpoints:
+  POST /api/generate   non-streaming generate; latency = base + jitter + per
+                       1000 prompt chars, with at most --parallel requests
+                       "on the GPU" at once (the rest queue, like
+                       OLLAMA_NUM_PARALLEL). An empty prompt (model load /
+                       warm-up) answers immediately.
+  GET  /api/tags       model list (health check)
+  GET  /stats          calls, errors, in-flight / queued, max queue depth
+Responses are canned JSON chosen by the prompt: statement metadata (account,
+period and balances copied from the prompt when present, so every synthetic
+statement gets its own row), the agent's month/year extraction, or {}.
+--responses adds {"prompt substring": <JSON answer>} overrides.
+Metadata cascade: --model-latency sets a per-model base latency; a
+--weak-models model answers metadata prompts badly with --weak-rate
+probability (alternately prose around truncated JSON, or a null account
+number), so escalation to the next tier can be measured.
+Every option can also be set by env var (STUB_LATENCY_MS, STUB_PARALLEL, ...).
+"""
+import argparse, json, os, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METADATA = {
+    "bank_name": "EXAMPLE BANK",
+    "account_holder_name": "JOHN DOE",
+    "account_number": "1234567890",
+    "statement_period": {"from": "2025-10-01", "to": "2025-10-31"},
+    "opening_balance": {"amount": 10000.0, "currency": "AED"},
+    "closing_balance": {"amount": 9000.0, "currency": "AED"},
+}
+DMY = r"(\d{2})/(\d{2})/(\d{4})"
+
+
+def _iso(m, i: int) -> str:
+    d, mo, y = m.group(i), m.group(i + 1), m.group(i + 2)
+    return f"{y}-{mo}-{d}"
+
+
+def metadata_answer(prompt: str) -> dict:
+    meta = json.loads(json.dumps(METADATA))
+    m = re.search(r"Account (?:number|no\.?)\s*:\s*([A-Z0-9\-]+)", prompt, re.IGNORECASE)
+    if m:
+        meta["account_number"] = m.group(1)
+    m = re.search(rf"period\s*:?\s*{DMY}\s*(?:-|to)\s*{DMY}", prompt, re.IGNORECASE)
+    if m:
+        meta["statement_period"] = {"from": _iso(m, 1), "to": _iso(m, 4)}
+    for key, label in (("opening_balance", "Opening balance"), ("closing_balance", "Closing balance")):
+        m = re.search(rf"{label}\s*:?\s*(-?[\d,]+\.\d{{2}})", prompt, re.IGNORECASE)
+        if m:
+            meta[key]["amount"] = float(m.group(1).replace(",", ""))
+    m = re.search(r'"currency": "([A-Z]{3})"', prompt)
+    if m:
+        meta["opening_balance"]["currency"] = meta["closing_balance"]["currency"] = m.group(1)
+    return meta
+
+
+def period_answer(prompt: str) -> dict:
+    m = re.search(r"Today is (\d{4})-(\d{2})", prompt)
+    year, month = (int(m.group(1)), int(m.group(2))) if m else (2025, 1)
+    # "last month" is the usual ambiguous question
+    return {"month": month - 1 or 12, "year": year if month > 1 else year - 1}
+
+
+class Stub:
+    def __init__(self, args):
+        self.args = args
+        self.overrides = {}
+        if args.responses:
+            with open(args.responses, encoding="utf-8") as f:
+                self.overrides = json.load(f)
+        self.slots = threading.BoundedSemaphore(args.parallel)
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "weak": 0, "in_flight": 0, "queued": 0, "max_queued": 0}
+        self.model_latency = {}
+        for item in args.model_latency:
+            name, _, ms = item.rpartition("=")
+            self.model_latency[name] = float(ms)
+
+    def _count(self, key: str, delta: int = 1):
+        with self.lock:
+            self.stats[key] += delta
+            if key == "queued":
+                self.stats["max_queued"] = max(self.stats["max_queued"], self.stats["queued"])
+
+    def answer(self, prompt: str, model: str) -> str:
+        for needle, resp in self.overrides.items():
+            if needle in prompt:
+                return json.dumps(resp)
+        if "statement metadata" in prompt:
+            meta = metadata_answer(prompt)
+            if model in self.args.weak_models and random.random() < self.args.weak_rate:
+                self._count("weak")
+                if self.stats["weak"] % 2:
+                    return "Sure! Here is the metadata: " + json.dumps(meta)[:-40]
+                meta["account_number"] = None
+            return json.dumps(meta)
+        if "date extraction engine" in prompt:
+            return json.dumps(period_answer(prompt))
+        return "{}"
+
+    def generate(self, body: dict) -> tuple:
+        """(status, payload) for POST /api/generate."""
+        prompt = body.get("prompt") or ""
+        self._count("calls")
+        if not prompt:
+            return 200, {"model": body.get("model"), "response": "", "done": True, "done_reason": "load"}
+
+        a = self.args
+        delay = self.model_latency.get(body.get("model"), a.latency_ms) + random.uniform(-a.jitter_ms, a.jitter_ms) + a.per_kchar_ms * len(prompt) / 1000
+        self._count("queued")
+        t0 = time.perf_counter()
+        with self.slots:
+            self._count("queued", -1)
+            self._count("in_flight")
+            try:
+                time.sleep(max(0.0, delay) / 1000)
+            finally:
+                self._count("in_flight", -1)
+        if random.random() < a.error_rate:
+            self._count("errors")
+            return 500, {"error": "stub: injected failure"}
+
+        total_ns = int((time.perf_counter() - t0) * 1e9)
+        return 200, {
+            "model": body.get("model"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "response": self.answer(prompt, body.get("model")),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": total_ns,
+            "prompt_eval_count": len(prompt) // 4,
+            "eval_count": 64,
+        }
+
+
+def make_handler(stub: Stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+        def _send(self, status: int, payload: dict):
+            out = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send(200, {"models": [{"name": m} for m in stub.args.models]})
+            elif self.path == "/stats":
+                with stub.lock:
+                    self._send(200, dict(stub.stats))
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(n) or b"{}")
+            except ValueError:
+                return self._send(400, {"error": "invalid JSON body"})
+            if self.path != "/api/generate":
+                return self._send(404, {"error": "not found"})
+            self._send(*stub.generate(body))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def parse_args(argv=None):
+    env = os.environ.get
+    ap = argparse.ArgumentParser(description="Ollama stand-in for offline load tests")
+    ap.add_argument("--host", default=env("STUB_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(env("STUB_PORT", "11434")))
+    ap.add_argument("--latency-ms", type=float, default=float(env("STUB_LATENCY_MS", "800")))
+    ap.add_argument("--jitter-ms", type=float, default=float(env("STUB_JITTER_MS", "200")))
+    ap.add_argument("--per-kchar-ms", type=float, default=float(env("STUB_PER_KCHAR_MS", "20")),
+                    help="extra latency per 1000 prompt characters (prompt evaluation)")
+    ap.add_argument("--parallel", type=int, default=int(env("STUB_PARALLEL", "1")),
+                    help="requests served at once; the rest wait (OLLAMA_NUM_PARALLEL)")
+    ap.add_argument("--error-rate", type=float, default=float(env("STUB_ERROR_RATE", "0")))
+    ap.add_argument("--responses", default=env("STUB_RESPONSES"), help="JSON file {prompt substring: answer}")
+    ap.add_argument("--models", nargs="+", default=env("STUB_MODELS", "qwen2.5:3b qwen2.5:7b").split())
+    ap.add_argument("--model-latency", nargs="*", default=env("STUB_MODEL_LATENCY", "").split(),
+                    help="per-model base latency, MODEL=MS (overrides --latency-ms)")
+    ap.add_argument("--weak-models", nargs="*", default=env("STUB_WEAK_MODELS", "").split(),
+                    help="models that answer metadata prompts badly with --weak-rate probability")
+    ap.add_argument("--weak-rate", type=float, default=float(env("STUB_WEAK_RATE", "0.3")))
+    return ap.parse_args(argv)
+
+
+def serve(args) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(Stub(args)))
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = serve(args)
+    print(f"ollama stub on {args.host}:{args.port}: {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+          f"{args.parallel} parallel, error rate {args.error_rate}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Seed a synthetic transactions history and show partition pruning on the
+monthly summary query.
+
+    cd services/doc_extract/app && POSTGRES_DSN=... python ../bench/seed_partitions.py --rows 10000000 --months 60
+
+Rows are generated server-side with generate_series (one INSERT per month,
+partitions created through ensure_transactions_partition). Use a scratch
+database: the seed account is deleted and re-created on every run.
+"""
+import argparse, os, sys, time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from sqlalchemy import text
+
+from db.database import engine, init_db
+from db.crud import month_range
+
+SEED_ACCOUNT = "SEED-PARTITION-BENCH"
+
+SUMMARY_SQL = """
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF)
+SELECT t.date, count(t.id), coalesce(sum(t.debit), 0), coalesce(sum(t.credit), 0), max(t.currency_exponent)
+FROM transactions t JOIN statements s ON s.id = t.statement_id
+WHERE t.date >= :start AND t.date < :end AND s.account_number = :acct
+GROUP BY ROLLUP(t.date)
+ORDER BY t.date
+"""
+
+
+def seed(rows: int, months: int, first: date):
+    per_month = rows // months
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM transactions WHERE statement_id IN (SELECT id FROM statements WHERE account_number = :a)"), {"a": SEED_ACCOUNT})
+        conn.execute(text("DELETE FROM statements WHERE account_number = :a"), {"a": SEED_ACCOUNT})
+        sid = conn.execute(text(
+            "INSERT INTO statements (bank_name, account_number, statement_hash) "
+            "VALUES ('SEED', :a, md5(random()::text)) RETURNING id"
+        ), {"a": SEED_ACCOUNT}).scalar()
+
+    t0 = time.perf_counter()
+    for i in range(months):
+        y, m = first.year + (first.month - 1 + i) // 12, (first.month - 1 + i) % 12 + 1
+        start, end = month_range(y, m)
+        with engine.begin() as conn:
+            conn.execute(text("SELECT ensure_transactions_partition(:d)"), {"d": start})
+            conn.execute(text("""
+                INSERT INTO transactions
+                  (statement_id, txn_hash, is_duplicate, date, description, debit, credit,
+                   balance_after, currency, currency_exponent, direction, confidence)
+                SELECT :sid, md5(:sid || '-' || g || '-' || :start),
+                       false,
+                       :start + (g % (:end - :start)),
+                       'SEED MERCHANT ' || (g % 500),
+                       CASE WHEN g % 5 <> 0 THEN (g::bigint * 7919) % 100000 END,
+                       CASE WHEN g % 5 = 0 THEN (g::bigint * 104729) % 500000 END,
+                       NULL, 'AED', 2,
+                       CASE WHEN g % 5 = 0 THEN 'CREDIT' ELSE 'DEBIT' END,
+                       90
+                FROM generate_series(1, :n) g
+            """), {"sid": sid, "start": start, "end": end, "n": per_month})
+        print(f"  {y}-{m:02d}: {per_month} rows ({time.perf_counter() - t0:.0f}s)", flush=True)
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE transactions"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=10_000_000)
+    ap.add_argument("--months", type=int, default=60)
+    ap.add_argument("--first", default="2021-01-01")
+    ap.add_argument("--skip-seed", action="store_true")
+    args = ap.parse_args()
+
+    init_db()
+    first = date.fromisoformat(args.first)
+    if not args.skip_seed:
+        seed(args.rows, args.months, first)
+
+    y, m = first.year + (first.month - 1 + args.months // 2) // 12, (first.month - 1 + args.months // 2) % 12 + 1
+    start, end = month_range(y, m)
+    with engine.connect() as conn:
+        plan = conn.execute(text(SUMMARY_SQL), {"start": start, "end": end, "acct": SEED_ACCOUNT}).scalars().all()
+    print(f"\nSummary plan for {y}-{m:02d}:")
+    print("\n".join(plan))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
+import os
 import requests
 
 # N8N_AGENT_URL = "http://localhost:5678/webhook-test/agent"
 
 N8N_AGENT_URL = "http://host.docker.internal:5678/webhook-test/agent"
 
+# AGENT_URL=http://doc-extract:8000/agent uses the native agent (same request/response shape)
+AGENT_URL = os.getenv("AGENT_URL", N8N_AGENT_URL)
+
 
 
 
@@ -17,7 +21,7 @@ def query_agent(message: str, user_id="lokesh", timezone="Asia/Dubai"):
         }
     }
 
-    resp = requests.post(N8N_AGENT_URL, json=payload, timeout=3000)
+    resp = requests.post(AGENT_URL, json=payload, timeout=3000)
     resp.raise_for_status()
     print("Agent response:", resp.text)
 
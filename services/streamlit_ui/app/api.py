@@ -1,10 +1,57 @@
+import json
+import os
+from datetime import date
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
 import requests
 
 DOC_EXTRACT_URL = "http://doc-extract:8000/extract"
+DOC_EXTRACT_STREAM_URL = DOC_EXTRACT_URL + "/stream"
+DOC_EXTRACT_EXPORT_URL = "http://doc-extract:8000/transactions/export"
+
+# (connect, read) seconds; OCR of a long scan plus the LLM call can take minutes
+EXTRACT_TIMEOUT = (10, int(os.getenv("EXTRACT_READ_TIMEOUT", "600")))
+EXPORT_TIMEOUT = (10, 300)
 
 
 def extract_statement(file):
     files = {"file": (file.name, file, "application/pdf")}
-    r = requests.post(DOC_EXTRACT_URL, files=files)
+    r = requests.post(DOC_EXTRACT_URL, files=files, timeout=EXTRACT_TIMEOUT)
     r.raise_for_status()
-    return r.json()
\ No newline at end of file
+    return r.json()
+
+
+def extract_statement_stream(file):
+    """
+    Yields progress events (dicts) from /extract/stream; the last one is
+    {"event": "result", "data": ...} or {"event": "error", ...}. The read
+    timeout applies between events, not to the whole extraction.
+    """
+    files = {"file": (file.name, file, "application/pdf")}
+    with requests.post(DOC_EXTRACT_STREAM_URL, files=files, stream=True, timeout=EXTRACT_TIMEOUT) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def export_transactions(
+    columns: Optional[List[str]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    account_number: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Transactions as a DataFrame via the Arrow IPC export: record batches are
+    read straight off the socket and the columns stay Arrow-backed
+    (pd.ArrowDtype), so nothing is converted row by row.
+    """
+    params = {"format": "arrow", "date_from": date_from, "date_to": date_to, "account_number": account_number}
+    if columns:
+        params["columns"] = ",".join(columns)
+    with requests.get(DOC_EXTRACT_EXPORT_URL, params=params, stream=True, timeout=EXPORT_TIMEOUT) as r:
+        r.raise_for_status()
+        table = pa.ipc.open_stream(r.raw).read_all()
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
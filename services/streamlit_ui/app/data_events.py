@@ -0,0 +1,141 @@
+import json
+import os
+import select
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import psycopg2
+from psycopg2 import sql
+
+# Data-change bus: doc-extract NOTIFYs this channel when statements land
+# ({"account_number", "date_from", "date_to", "statement_id", "source"},
+# None = unbounded). Same protocol as services/doc_extract/app/services/data_events.py;
+# the UI image does not ship the service code, hence the copy.
+DATA_CHANGE_CHANNEL = os.getenv("DATA_CHANGE_CHANNEL", "finops_data_change")
+DATA_CHANGE_RECONNECT = float(os.getenv("DATA_CHANGE_RECONNECT", "5"))
+UI_CACHE_SIZE = int(os.getenv("UI_CACHE_SIZE", "256"))
+
+FULL_CHANGE = {"account_number": None, "date_from": None, "date_to": None, "statement_id": None, "source": "listen"}
+
+
+def affects(change: dict, scope: dict) -> bool:
+    """True if `change` may alter data read with `scope` (missing / None = unbounded)."""
+    if scope.get("statement_id") is not None and change.get("statement_id") is not None:
+        return scope["statement_id"] == change["statement_id"]
+    account = scope.get("account_number")
+    if account is not None and change.get("account_number") not in (None, account):
+        return False
+    lo, hi = scope.get("date_from"), scope.get("date_to")
+    if hi is not None and change.get("date_from") is not None and change["date_from"] > str(hi)[:10]:
+        return False
+    if lo is not None and change.get("date_to") is not None and change["date_to"] < str(lo)[:10]:
+        return False
+    return True
+
+
+class DataChangeListener:
+    """
+    LISTEN on one dedicated connection in a daemon thread; handlers get each
+    change, and a full change on every (re)connect (NOTIFY is not durable).
+    """
+
+    def __init__(self, dsn: str, channel: str = DATA_CHANGE_CHANNEL, reconnect_s: float = DATA_CHANGE_RECONNECT):
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_s = reconnect_s
+        self.connected = False
+        self._handlers = []
+        self._thread = None
+
+    def subscribe(self, handler):
+        self._handlers.append(handler)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="data-change-listener", daemon=True)
+            self._thread.start()
+
+    def _dispatch(self, change: dict):
+        for handler in self._handlers:
+            try:
+                handler(change)
+            except Exception as e:
+                print(f"⚠️ data-change handler failed: {e}")
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10,
+                                keepalives_count=3)
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+            self._dispatch(dict(FULL_CHANGE))
+            self.connected = True
+            while True:
+                if not select.select([conn], [], [], 5.0)[0]:
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    try:
+                        change = json.loads(conn.notifies.pop(0).payload)
+                    except ValueError:
+                        change = dict(FULL_CHANGE, source="unparsed")
+                    self._dispatch(change)
+        finally:
+            self.connected = False
+            conn.close()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"⚠️ data-change listener: {e}; reconnecting in {self.reconnect_s:g}s")
+            threading.Event().wait(self.reconnect_s)
+
+
+class ScopedCache:
+    """
+    Memoizes reader functions per arguments, each entry tagged with the
+    data scope it reads; a data change drops only the overlapping entries.
+    Only serves while the listener is connected (else every call hits the
+    database). Cached values are shared between reruns: do not mutate them.
+    """
+
+    def __init__(self, listener: DataChangeListener, size: int = UI_CACHE_SIZE):
+        self.listener = listener
+        self.size = size
+        self._entries = OrderedDict()  # (fn name, args) -> (value, scope)
+        self._generation = 0
+        self._lock = threading.Lock()
+        listener.subscribe(self.invalidate)
+
+    def invalidate(self, change: dict):
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, (_, scope) in self._entries.items() if affects(change, scope)]:
+                del self._entries[key]
+
+    def cached(self, scope_fn):
+        """Decorator; `scope_fn(*args)` returns the scope dict of a call ({} = everything)."""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args):
+                if not self.listener.connected or self.size <= 0:
+                    return fn(*args)
+                key = (fn.__name__, args)
+                with self._lock:
+                    generation = self._generation
+                    hit = self._entries.get(key)
+                    if hit is not None:
+                        self._entries.move_to_end(key)
+                        return hit[0]
+                value = fn(*args)
+                with self._lock:
+                    if generation == self._generation:  # no change landed while reading
+                        self._entries[key] = (value, scope_fn(*args))
+                        while len(self._entries) > self.size:
+                            self._entries.popitem(last=False)
+                return value
+            return wrapper
+        return decorate
@@ -1,14 +1,35 @@
 import os
+from datetime import date, timedelta
+
 import pandas as pd
 from sqlalchemy import create_engine, text
 
+from api import export_transactions
+from data_events import DataChangeListener, ScopedCache
+
 POSTGRES_DSN = os.getenv("POSTGRES_DSN")
 engine = create_engine(POSTGRES_DSN)
 
+# Reads below are cached until doc-extract reports a change overlapping them
+# (LISTEN / NOTIFY, see data_events.py). Module state: one listener per
+# Streamlit server process, shared by all sessions and reruns.
+listener = DataChangeListener(POSTGRES_DSN)
+cache = ScopedCache(listener)
+listener.start()
+
+# Money columns are stored as integer minor units (fils / paise);
+# convert to major units for display.
+MONEY_COLUMNS = """
+    (debit::numeric / 10 ^ currency_exponent)::float8 AS debit,
+    (credit::numeric / 10 ^ currency_exponent)::float8 AS credit,
+    (balance_after::numeric / 10 ^ currency_exponent)::float8 AS balance_after
+"""
+
 # -------------------------
 # Statements
 # -------------------------
 
+@cache.cached(lambda: {})  # any new statement
 def get_latest_statement():
     query = """
         SELECT *
@@ -24,9 +45,14 @@ def get_latest_statement():
 # Transactions
 # -------------------------
 
+@cache.cached(lambda statement_id: {"statement_id": statement_id})
 def get_transactions_by_statement(statement_id: int):
-    query = """
-        SELECT *
+    query = f"""
+        SELECT
+            id, statement_id, date, description,
+            {MONEY_COLUMNS},
+            currency, direction, confidence, reference_id, merchant, category,
+            is_duplicate, duplicate_of, raw
         FROM transactions
         WHERE statement_id = :sid
         ORDER BY date
@@ -42,6 +68,7 @@ def get_transactions_by_statement(statement_id: int):
 # Monthly helpers
 # -------------------------
 
+@cache.cached(lambda: {})
 def get_available_months():
     query = """
         SELECT DISTINCT
@@ -53,22 +80,17 @@ def get_available_months():
     return pd.read_sql(query, engine).to_dict(orient="records")
 
 
+def _month_range(year: int, month: int):
+    return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+
+
+@cache.cached(lambda year, month: dict(zip(("date_from", "date_to"), _month_range(year, month))))
 def get_monthly_summary(year: int, month: int):
-    query = """
-        SELECT
-            date,
-            description,
-            debit,
-            credit,
-            balance_after
-        FROM transactions
-        WHERE
-            EXTRACT(YEAR FROM date) = :year
-            AND EXTRACT(MONTH FROM date) = :month
-        ORDER BY date
-    """
-    return pd.read_sql(
-        text(query),
-        engine,
-        params={"year": year, "month": month},
-    )
\ No newline at end of file
+    # bulk pull through the Arrow export (date-range filter -> partition pruning
+    # on the server, no row-by-row materialization here)
+    start, end = _month_range(year, month)
+    return export_transactions(
+        columns=["date", "description", "debit", "credit", "balance_after"],
+        date_from=start,
+        date_to=end,
+    )
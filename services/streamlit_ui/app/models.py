@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, JSON, Boolean
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Date, JSON, Boolean
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -9,10 +9,14 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True)
     date = Column(Date)
     description = Column(String)
-    debit = Column(Integer)
-    credit = Column(Integer)
-    balance_after = Column(Integer)
+    # minor units (value / 10**currency_exponent)
+    debit = Column(BigInteger)
+    credit = Column(BigInteger)
+    balance_after = Column(BigInteger)
+    currency_exponent = Column(SmallInteger)
     reference_id = Column(String)
+    merchant = Column(String)
+    category = Column(String)
     is_duplicate = Column(Boolean)
     raw = Column(JSON)
 
@@ -24,6 +28,7 @@ class ManualAdjustment(Base):
     statement_id = Column(Integer)
     date = Column(Date)
     description = Column(String)
-    amount = Column(Integer)
+    amount = Column(BigInteger)  # minor units
+    currency_exponent = Column(SmallInteger)
     direction = Column(String)
     reason = Column(String)
\ No newline at end of file
@@ -1,5 +1,5 @@
 import streamlit as st
-from api import extract_statement
+from api import extract_statement_stream
 
 
 def upload_section():
@@ -11,7 +11,40 @@ def upload_section():
     )
 
     if uploaded and st.button("Extract"):
-        with st.spinner("Extracting..."):
-            result = extract_statement(uploaded)
-            st.session_state["statement"] = result
-            st.success("Extraction complete")
\ No newline at end of file
+        progress = st.progress(0.0, text="Uploading...")
+        rows_box = st.empty()
+
+        with st.status("Extracting...", expanded=False) as status:
+            result = None
+            for ev in extract_statement_stream(uploaded):
+                kind = ev["event"]
+
+                if kind == "page":
+                    # text/OCR pass is the first half of the work, row parsing the second
+                    verb = "Skipping" if ev.get("method") == "skipped" else "Reading"
+                    progress.progress(ev["page"] / ev["pages"] * 0.5, text=f"{verb} page {ev['page']}/{ev['pages']}")
+                elif kind == "rows":
+                    progress.progress(0.5 + ev["page"] / ev["pages"] * 0.4, text=f"Parsing page {ev['page']}/{ev['pages']}")
+                    rows_box.metric("Transactions found", ev["rows_so_far"])
+                elif kind == "parsed":
+                    progress.progress(0.9, text="Resolving statement metadata...")
+                    rows_box.metric("Transactions found", ev["rows"])
+                elif kind == "metadata":
+                    meta = ev["statement_metadata"]
+                    st.write(f"Bank: {meta.get('bank_name') or '-'} · Account: {meta.get('account_number') or '-'}")
+                elif kind == "persisted":
+                    progress.progress(1.0, text="Saved")
+                elif kind == "result":
+                    result = ev["data"]
+                elif kind == "error":
+                    status.update(label="Extraction failed", state="error")
+                    st.error(f"Extraction failed ({ev.get('status')}): {ev.get('detail')}")
+
+            if result is not None:
+                st.session_state["statement"] = result
+                skipped = (result.get("pages") or {}).get("skipped") or []
+                if skipped:
+                    st.caption("Skipped pages (no transactions): " + ", ".join(
+                        f"{p['page']} ({p['kind']})" for p in skipped))
+                status.update(label="Extraction complete", state="complete")
+                st.success("Extraction complete")